@@ -0,0 +1,110 @@
+"""
+Bounded password hashing pool.
+
+bcrypt deliberately takes a noticeable amount of CPU time per hash or
+verification, so it runs on a dedicated thread pool instead of the event
+loop or the shared request threads. The pool admits at most ``workers``
+running plus ``queue_size`` waiting operations; anything beyond that fails
+immediately with ``HashingPoolFull`` rather than queueing without limit, so
+a burst of logins degrades into fast rejections instead of a stalled server.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+HASHING_WORKERS = int(os.getenv("HASHING_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASHING_QUEUE_SIZE = int(os.getenv("HASHING_QUEUE_SIZE", "64"))
+
+
+class HashingPoolFull(Exception):
+    """Raised when every worker is busy and the queue is full."""
+
+
+class HashingPool:
+    """Thread pool for password hashing with bounded admission; counters are available through ``stats()``."""
+
+    def __init__(self, workers: int = HASHING_WORKERS, queue_size: int = HASHING_QUEUE_SIZE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hashing")
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._lock = threading.Lock()
+        self.pending = 0  # Running or waiting
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self.max_run_seconds = 0.0
+
+    def _timed(self, submitted_at: float, fn: Callable, args: tuple) -> Any:
+        started_at = time.perf_counter()
+        with self._lock:
+            self.running += 1
+        try:
+            return fn(*args)
+        finally:
+            finished_at = time.perf_counter()
+            wait, run = started_at - submitted_at, finished_at - started_at
+            with self._lock:
+                self.running -= 1
+                self.pending -= 1
+                self.completed += 1
+                self.wait_seconds += wait
+                self.max_wait_seconds = max(self.max_wait_seconds, wait)
+                self.run_seconds += run
+                self.max_run_seconds = max(self.max_run_seconds, run)
+            self._slots.release()
+
+    def submit(self, fn: Callable, *args) -> Future:
+        """
+        Run ``fn(*args)`` on the pool.
+
+        Raises:
+            HashingPoolFull: If the pool already holds ``workers + queue_size`` operations.
+        """
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HashingPoolFull("Too many password operations in progress")
+        with self._lock:
+            self.pending += 1
+        try:
+            return self._executor.submit(self._timed, time.perf_counter(), fn, args)
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+            self._slots.release()
+            raise
+
+    def run(self, fn: Callable, *args) -> Any:
+        """Run ``fn(*args)`` on the pool and block until it finishes (for synchronous callers)."""
+        return self.submit(fn, *args).result()
+
+    async def run_async(self, fn: Callable, *args) -> Any:
+        """Run ``fn(*args)`` on the pool and await it without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            completed = self.completed
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "running": self.running,
+                "queued": self.pending - self.running,
+                "completed": completed,
+                "rejected": self.rejected,
+                "mean_wait_ms": self.wait_seconds / completed * 1000 if completed else 0.0,
+                "max_wait_ms": self.max_wait_seconds * 1000,
+                "mean_hash_ms": self.run_seconds / completed * 1000 if completed else 0.0,
+                "max_hash_ms": self.max_run_seconds * 1000,
+            }
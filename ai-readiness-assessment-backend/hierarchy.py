@@ -0,0 +1,380 @@
+"""
+Hierarchical pillar -> category -> question scoring over the question bank.
+
+The question bank (``data/questionnair_2.json``) groups its questions by
+category and subcategory; for scoring, its categories are the pillars and
+its subcategories their categories. ``build_layout`` compiles the bank once
+per version into a ``HierarchyLayout``: the names at every level, the
+segment offsets marking where each category's questions and each pillar's
+categories start, and the question id -> position index. Bank options are
+ordered from most to least mature, so the chosen option's index maps to an
+answer (4-1) through ``OPTION_SCORES``.
+
+A request only selects pillars from the layout and looks up its answers:
+they go into one flat int8 array in layout order, and mean answers at every
+level are segment sums (``np.add.reduceat``) over the layout's offsets.
+
+The Q-learning weight adjustment runs at each level: the questions of a
+category are scored like the categories of a flat assessment, giving the
+category's score, then the categories of each pillar, then the pillars.
+Sibling groups of the same size are scored together in one ``score_batch``
+call, so each group gets the result a flat ``/calculate-results`` request
+with those scores and weights would get.
+"""
+
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from scoring import (
+    DEFAULT_MAX_ITERATIONS,
+    DEFAULT_PARAMS,
+    DEFAULT_TOLERANCE,
+    SOLVER_LEGACY,
+    ScoringParams,
+    score_batch,
+)
+
+# Answer (1-4) of each option, in bank order; questions with a different
+# number of options are left out of the layout
+OPTION_SCORES = np.array([4, 3, 2, 1], dtype=np.int8)
+OPTION_SCORES.flags.writeable = False
+
+
+class Selection(NamedTuple):
+    """Pillars chosen from a layout, with their offsets renumbered from zero."""
+    pillar_positions: np.ndarray  # Layout positions of the selected pillars
+    category_positions: np.ndarray  # Layout positions of their categories
+    question_positions: np.ndarray  # Layout positions of their questions
+    question_offsets: np.ndarray  # Selected category -> first selected question (length categories + 1)
+    category_offsets: np.ndarray  # Selected pillar -> first selected category (length pillars + 1)
+
+
+class HierarchyLayout(NamedTuple):
+    pillars: Tuple[str, ...]  # Bank categories
+    categories: Tuple[str, ...]  # Bank subcategories, grouped by pillar
+    question_ids: Tuple[str, ...]  # Grouped by category
+    questions: Tuple[str, ...]  # Question texts, by position
+    question_offsets: np.ndarray  # Category -> first question (length categories + 1)
+    category_offsets: np.ndarray  # Pillar -> first category (length pillars + 1)
+    pillar_positions: Mapping[str, int]
+    question_positions: Mapping[str, int]  # Question id -> position
+    everything: Selection  # Every pillar
+
+    def select(self, pillars: Optional[Sequence[str]] = None) -> Selection:
+        """
+        The given pillars, in layout order (every pillar if None).
+
+        Raises:
+            ValueError: If a pillar is not in the layout.
+        """
+        if pillars is None:
+            return self.everything
+        unknown = [pillar for pillar in pillars if pillar not in self.pillar_positions]
+        if unknown:
+            raise ValueError(f"Unknown pillar: {unknown[0]}")
+        positions = np.array(sorted({self.pillar_positions[pillar] for pillar in pillars}), dtype=np.int64)
+        if positions.size == len(self.pillars):
+            return self.everything
+        return _select(positions, self.category_offsets, self.question_offsets)
+
+    def pack(
+        self,
+        selection: Selection,
+        answers: Mapping[str, int],
+        pillar_weights: Mapping[str, float],
+        category_weights: Mapping[str, Mapping[str, float]],
+    ) -> "Hierarchy":
+        """
+        Pack answers (question id -> chosen option index) to every question of ``selection``.
+
+        Weights default to 1; ``category_weights`` maps pillar -> category -> weight.
+
+        Raises:
+            ValueError: If a selected question is unanswered, an answered
+                question is not selected, an option index is out of range
+                or a group of siblings has no positive weight.
+        """
+        question_ids = [self.question_ids[position] for position in selection.question_positions.tolist()]
+        missing = [question_id for question_id in question_ids if question_id not in answers]
+        if missing:
+            raise ValueError(f"{len(missing)} questions of the selected pillars are unanswered, e.g. {missing[0]}")
+        if len(answers) != len(question_ids):
+            selected = set(question_ids)
+            extra = next(question_id for question_id in answers if question_id not in selected)
+            raise ValueError(f"Question {extra} is not part of the selected pillars")
+        options = np.fromiter((answers[question_id] for question_id in question_ids), dtype=np.int64, count=len(question_ids))
+        if ((options < 0) | (options >= OPTION_SCORES.size)).any():
+            raise ValueError(f"Option indexes must be between 0 and {OPTION_SCORES.size - 1}")
+
+        pillar_names = [self.pillars[position] for position in selection.pillar_positions.tolist()]
+        pillar_of_category = np.repeat(selection.pillar_positions, np.diff(selection.category_offsets))
+        hierarchy = Hierarchy(
+            answers=OPTION_SCORES[options],
+            question_offsets=selection.question_offsets,
+            category_offsets=selection.category_offsets,
+            question_weights=np.ones(len(question_ids)),
+            category_weights=np.array([
+                category_weights.get(self.pillars[pillar], {}).get(self.categories[category], 1.0)
+                for pillar, category in zip(pillar_of_category.tolist(), selection.category_positions.tolist())
+            ], dtype=np.float64),
+            pillar_weights=np.array([pillar_weights.get(name, 1.0) for name in pillar_names], dtype=np.float64),
+        )
+        _check_weights(hierarchy)
+        return hierarchy
+
+    def names(self, selection: Selection) -> "HierarchyNames":
+        """Names of the selected nodes at every level, for ``score_hierarchy``."""
+        return HierarchyNames(
+            pillars=[self.pillars[position] for position in selection.pillar_positions.tolist()],
+            categories=[self.categories[position] for position in selection.category_positions.tolist()],
+            questions=[self.questions[position] for position in selection.question_positions.tolist()],
+            question_ids=[self.question_ids[position] for position in selection.question_positions.tolist()],
+        )
+
+
+class Hierarchy(NamedTuple):
+    answers: np.ndarray  # One answer (1-4) per question, grouped by category
+    question_offsets: np.ndarray  # Category -> first question (length categories + 1)
+    category_offsets: np.ndarray  # Pillar -> first category (length pillars + 1)
+    question_weights: np.ndarray  # Weight of each node relative to its siblings
+    category_weights: np.ndarray
+    pillar_weights: np.ndarray
+
+
+class HierarchyNames(NamedTuple):
+    pillars: List[str]
+    categories: List[str]
+    questions: List[str]
+    question_ids: List[str]
+
+
+class LevelScores(NamedTuple):
+    user_weights: np.ndarray  # Per child: weight as a percentage of its siblings' total
+    adjusted_weights: np.ndarray  # Per child
+    q_values: np.ndarray  # Per child
+    parent_scores: np.ndarray  # Per parent, 1-4 scale
+
+
+def _offsets(counts: Sequence[int]) -> np.ndarray:
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    offsets.flags.writeable = False
+    return offsets
+
+
+def _ranges(starts: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+    """Concatenation of ``arange(start, start + length)`` for every segment."""
+    first = np.cumsum(lengths) - lengths
+    return np.repeat(starts - first, lengths) + np.arange(int(lengths.sum()))
+
+
+def _select(pillar_positions: np.ndarray, category_offsets: np.ndarray, question_offsets: np.ndarray) -> Selection:
+    category_counts = category_offsets[pillar_positions + 1] - category_offsets[pillar_positions]
+    category_positions = _ranges(category_offsets[pillar_positions], category_counts)
+    question_counts = question_offsets[category_positions + 1] - question_offsets[category_positions]
+    return Selection(
+        pillar_positions=pillar_positions,
+        category_positions=category_positions,
+        question_positions=_ranges(question_offsets[category_positions], question_counts),
+        question_offsets=_offsets(question_counts),
+        category_offsets=_offsets(category_counts),
+    )
+
+
+def build_layout(questions: Sequence[Any]) -> HierarchyLayout:
+    """
+    Compile bank questions, grouped by category and then subcategory, into a layout.
+
+    Questions without exactly ``len(OPTION_SCORES)`` options can't be
+    scored and are left out, as are subcategories and categories left empty.
+    """
+    pillars: List[str] = []
+    categories: List[str] = []
+    question_ids: List[str] = []
+    texts: List[str] = []
+    category_counts: List[int] = []  # Per pillar
+    question_counts: List[int] = []  # Per category
+    current_category = None
+    for question in questions:
+        if len(question.options) != OPTION_SCORES.size:
+            continue
+        if not pillars or pillars[-1] != question.category:
+            pillars.append(question.category)
+            category_counts.append(0)
+            current_category = None
+        if current_category != question.subcategory:
+            current_category = question.subcategory
+            categories.append(current_category)
+            question_counts.append(0)
+            category_counts[-1] += 1
+        question_ids.append(question.id)
+        texts.append(question.question)
+        question_counts[-1] += 1
+
+    question_offsets = _offsets(question_counts)
+    category_offsets = _offsets(category_counts)
+    return HierarchyLayout(
+        pillars=tuple(pillars),
+        categories=tuple(categories),
+        question_ids=tuple(question_ids),
+        questions=tuple(texts),
+        question_offsets=question_offsets,
+        category_offsets=category_offsets,
+        pillar_positions=MappingProxyType({name: position for position, name in enumerate(pillars)}),
+        question_positions=MappingProxyType({question_id: position for position, question_id in enumerate(question_ids)}),
+        everything=Selection(
+            pillar_positions=np.arange(len(pillars)),
+            category_positions=np.arange(len(categories)),
+            question_positions=np.arange(len(question_ids)),
+            question_offsets=question_offsets,
+            category_offsets=category_offsets,
+        ),
+    )
+
+
+def _check_weights(hierarchy: Hierarchy) -> None:
+    levels = (
+        (hierarchy.question_weights, hierarchy.question_offsets),
+        (hierarchy.category_weights, hierarchy.category_offsets),
+        (hierarchy.pillar_weights, np.array([0, hierarchy.pillar_weights.size])),
+    )
+    for weights, offsets in levels:
+        if (np.add.reduceat(weights, offsets[:-1]) <= 0).any():
+            raise ValueError("Every group of siblings needs at least one positive weight")
+
+
+def mean_answers(hierarchy: Hierarchy) -> Dict[str, np.ndarray]:
+    """Unweighted mean answer (1-4) of every category and pillar, and overall."""
+    category_sums = np.add.reduceat(hierarchy.answers, hierarchy.question_offsets[:-1], dtype=np.int64)
+    pillar_sums = np.add.reduceat(category_sums, hierarchy.category_offsets[:-1])
+
+    # Question offsets of the pillars follow from composing the offset arrays
+    pillar_question_offsets = hierarchy.question_offsets[hierarchy.category_offsets]
+    return {
+        "categories": category_sums / np.diff(hierarchy.question_offsets),
+        "pillars": pillar_sums / np.diff(pillar_question_offsets),
+        "overall": pillar_sums.sum() / hierarchy.answers.size,
+    }
+
+
+def score_level(
+    scores: np.ndarray,
+    weights: np.ndarray,
+    offsets: np.ndarray,
+    solver: str = SOLVER_LEGACY,
+    tolerance: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+    params: ScoringParams = DEFAULT_PARAMS,
+) -> LevelScores:
+    """
+    Run the weight adjustment over every group of siblings of one level.
+
+    Args:
+        scores: Score of each child (1-4 scale).
+        weights: Weight of each child relative to its siblings.
+        offsets: Parent -> first child (length parents + 1).
+
+    Returns:
+        Per-child weights and Q-values, and each parent's score.
+    """
+    sizes = np.diff(offsets)
+    user_weights = np.empty(scores.size)
+    adjusted_weights = np.empty(scores.size)
+    q_values = np.empty(scores.size)
+    parent_scores = np.empty(sizes.size)
+
+    # Groups of the same size form one (groups, size) batch
+    for size in np.unique(sizes):
+        groups = np.flatnonzero(sizes == size)
+        children = offsets[groups][:, None] + np.arange(size)
+        scored = score_batch(
+            scores[children],
+            weights[children],
+            solver=solver,
+            tolerance=tolerance,
+            max_iterations=max_iterations,
+            params=params,
+        )
+        user_weights[children] = scored["userWeights"]
+        adjusted_weights[children] = scored["adjustedWeights"]
+        q_values[children] = scored["qValues"]
+        parent_scores[groups] = scored["overallScore"] / 25
+    return LevelScores(user_weights, adjusted_weights, q_values, parent_scores)
+
+
+def _nodes(
+    names: Sequence[str],
+    scores: np.ndarray,
+    means: np.ndarray,
+    level: LevelScores,
+    children: List[Optional[List[Dict[str, Any]]]],
+    ids: Optional[Sequence[str]] = None,
+) -> List[Dict[str, Any]]:
+    """Result nodes of one level, in order, with their already built children."""
+    scores, means = (scores * 25).tolist(), (means * 25).tolist()
+    user_weights, adjusted_weights, q_values = level.user_weights.tolist(), level.adjusted_weights.tolist(), level.q_values.tolist()
+    return [
+        {
+            "id": ids[i] if ids is not None else None,
+            "name": name,
+            "score": scores[i],
+            "meanScore": means[i],
+            "userWeight": user_weights[i],
+            "adjustedWeight": adjusted_weights[i],
+            "qValue": q_values[i],
+            "children": children[i],
+        }
+        for i, name in enumerate(names)
+    ]
+
+
+def _split(nodes: List[Dict[str, Any]], offsets: np.ndarray) -> List[List[Dict[str, Any]]]:
+    offsets = offsets.tolist()
+    return [nodes[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def score_hierarchy(
+    hierarchy: Hierarchy,
+    names: HierarchyNames,
+    solver: str = SOLVER_LEGACY,
+    tolerance: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+    params: ScoringParams = DEFAULT_PARAMS,
+) -> Dict[str, Any]:
+    """
+    Score a packed assessment and return its score tree.
+
+    Takes the output of ``HierarchyLayout.pack`` and ``HierarchyLayout.names``
+    and only returns built-in types, so it can run on the scoring executor.
+
+    Returns:
+        Dictionary matching ``HierarchicalResult``: the overall score and
+        one node per pillar, category and question with its score, mean
+        answer (both on the 25-100 scale), user and adjusted weights (percent
+        of its siblings) and Q-value. A question's score is its answer.
+    """
+    means = mean_answers(hierarchy)
+    options = dict(solver=solver, tolerance=tolerance, max_iterations=max_iterations, params=params)
+    answers = hierarchy.answers.astype(np.float64)
+    pillar_count = hierarchy.pillar_weights.size
+
+    question_level = score_level(answers, hierarchy.question_weights, hierarchy.question_offsets, **options)
+    category_level = score_level(question_level.parent_scores, hierarchy.category_weights, hierarchy.category_offsets, **options)
+    pillar_level = score_level(category_level.parent_scores, hierarchy.pillar_weights, np.array([0, pillar_count]), **options)
+
+    question_nodes = _nodes(names.questions, answers, answers, question_level, [None] * answers.size, names.question_ids)
+    category_nodes = _nodes(
+        names.categories, question_level.parent_scores, means["categories"], category_level,
+        _split(question_nodes, hierarchy.question_offsets),
+    )
+    pillar_nodes = _nodes(
+        names.pillars, category_level.parent_scores, means["pillars"], pillar_level,
+        _split(category_nodes, hierarchy.category_offsets),
+    )
+    return {
+        "overallScore": float(pillar_level.parent_scores[0] * 25),
+        "meanScore": float(means["overall"] * 25),
+        "pillars": pillar_nodes,
+    }
@@ -1,11 +1,19 @@
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, status, Response, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, validator, model_validator, Field, ConfigDict
-from typing import Dict, List, Optional, Any
-import numpy as np
+from typing import Dict, List, Optional, Any, Literal, Annotated, Iterator
 import json
+import math
+import os
 import uuid
+import hashlib
+import asyncio
 import logging
+import threading
+import queue
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
 from datetime import datetime
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
@@ -20,10 +28,61 @@ from models import Base, User, Company, Assessment
 from models import UserCreate, UserResponse, CompanyCreate, CompanyResponse
 from models import AssessmentCreate, AssessmentResponse, CompanyUserAssignment
 from models import DefaultPillarWeight, CompanyPillarWeight, CategoryWeight, CompanyWeightsUpdate
+from models import PersonalizedQuestionnaire, UserRole, company_user_association, parse_roles
 
 # Add import for the new utility functions
-from utils import get_color_for_score, get_strength_comment, get_improvement_comment, get_recommendations
-from utils import generate_personalized_questions, get_personalized_assessment
+from utils import generate_personalized_questions, get_personalized_assessment, company_profile, profile_digest
+from utils import get_personalized_assessment_async, stream_personalized_categories
+from question_generation import generation_stats
+
+# Vectorized scoring engine used for batch scoring
+from scoring import score_assessments
+from scoring import SOLVER_LEGACY, DEFAULT_TOLERANCE, DEFAULT_MAX_ITERATIONS, SCORING_VERSION
+from scoring import DEFAULT_PARAMS, ScoringParams
+
+# In-process caches
+from cache import LRUCache
+
+# Hot-reloadable questionnaire snapshots
+from questionnaire_store import questionnaire_store, QuestionnaireSnapshot
+from question_bank import question_bank_store, BankQuestion
+
+# Coalescing of identical concurrent requests
+from single_flight import SingleFlight
+
+# Background pre-generation of personalized questionnaires
+from pregeneration import PregenerationQueue
+
+# Pre-rendered JSON responses with ETags
+from rendered import rendered_response
+
+# Re-scoring of stored assessments
+from rescoring import category_means_from_data, rescore_with_weights, RescoreJob, DEFAULT_CHUNK_SIZE
+
+# Import Monte Carlo score uncertainty
+from uncertainty import simulate_scores
+
+# Import weight-sensitivity sweeps
+from sensitivity import build_scenarios, sweep_weights
+
+# Import hierarchical pillar -> category -> subcategory scoring
+from hierarchy import OPTION_SCORES, score_hierarchy
+
+# Import enterprise readiness scoring
+from readiness import PILLARS, stored_score, category_weights_for, score_pillars, combine_pillars
+
+# Import authenticated principals and their cache
+from principals import Principal, PrincipalCache, principal_from_user, token_digest
+from principals import scope_claims, principal_from_claims
+
+# Import the in-memory company membership index
+from membership import MembershipIndex
+
+# Import the bounded password hashing pool
+from hashing import HashingPool, HashingPoolFull
+
+# Import the precompiled recommendation catalog
+from recommendations import recommendation_catalog, score_color
 
 # Add UserUpdate model import if it exists, otherwise we'll create it
 try:
@@ -52,8 +111,9 @@ def get_db():
     finally:
         db.close()
 
-# Password hashing
+# Password hashing, run on a dedicated pool with bounded admission
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+hashing_pool = HashingPool()
 
 # JWT settings
 SECRET_KEY = "a_very_secret_key_that_should_be_kept_secure"
@@ -63,6 +123,12 @@ ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 day
 # OAuth2 with password flow
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# Authenticated principals, cached by token digest
+PRINCIPAL_CACHE_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_ENTRIES", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))  # seconds
+
+principal_cache = PrincipalCache(max_entries=PRINCIPAL_CACHE_ENTRIES, ttl=PRINCIPAL_CACHE_TTL)
+
 # Setup basic logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("api")
@@ -81,13 +147,198 @@ app.add_middleware(
     max_age=86400,  # Cache preflight requests for 24 hours
 )
 
-# Load questionnaires
-try:
-    with open("data/questionnaires.json", "r") as f:
-        questionnaires = json.load(f)
-except FileNotFoundError:
-    # Fallback with an empty dict if file doesn't exist yet
-    questionnaires = {}
+# Scoring executor. Scoring is CPU-bound, so it runs in a dedicated pool that
+# the endpoints await instead of on the event loop.
+SCORING_EXECUTOR = os.getenv("SCORING_EXECUTOR", "thread")  # "thread" or "process"
+SCORING_WORKERS = int(os.getenv("SCORING_WORKERS", str(os.cpu_count() or 1)))
+
+_scoring_executor = None
+
+def get_scoring_executor():
+    """Return the shared scoring executor, creating it on first use."""
+    global _scoring_executor
+    if _scoring_executor is None:
+        if SCORING_EXECUTOR == "process":
+            _scoring_executor = ProcessPoolExecutor(max_workers=SCORING_WORKERS)
+        else:
+            _scoring_executor = ThreadPoolExecutor(max_workers=SCORING_WORKERS, thread_name_prefix="scoring")
+        logger.info(f"Started {SCORING_EXECUTOR} scoring executor with {SCORING_WORKERS} workers")
+    return _scoring_executor
+
+async def run_scoring(func, *args, **kwargs):
+    """Run a scoring function on the scoring executor and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_scoring_executor(), partial(func, *args, **kwargs))
+
+@app.on_event("shutdown")
+def shutdown_scoring_executor():
+    if _scoring_executor is not None:
+        _scoring_executor.shutdown(wait=False)
+
+# Questionnaire edits are picked up by a background watcher; requests only
+# read the current snapshot from questionnaire_store
+@app.on_event("startup")
+def start_questionnaire_watcher():
+    questionnaire_store.start()
+    question_bank_store.start()
+
+@app.on_event("shutdown")
+def stop_questionnaire_watcher():
+    questionnaire_store.stop()
+    question_bank_store.stop()
+
+# Cache of scoring results keyed by a digest of the submission
+RESULT_CACHE_ENTRIES = int(os.getenv("RESULT_CACHE_ENTRIES", "4096"))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "3600"))  # seconds
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+
+result_cache = LRUCache(
+    max_entries=RESULT_CACHE_ENTRIES,
+    ttl=RESULT_CACHE_TTL,
+    max_bytes=RESULT_CACHE_MAX_BYTES,
+    sizeof=lambda result: len(json.dumps(result)),
+)
+
+# Cache of personalized assessments keyed by company, pillar, questionnaire
+# version and a digest of the company profile they were generated from
+PERSONALIZED_CACHE_ENTRIES = int(os.getenv("PERSONALIZED_CACHE_ENTRIES", "1024"))
+PERSONALIZED_CACHE_TTL = float(os.getenv("PERSONALIZED_CACHE_TTL", "86400"))  # seconds
+PERSONALIZED_CACHE_MAX_BYTES = int(os.getenv("PERSONALIZED_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+personalized_cache = LRUCache(
+    max_entries=PERSONALIZED_CACHE_ENTRIES,
+    ttl=PERSONALIZED_CACHE_TTL,
+    max_bytes=PERSONALIZED_CACHE_MAX_BYTES,
+    sizeof=lambda assessment: len(json.dumps(assessment)),
+)
+
+def personalized_cache_key(company: Company, pillar: str, questionnaire_version: str):
+    return (company.id, pillar, questionnaire_version, profile_digest(company_profile(company)))
+
+def stored_personalized_assessment(db: Session, cache_key) -> Optional[Dict]:
+    """Pre-generated personalized assessment matching a cache key, if one is stored."""
+    company_id, pillar, questionnaire_version, digest = cache_key
+    row = db.query(PersonalizedQuestionnaire).filter(
+        PersonalizedQuestionnaire.company_id == company_id,
+        PersonalizedQuestionnaire.pillar == pillar
+    ).first()
+    if row is None or row.questionnaire_version != questionnaire_version or row.profile_digest != digest:
+        return None
+    return row.data
+
+def store_personalized_assessment(db: Session, cache_key, assessment: Dict) -> None:
+    """Save a generated personalized assessment, replacing the company's previous one for the pillar."""
+    company_id, pillar, questionnaire_version, digest = cache_key
+    row = db.query(PersonalizedQuestionnaire).filter(
+        PersonalizedQuestionnaire.company_id == company_id,
+        PersonalizedQuestionnaire.pillar == pillar
+    ).first()
+    if row is None:
+        row = PersonalizedQuestionnaire(id=str(uuid.uuid4()), company_id=company_id, pillar=pillar)
+        db.add(row)
+    row.questionnaire_version = questionnaire_version
+    row.profile_digest = digest
+    row.data = assessment
+    try:
+        db.commit()
+    except Exception as e:
+        # Another worker or request stored the same questionnaire first
+        db.rollback()
+        logger.warning(f"Could not store personalized questionnaire for {company_id}/{pillar}: {e}")
+
+def invalidate_personalized_cache(company_id: str) -> int:
+    """Drop every cached personalized assessment of a company."""
+    return personalized_cache.invalidate(lambda key: key[0] == company_id)
+
+# Concurrent requests for the same company, pillar and questionnaire version
+# share one generation
+personalized_flight = SingleFlight()
+
+def find_personalized_assessment(db_company: Company, pillar: str, snapshot: QuestionnaireSnapshot, db: Session):
+    """Cache key of a personalized assessment, and the assessment if it is cached or pre-generated."""
+    cache_key = personalized_cache_key(db_company, pillar, snapshot.version)
+    assessment = personalized_cache.get(cache_key)
+    if assessment is None:
+        assessment = stored_personalized_assessment(db, cache_key)
+        if assessment is not None:
+            personalized_cache.set(cache_key, assessment)
+    return cache_key, assessment
+
+def keep_personalized_assessment(db: Session, cache_key, assessment: Dict) -> Dict:
+    """Store and cache a generated personalized assessment, unless its generation failed."""
+    if "error" not in assessment:
+        store_personalized_assessment(db, cache_key, assessment)
+        personalized_cache.set(cache_key, assessment)
+    return assessment
+
+def load_personalized_assessment(db_company: Company, pillar: str, snapshot: QuestionnaireSnapshot, db: Session) -> Dict:
+    """
+    Personalized assessment from the cache or the pre-generated ones, or
+    generated (and stored) once for all concurrent requests.
+    """
+    cache_key, assessment = find_personalized_assessment(db_company, pillar, snapshot, db)
+    if assessment is not None:
+        return assessment
+    
+    def generate():
+        assessment = get_personalized_assessment(
+            db_company.id, pillar, db, categories=snapshot.index[pillar].category_names, company=db_company
+        )
+        return keep_personalized_assessment(db, cache_key, assessment)
+    
+    return personalized_flight.do((db_company.id, pillar, snapshot.version), generate)
+
+async def load_personalized_assessment_async(db_company: Company, pillar: str, snapshot: QuestionnaireSnapshot, db: Session) -> Dict:
+    """
+    Async version of ``load_personalized_assessment``, sharing its cache,
+    pre-generated assessments and in-flight generations. Waiting for a
+    generation doesn't block the event loop.
+    """
+    cache_key, assessment = find_personalized_assessment(db_company, pillar, snapshot, db)
+    if assessment is not None:
+        return assessment
+    # Hand the connection back before waiting, so waiting requests can't exhaust
+    # the pool and leave a checkout blocking the event loop; the company's
+    # columns stay loaded and storing the result takes a new connection
+    db.close()
+    
+    async def generate():
+        assessment = await get_personalized_assessment_async(db_company, pillar, snapshot.index[pillar].category_names)
+        return keep_personalized_assessment(db, cache_key, assessment)
+    
+    return await personalized_flight.do_async((db_company.id, pillar, snapshot.version), generate)
+
+def pregenerate_company(company_id: str) -> None:
+    """Generate and store every personalized questionnaire of a company that is not up to date."""
+    db = SessionLocal()
+    try:
+        db_company = db.query(Company).filter(Company.id == company_id).first()
+        if db_company is None:
+            return
+        snapshot = questionnaire_store.snapshot
+        for pillar in snapshot.index:
+            assessment = load_personalized_assessment(db_company, pillar, snapshot, db)
+            if "error" in assessment:
+                raise RuntimeError(f"{pillar}: {assessment['error']}")
+    finally:
+        db.close()
+
+# Companies are queued when created or updated, recently active ones first
+pregeneration_queue = PregenerationQueue(pregenerate_company)
+
+@app.on_event("startup")
+def start_pregeneration():
+    pregeneration_queue.start()
+
+@app.on_event("shutdown")
+def stop_pregeneration():
+    pregeneration_queue.stop()
+
+# Largest number of weight scenarios accepted by a single sweep
+SWEEP_MAX_SCENARIOS = int(os.getenv("SWEEP_MAX_SCENARIOS", "50000"))
+
+# Largest number of Monte Carlo samples accepted for one score
+UNCERTAINTY_MAX_SAMPLES = int(os.getenv("UNCERTAINTY_MAX_SAMPLES", "20000"))
 
 class ResponseItem(BaseModel):
     question: str
@@ -110,9 +361,31 @@ class CategoryResponses(BaseModel):
             raise ValueError("Weight must be between 0 and 100")
         return v
 
+class SolverOptions(BaseModel):
+    """Q-value solver used when scoring an assessment"""
+    mode: Literal["legacy", "converged", "fixed_point"] = SOLVER_LEGACY
+    tolerance: float = Field(DEFAULT_TOLERANCE, gt=0)  # Converged mode: stop once updates fall below this
+    maxIterations: int = Field(DEFAULT_MAX_ITERATIONS, ge=1, le=100000)  # Converged mode: pass limit
+
+class UncertaintyOptions(BaseModel):
+    """Monte Carlo perturbation used to estimate how stable a score is"""
+    samples: int = Field(10000, ge=100, le=UNCERTAINTY_MAX_SAMPLES)
+    answerNoise: float = Field(0.1, ge=0, le=1)  # Probability that an answer moves one level up or down
+    weightNoise: float = Field(0.1, ge=0, le=1)  # Relative standard deviation of each weight
+    percentiles: List[float] = Field(default_factory=lambda: [5.0, 50.0, 95.0], min_length=1)
+    seed: Optional[int] = Field(None, ge=0)  # Defaults to a seed derived from the submission
+
+    @validator('percentiles')
+    def validate_percentiles(cls, v):
+        if not all(0 <= p <= 100 for p in v):
+            raise ValueError("Percentiles must be between 0 and 100")
+        return v
+
 class AssessmentResponse(BaseModel):
     assessmentType: str
     categoryResponses: List[CategoryResponses]
+    solver: SolverOptions = Field(default_factory=SolverOptions)
+    uncertainty: Optional[UncertaintyOptions] = None  # Also estimate percentile bands of the scores
     
     @model_validator(mode='after')
     def validate_total_weight(self) -> 'AssessmentResponse':
@@ -130,6 +403,63 @@ class AssessmentResult(BaseModel):
     qValues: Dict[str, float]
     adjustedWeights: Dict[str, float]  # Final adjusted weights
     overallScore: float
+    uncertainty: Optional['UncertaintyResult'] = None
+
+class UncertaintyResult(BaseModel):
+    samples: int
+    seed: int
+    percentiles: List[float]
+    overallScore: List[float]  # One value per percentile
+    categoryScores: Dict[str, List[float]]  # One value per percentile for each category
+    mean: float  # Mean overall score over the samples
+    std: float  # Standard deviation of the overall score over the samples
+
+AssessmentResult.model_rebuild()
+
+class WeightSweepRequest(AssessmentResponse):
+    """An assessment plus candidate category weights to score it under; its own weights are the baseline"""
+    scenarios: Optional[List[Dict[str, float]]] = None  # Each overrides some category weights
+    grid: Optional[Dict[str, List[float]]] = None  # Every combination of these candidate weights
+
+class CategorySensitivity(BaseModel):
+    slope: float  # Change in overall score per percentage point of weight at the baseline
+    correlation: Optional[float]  # Correlation of the category's weight share with the score across scenarios
+
+class WeightSweepResult(BaseModel):
+    assessmentType: str
+    categories: List[str]
+    overallScores: List[float]  # One per scenario
+    adjustedWeights: List[List[float]]  # One row per scenario, in category order
+    baselineScore: float
+    minScore: float
+    maxScore: float
+    sensitivity: Dict[str, CategorySensitivity]
+    ranking: List[str]  # Categories by decreasing absolute slope
+
+class HierarchicalAssessment(BaseModel):
+    """Answers to the question bank, scored as pillars (bank categories), categories (subcategories) and questions"""
+    # Question id -> index of the chosen option; options are listed from most to least mature
+    answers: Dict[str, Annotated[int, Field(ge=0, le=len(OPTION_SCORES) - 1)]] = Field(..., min_length=1)
+    pillars: Optional[List[str]] = Field(None, min_length=1)  # Pillars to score, every question of which must be answered; all by default
+    pillarWeights: Dict[str, Annotated[float, Field(ge=0)]] = {}  # Default 1
+    categoryWeights: Dict[str, Dict[str, Annotated[float, Field(ge=0)]]] = {}  # Pillar -> category -> weight, default 1
+    solver: SolverOptions = Field(default_factory=SolverOptions)
+
+class ScoreNode(BaseModel):
+    id: Optional[str] = None  # Question id, for questions
+    name: str
+    score: float  # Scored from the children with adjusted weights (the answer for questions)
+    meanScore: float  # Unweighted mean of every answer below this node
+    userWeight: float  # Percent of the siblings' total weight
+    adjustedWeight: float
+    qValue: float
+    children: Optional[List['ScoreNode']] = None
+
+class HierarchicalResult(BaseModel):
+    version: str  # Question bank version the answers were scored against
+    overallScore: float
+    meanScore: float
+    pillars: List[ScoreNode]
 
 # New models for auth
 class Token(BaseModel):
@@ -140,15 +470,34 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     email: Optional[str] = None
 
+# An overloaded hashing pool rejects new work instead of queueing it
+@app.exception_handler(HashingPoolFull)
+def hashing_pool_full(request: Request, exc: HashingPoolFull):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Too many login attempts in progress, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.on_event("shutdown")
+def shutdown_hashing_pool():
+    hashing_pool.shutdown()
+
 # Helper functions for auth
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing_pool.run(pwd_context.verify, plain_password, hashed_password)
+
+async def verify_password_async(plain_password, hashed_password):
+    return await hashing_pool.run_async(pwd_context.verify, plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return hashing_pool.run(pwd_context.hash, password)
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, scope: Optional[Dict] = None):
+    """Sign a token with ``data``, plus the ``scope_claims`` of its user if given."""
     to_encode = data.copy()
+    if scope:
+        to_encode.update(scope)
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
@@ -160,11 +509,26 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
 def get_user(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
-def authenticate_user(db: Session, email: str, password: str):
+def get_scope_version(db: Session, user_id: str) -> Optional[int]:
+    """Current scope version of a user, or None if the user no longer exists."""
+    return db.query(User.scope_version).filter(User.id == user_id).scalar()
+
+def bump_scope_versions(db: Session, user_ids) -> None:
+    """Mark the scope claims of tokens issued to ``user_ids`` as stale (committed with the caller's changes)."""
+    user_ids = list(user_ids)
+    if user_ids:
+        db.query(User).filter(User.id.in_(user_ids)).update(
+            {User.scope_version: User.scope_version + 1}, synchronize_session=False
+        )
+
+async def authenticate_user(db: Session, email: str, password: str):
     user = get_user(db, email)
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    # Hand the connection back before waiting on the hashing pool, so a burst of
+    # logins can't exhaust the connection pool; the user's columns stay loaded
+    db.close()
+    if not await verify_password_async(password, user.hashed_password):
         return False
     return user
 
@@ -173,17 +537,17 @@ def parse_user_roles(user_obj):
     """
     Parse the roles field of a user object to ensure it's properly formatted.
     This should be called before returning user objects to the API.
+    
+    User.roles already comes from user_role_association as a list (falling back
+    to the legacy role), so User objects are returned unchanged.
     """
-    # If user doesn't have roles attribute, return as is
-    if not hasattr(user_obj, 'roles'):
+    # If user doesn't have roles attribute, or is a User, return as is
+    if not hasattr(user_obj, 'roles') or isinstance(user_obj, User):
         return user_obj
     
     # Parse roles from JSON string if needed
     if isinstance(user_obj.roles, str):
-        try:
-            user_obj.roles = json.loads(user_obj.roles)
-        except:
-            user_obj.roles = []
+        user_obj.roles = parse_roles(user_obj.roles)
     
     # Set default roles from legacy role if needed
     if (not user_obj.roles or len(user_obj.roles) == 0) and hasattr(user_obj, 'role') and user_obj.role:
@@ -191,7 +555,14 @@ def parse_user_roles(user_obj):
     
     return user_obj
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """Principal of the bearer token, from the principal cache when possible."""
+    cache_key = token_digest(token)
+    principal = principal_cache.get(cache_key)
+    if principal is not None:
+        return principal
+    generation = principal_cache.generation
+    
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -205,45 +576,165 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         token_data = TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    user = get_user(db, email=token_data.email)
-    if user is None:
-        raise credentials_exception
-    # Parse roles before returning
-    return parse_user_roles(user)
+    
+    # A token with scope claims carries its principal; it is only trusted while
+    # the user's scope version still matches the one it was issued with
+    principal = principal_from_claims(payload)
+    if principal is None or get_scope_version(db, principal.id) != payload.get("sv"):
+        user = get_user(db, email=token_data.email)
+        if user is None:
+            raise credentials_exception
+        # Parse roles before freezing the user
+        principal = principal_from_user(parse_user_roles(user), membership_index.companies(user.id))
+    principal_cache.set(cache_key, principal, payload.get("exp", math.inf), generation)
+    return principal
+
+# Company memberships are answered from an in-memory index of
+# company_user_association, updated whenever assignments change and reloaded
+# periodically to pick up changes made outside this process
+def load_memberships():
+    db = SessionLocal()
+    try:
+        return db.query(company_user_association.c.company_id, company_user_association.c.user_id).all()
+    finally:
+        db.close()
+
+membership_index = MembershipIndex(load_memberships)
+
+@app.on_event("startup")
+def load_membership_index():
+    membership_index.load()
+    membership_index.start()
+
+@app.on_event("shutdown")
+def stop_membership_index():
+    membership_index.stop()
+
+def check_company_access(current_user: Principal, company_id: str, detail: str = "Not authorized to access this company"):
+    """Raise 403 unless the user is an admin or assigned to the company."""
+    if not current_user.is_admin and not membership_index.is_member(current_user.id, company_id):
+        raise HTTPException(status_code=403, detail=detail)
+
+def require_admin(current_user: Principal = Depends(get_current_user)) -> Principal:
+    """Dependency: the current user, who must be an admin."""
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return current_user
+
+def require_company_access(company_id: str, current_user: Principal = Depends(get_current_user)) -> Principal:
+    """Dependency: the current user, who must be an admin or assigned to the ``company_id`` path parameter."""
+    check_company_access(current_user, company_id)
+    return current_user
 
 @app.get("/")
 def read_root():
     return {"message": "AI Readiness Assessment API"}
 
+@app.get("/metrics")
+def get_metrics():
+    """Runtime counters for the in-process caches."""
+    return {
+        "result_cache": result_cache.stats(),
+        "questionnaires": questionnaire_store.stats(),
+        "question_bank": question_bank_store.stats(),
+        "personalized_cache": personalized_cache.stats(),
+        "question_generation": generation_stats.stats(),
+        "personalized_single_flight": personalized_flight.stats(),
+        "pregeneration": pregeneration_queue.stats(),
+        "principal_cache": principal_cache.stats(),
+        "password_hashing": hashing_pool.stats(),
+        "memberships": membership_index.stats(),
+    }
+
 @app.get("/questionnaires")
-def get_questionnaires():
-    return questionnaires
+def get_questionnaires(request: Request):
+    # Served from bytes rendered once per questionnaire version
+    return rendered_response(request, questionnaire_store.snapshot.rendered)
 
 @app.get("/questionnaire/{assessment_type}")
-def get_questionnaire(assessment_type: str):
-    if assessment_type not in questionnaires:
+def get_questionnaire(assessment_type: str, request: Request):
+    rendered = questionnaire_store.snapshot.rendered_types.get(assessment_type)
+    if rendered is None:
         raise HTTPException(status_code=404, detail=f"Assessment type '{assessment_type}' not found")
-    return questionnaires[assessment_type]
+    return rendered_response(request, rendered)
+
+# Question bank, indexed by category, subcategory and question id
+QUESTION_BANK_MAX_PAGE = int(os.getenv("QUESTION_BANK_MAX_PAGE", "500"))
+
+class BankQuestionResponse(BaseModel):
+    id: str
+    category: str
+    subcategory: str
+    question: str
+    options: List[str]
+
+class BankQuestionPage(BaseModel):
+    version: str
+    total: int
+    offset: int
+    limit: int
+    items: List[BankQuestionResponse]
+
+def bank_question_response(question: BankQuestion) -> BankQuestionResponse:
+    return BankQuestionResponse(**question._asdict())
+
+@app.get("/question-bank")
+def get_question_bank():
+    """Categories and subcategories of the question bank with their question counts."""
+    return question_bank_store.snapshot.summary()
+
+@app.get("/question-bank/questions", response_model=BankQuestionPage)
+def list_bank_questions(
+    category: Optional[str] = None,
+    subcategory: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=QUESTION_BANK_MAX_PAGE),
+):
+    """Page through the question bank, optionally filtered by category and subcategory."""
+    bank = question_bank_store.snapshot
+    if subcategory is not None:
+        ranges = bank.subcategory_ranges(subcategory, category)
+        if not ranges:
+            raise HTTPException(status_code=404, detail=f"Subcategory '{subcategory}' not found")
+    elif category is not None:
+        category_range = bank.category_range(category)
+        if category_range is None:
+            raise HTTPException(status_code=404, detail=f"Category '{category}' not found")
+        ranges = [category_range]
+    else:
+        ranges = [(0, len(bank.questions))]
+
+    total, questions = bank.page(ranges, offset, limit)
+    return BankQuestionPage(
+        version=bank.version,
+        total=total,
+        offset=offset,
+        limit=limit,
+        items=[bank_question_response(question) for question in questions],
+    )
+
+@app.get("/question-bank/questions/{question_id}", response_model=BankQuestionResponse)
+def get_bank_question(question_id: str):
+    question = question_bank_store.snapshot.get(question_id)
+    if question is None:
+        raise HTTPException(status_code=404, detail=f"Question '{question_id}' not found")
+    return bank_question_response(question)
 
 @app.get("/questionnaire/{assessment_type}/personalized/{company_id}")
-def get_personalized_questionnaire(assessment_type: str, company_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+async def get_personalized_questionnaire(assessment_type: str, company_id: str, db: Session = Depends(get_db), current_user: Principal = Depends(require_company_access)):
     """
     Get a personalized questionnaire with dynamic options for a specific company.
     Questions are generated using OpenAI based on the company's profile and industry.
     """
     # Debug logging
     logger.info(f"Request for personalized questionnaire: assessment_type={assessment_type}, company_id={company_id}")
-    logger.info(f"User requesting: {current_user.email}, role: {current_user.role}")
+    logger.info(f"User requesting: {current_user.email}, roles: {list(current_user.roles)}")
     
     try:
-        # Check if user has access to this company
-        has_access = current_user.role == "admin" or any(c.id == company_id for c in current_user.companies)
-        
-        if not has_access:
-            raise HTTPException(status_code=403, detail="Not authorized to view this company's assessment")
-        
         # Check if assessment type exists
-        if assessment_type not in questionnaires:
+        snapshot = questionnaire_store.snapshot
+        type_index = snapshot.index.get(assessment_type)
+        if type_index is None:
             raise HTTPException(status_code=404, detail=f"Assessment type '{assessment_type}' not found")
         
         # Debug log before company query
@@ -256,139 +747,494 @@ def get_personalized_questionnaire(assessment_type: str, company_id: str, db: Se
             raise HTTPException(status_code=404, detail="Company not found")
             
         logger.info(f"Found company: {db_company.name}")
+        pregeneration_queue.touch(company_id)
         
-        # Get personalized assessment
-        assessment = get_personalized_assessment(company_id, assessment_type, db)
+        # Get personalized assessment (cached, and generated once for concurrent
+        # requests); waiting for the generation doesn't hold a worker thread
+        assessment = await load_personalized_assessment_async(db_company, assessment_type, snapshot, db)
         
         if "error" in assessment:
             logger.error(f"Error in personalized assessment: {assessment['error']}")
             raise HTTPException(status_code=500, detail=assessment["error"])
         
         return assessment
+    except HTTPException:
+        raise
     except Exception as e:
         # Catch and log any unexpected errors
         logger.error(f"Exception in get_personalized_questionnaire: {str(e)}")
         logger.exception(e)
         raise HTTPException(status_code=500, detail=str(e))
 
+STREAM_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "sse": "text/event-stream"}
+
+def encode_stream_events(events: Iterator[Dict], stream_format: str) -> Iterator[bytes]:
+    """Encode ``{"event": ..., ...}`` dictionaries as NDJSON lines or server-sent events."""
+    for event in events:
+        data = json.dumps(event, ensure_ascii=False, separators=(",", ":"))
+        if stream_format == "sse":
+            yield f"event: {event['event']}\ndata: {data}\n\n".encode("utf-8")
+        else:
+            yield f"{data}\n".encode("utf-8")
+
+def generate_streamed_assessment(flight_key, future, cache_key, company_info: Dict, pillar: str, categories: List[str], events: queue.Queue) -> None:
+    """
+    Generate a personalized assessment for the stream leading its flight,
+    putting each category event on ``events`` as soon as it is ready, then
+    store and cache the complete assessment and hand it to the flight.
+
+    Runs in its own thread, so the generation finishes (and the waiting
+    requests get its result) even if the leader's client disconnects.
+    ``None`` on ``events`` marks the end.
+    """
+    try:
+        generated = [None] * len(categories)
+        for category in stream_personalized_categories(company_info, pillar, categories):
+            generated[category["index"]] = {"name": category["name"], "questions": category["questions"]}
+            events.put({"event": "category", **category})
+
+        assessment = {"pillar": pillar, "company": company_info, "categories": generated}
+        db = SessionLocal()
+        try:
+            store_personalized_assessment(db, cache_key, assessment)
+        finally:
+            db.close()
+        personalized_cache.set(cache_key, assessment)
+    except BaseException as e:
+        logger.error(f"Streamed generation failed for {flight_key}: {e}")
+        personalized_flight.complete(flight_key, future, exception=e)
+    else:
+        personalized_flight.complete(flight_key, future, assessment)
+    finally:
+        events.put(None)
+
+def personalized_stream_events(cache_key, company_info: Dict, pillar: str, categories: List[str], assessment: Optional[Dict]) -> Iterator[Dict]:
+    """
+    Events of a streamed personalized questionnaire: a header with the company
+    and category names, one event per category and a final ``done`` event.
+
+    Stored assessments are replayed in category order. Otherwise the stream
+    joins the generation in flight for the company, pillar and questionnaire
+    version, shared with ``load_personalized_assessment``: the stream that
+    leads it sends categories in the order they finish generating, and the
+    generation stores the complete assessment; the other requests wait for
+    that assessment and replay it.
+    """
+    if assessment is not None:
+        categories = [category["name"] for category in assessment["categories"]]
+        company_info = assessment["company"]
+    yield {"event": "header", "pillar": pillar, "company": company_info, "categories": categories}
+
+    # Same key as load_personalized_assessment: (company_id, pillar, questionnaire version)
+    flight_key = cache_key[:3]
+    while assessment is None:
+        future, leader = personalized_flight.join(flight_key)
+        if not leader:
+            result = future.result()
+            # A failed generation of the non-streaming path is retried by streaming it
+            if "error" not in result:
+                assessment = result
+            continue
+
+        # A flight that finished since the request checked the cache has stored its result
+        assessment = personalized_cache.get(cache_key)
+        if assessment is not None:
+            personalized_flight.complete(flight_key, future, assessment)
+            break
+
+        events = queue.Queue()
+        threading.Thread(
+            target=generate_streamed_assessment,
+            args=(flight_key, future, cache_key, company_info, pillar, categories, events),
+            name=f"stream-generation-{cache_key[0]}",
+            daemon=True,
+        ).start()
+        for event in iter(events.get, None):
+            yield event
+        future.result()  # Raise anything the generation raised
+        yield {"event": "done"}
+        return
+
+    for index, category in enumerate(assessment["categories"]):
+        yield {"event": "category", "index": index, **category}
+    yield {"event": "done"}
+
+@app.get("/questionnaire/{assessment_type}/personalized/{company_id}/stream")
+def stream_personalized_questionnaire(
+    assessment_type: str,
+    company_id: str,
+    format: Literal["ndjson", "sse"] = "ndjson",
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(require_company_access),
+):
+    """
+    Stream a personalized questionnaire category by category, as NDJSON lines
+    or server-sent events, so the first categories can be shown while the
+    rest are still being generated.
+    """
+    snapshot = questionnaire_store.snapshot
+    if assessment_type not in snapshot.index:
+        raise HTTPException(status_code=404, detail=f"Assessment type '{assessment_type}' not found")
+    
+    db_company = db.query(Company).filter(Company.id == company_id).first()
+    if db_company is None:
+        raise HTTPException(status_code=404, detail="Company not found")
+    pregeneration_queue.touch(company_id)
+    
+    # Cached or pre-generated questionnaires are replayed without generating
+    cache_key = personalized_cache_key(db_company, assessment_type, snapshot.version)
+    assessment = personalized_cache.get(cache_key)
+    if assessment is None:
+        assessment = stored_personalized_assessment(db, cache_key)
+    
+    company_info = company_profile(db_company)
+    # Streams can wait on another stream's generation for a while, so the
+    # request's connection goes back to the pool before streaming starts
+    db.close()
+    
+    events = personalized_stream_events(
+        cache_key, company_info, assessment_type, snapshot.index[assessment_type].category_names, assessment
+    )
+    return StreamingResponse(
+        encode_stream_events(events, format),
+        media_type=STREAM_MEDIA_TYPES[format],
+        headers={"Cache-Control": "no-cache"},
+    )
+
+def submission_digest(assessment_response: AssessmentResponse, questionnaire_version: str) -> str:
+    """
+    Canonical digest of everything a score depends on: the scoring algorithm
+    and questionnaire versions, the assessment type, the solver and
+    uncertainty options and the ordered answers and weights of each category.
+    Question texts are included too, so a cache hit implies the submission
+    already passed validation against that questionnaire version.
+    """
+    solver = assessment_response.solver
+    uncertainty = assessment_response.uncertainty
+    canonical = [
+        SCORING_VERSION,
+        questionnaire_version,
+        assessment_response.assessmentType,
+        [solver.mode, solver.tolerance, solver.maxIterations],
+        uncertainty.model_dump() if uncertainty is not None else None,
+        [
+            [cat.category, cat.weight, [[resp.question, resp.answer] for resp in cat.responses]]
+            for cat in assessment_response.categoryResponses
+        ],
+    ]
+    return hashlib.blake2b(json.dumps(canonical, separators=(",", ":")).encode(), digest_size=16).hexdigest()
+
+def collect_category_responses(assessment_response: AssessmentResponse, snapshot: QuestionnaireSnapshot, error_prefix: str = ""):
+    """
+    Validate a submission against a questionnaire snapshot and extract its answers.
+
+    Returns (user_responses, user_weightages): dictionaries keyed by category in
+    submission order, holding the list of answers and the raw weight (0-100).
+    """
+    assessment_type = assessment_response.assessmentType
+    type_index = snapshot.index.get(assessment_type)
+    if type_index is None:
+        raise HTTPException(status_code=404, detail=f"{error_prefix}Assessment type '{assessment_type}' not found")
+    
+    user_responses = {}
+    user_weightages = {}
+    
+    for category_response in assessment_response.categoryResponses:
+        category = type_index.category(category_response.category)
+        if category is None:
+            raise HTTPException(status_code=400, detail=f"{error_prefix}Invalid category: {category_response.category}")
+        if len(category_response.responses) == 0:
+            raise HTTPException(status_code=400, detail=f"{error_prefix}No responses provided for category {category.name}")
+        
+        invalid_questions = type_index.invalid_questions(category, [resp.question for resp in category_response.responses])
+        if invalid_questions:
+            raise HTTPException(status_code=400, detail=f"{error_prefix}Question does not belong to category {category.name}: {invalid_questions[0]}")
+        
+        user_responses[category.name] = [resp.answer for resp in category_response.responses]
+        user_weightages[category.name] = category_response.weight
+    
+    return user_responses, user_weightages
+
+def simulate_uncertainty(assessment_response: AssessmentResponse, user_responses, user_weightages, cache_key: str):
+    """Run the Monte Carlo simulation of a submission on the scoring executor."""
+    options = assessment_response.uncertainty
+    solver = assessment_response.solver
+    # Without an explicit seed, identical submissions get identical bands
+    seed = options.seed if options.seed is not None else int(cache_key[:8], 16)
+    return run_scoring(
+        simulate_scores,
+        list(user_responses),
+        list(user_responses.values()),
+        list(user_weightages.values()),
+        samples=options.samples,
+        answer_noise=options.answerNoise,
+        weight_noise=options.weightNoise,
+        percentiles=options.percentiles,
+        seed=seed,
+        solver=solver.mode,
+        tolerance=solver.tolerance,
+        max_iterations=solver.maxIterations,
+    )
+
 @app.post("/calculate-results", response_model=AssessmentResult)
 async def calculate_results(assessment_response: AssessmentResponse):
     try:
         assessment_type = assessment_response.assessmentType
         
-        if assessment_type not in questionnaires:
-            raise HTTPException(status_code=404, detail=f"Assessment type '{assessment_type}' not found")
+        # Identical submissions are answered from the result cache
+        snapshot = questionnaire_store.snapshot
+        cache_key = submission_digest(assessment_response, snapshot.version)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return AssessmentResult(**cached)
         
         # Process responses and weights with validation
-        user_responses = {}
-        user_weightages = {}
-        
-        for category_response in assessment_response.categoryResponses:
-            category = category_response.category
-            if category not in questionnaires[assessment_type]:
-                raise HTTPException(status_code=400, detail=f"Invalid category: {category}")
-            if len(category_response.responses) == 0:
-                raise HTTPException(status_code=400, detail=f"No responses provided for category {category}")
-            user_responses[category] = [resp.answer for resp in category_response.responses]
-            user_weightages[category] = category_response.weight / 100  # Convert to proportion immediately
-
-        # Normalize User-defined Weights (Convert to Range 0-1)
-        total_weight = sum(user_weightages.values())
-        normalized_user_weightages = {category: weight / total_weight for category, weight in user_weightages.items()}
-        
-        # Compute category scores
-        category_scores = {category: float(np.mean(scores)) for category, scores in user_responses.items()}
-        
-        # Initialize Q-values with reproducibility
-        np.random.seed(42)
-        q_values = {category: float(np.random.uniform(0, 1)) for category in user_responses.keys()}
-        
-        # Reinforcement Learning Parameters
-        alpha = 0.1  # Learning rate
-        gamma = 0.9  # Discount factor
-        
-        # Updating Q-values iteratively based on reinforcement learning and user-defined weights
-        for _ in range(10):
-            for category in user_responses.keys():
-                # Reward is now based on both user weightage and category score
-                reward = normalized_user_weightages[category] * category_scores[category]
-                
-                # Q-value update incorporating user weightage and category score
-                q_values[category] += alpha * (reward + gamma * max(q_values.values()) - q_values[category])
-        
-        # Compute Softmax Weights Using User Weightages and Q-values
-        eta = 1.0  # Softmax scaling parameter
-        exp_q_values = np.exp(eta * np.array([
-            q_values[cat] * normalized_user_weightages[cat] * category_scores[cat] 
-            for cat in user_responses.keys()
-        ]))
-        softmax_weights_array = exp_q_values / np.sum(exp_q_values)
+        user_responses, user_weightages = collect_category_responses(assessment_response, snapshot)
+
+        # Score off the event loop through the shared engine as a batch of one
+        solver = assessment_response.solver
+        scoring = run_scoring(
+            score_assessments,
+            [assessment_type],
+            [list(user_responses)],
+            [list(user_responses.values())],
+            [list(user_weightages.values())],
+            solver=solver.mode,
+            tolerance=solver.tolerance,
+            max_iterations=solver.maxIterations,
+        )
+        if assessment_response.uncertainty is None:
+            result = (await scoring)[0]
+        else:
+            results, uncertainty = await asyncio.gather(
+                scoring, simulate_uncertainty(assessment_response, user_responses, user_weightages, cache_key)
+            )
+            result = {**results[0], "uncertainty": uncertainty}
         
-        # Convert to dictionary and apply constraints
-        adjusted_weights = {}
-        category_list = list(user_responses.keys())
+        result_cache.set(cache_key, result)
+        return AssessmentResult(**result)
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.post("/calculate-results/batch", response_model=List[AssessmentResult])
+async def calculate_results_batch(assessment_responses: List[AssessmentResponse]):
+    """
+    Score many assessments in a single request.
+
+    Assessments are grouped by their number of categories and solver options,
+    and each group is packed into answer/weight matrices and scored as one
+    array computation.
+    Results are returned in the same order as the submitted assessments.
+    """
+    try:
+        if not assessment_responses:
+            raise HTTPException(status_code=400, detail="At least one assessment is required")
         
-        for i, category in enumerate(category_list):
-            # Original user weight as percentage
-            original_weight_pct = normalized_user_weightages[category] * 100
+        # Validate every assessment not already in the result cache and
+        # bucket it by category count
+        snapshot = questionnaire_store.snapshot
+        results = [None] * len(assessment_responses)
+        cache_keys = [submission_digest(assessment_response, snapshot.version) for assessment_response in assessment_responses]
+        buckets = {}
+        simulations = []
+        for index, assessment_response in enumerate(assessment_responses):
+            results[index] = result_cache.get(cache_keys[index])
+            if results[index] is not None:
+                continue
             
-            # Convert softmax weight to percentage
-            softmax_weight_pct = softmax_weights_array[i] * 100
+            assessment_type = assessment_response.assessmentType
+            user_responses, user_weightages = collect_category_responses(assessment_response, snapshot, f"Assessment {index}: ")
             
-            # Apply ±2% constraint
-            min_limit = original_weight_pct - 2
-            max_limit = original_weight_pct + 2
-            adjusted_weights[category] = max(min_limit, min(softmax_weight_pct, max_limit))
-        
-        # Normalize Adjusted Weights to Sum to 100%
-        total_adjusted_weight = sum(adjusted_weights.values())
-        adjusted_weights = {category: (weight / total_adjusted_weight) * 100 for category, weight in adjusted_weights.items()}
-        
-        # Convert back to proportion (0-1) for calculation
-        adjusted_weights_prop = {category: weight / 100 for category, weight in adjusted_weights.items()}
+            solver = assessment_response.solver
+            bucket = (len(user_responses), solver.mode, solver.tolerance, solver.maxIterations)
+            buckets.setdefault(bucket, []).append(
+                (index, assessment_type, list(user_responses), list(user_responses.values()), list(user_weightages.values()))
+            )
+            if assessment_response.uncertainty is not None:
+                simulations.append((index, user_responses, user_weightages))
         
-        # Compute Final AI Data Readiness Score (Weighted Sum)
-        overall_score = sum(category_scores[cat] * adjusted_weights_prop[cat] for cat in user_responses.keys())
+        # Score each bucket as a single batch on the scoring executor
+        scoring_tasks = []
+        for (_, mode, tolerance, max_iterations), items in buckets.items():
+            _, assessment_types, categories, answer_lists, weights = zip(*items)
+            scoring_tasks.append(run_scoring(
+                score_assessments,
+                assessment_types,
+                categories,
+                answer_lists,
+                weights,
+                solver=mode,
+                tolerance=tolerance,
+                max_iterations=max_iterations,
+            ))
+        simulation_tasks = [
+            simulate_uncertainty(assessment_responses[index], user_responses, user_weightages, cache_keys[index])
+            for index, user_responses, user_weightages in simulations
+        ]
+        gathered = await asyncio.gather(*scoring_tasks, *simulation_tasks)
+        scored_buckets, simulated = gathered[:len(scoring_tasks)], gathered[len(scoring_tasks):]
         
-        # Scale scores to percentages (0-100)
-        category_scores = {k: v * 25 for k, v in category_scores.items()}  # Scale from 1-4 to 25-100
-        overall_score = overall_score * 25  # Scale from 1-4 to 25-100
+        for items, bucket_results in zip(buckets.values(), scored_buckets):
+            for (index, *_), result in zip(items, bucket_results):
+                results[index] = result
+        for (index, *_), uncertainty in zip(simulations, simulated):
+            results[index] = {**results[index], "uncertainty": uncertainty}
+        for items in buckets.values():
+            for index, *_ in items:
+                result_cache.set(cache_keys[index], results[index])
         
-        # Convert user_weightages back to percentages for the response
-        user_weights_pct = {category: weight * 100 for category, weight in normalized_user_weightages.items()}
+        return results
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+@app.post("/calculate-results/sweep", response_model=WeightSweepResult)
+async def calculate_results_sweep(sweep: WeightSweepRequest):
+    """
+    Score one assessment under many candidate category weight vectors.
+
+    All scenarios are scored as one array computation over the shared
+    category means, so each result matches what ``/calculate-results``
+    returns for the same weights.
+    """
+    try:
+        if sweep.uncertainty is not None:
+            raise HTTPException(status_code=400, detail="Uncertainty is not supported for sweeps")
+        user_responses, user_weightages = collect_category_responses(sweep, questionnaire_store.snapshot)
+        categories = list(user_responses)
+        baseline = list(user_weightages.values())
+        weights = build_scenarios(categories, baseline, sweep.scenarios, sweep.grid, SWEEP_MAX_SCENARIOS)
         
-        return AssessmentResult(
-            assessmentType=assessment_type,
-            categoryScores=category_scores,
-            userWeights=user_weights_pct,
-            qValues=q_values,
-            adjustedWeights=adjusted_weights,
-            overallScore=overall_score
+        solver = sweep.solver
+        result = await run_scoring(
+            sweep_weights,
+            categories,
+            list(user_responses.values()),
+            baseline,
+            weights,
+            solver=solver.mode,
+            tolerance=solver.tolerance,
+            max_iterations=solver.maxIterations,
         )
+        # Sweeps can hold tens of thousands of rows, so serialize them in one
+        # step instead of having the response model re-validate every value
+        body = WeightSweepResult(assessmentType=sweep.assessmentType, **result).model_dump_json()
+        return Response(content=body, media_type="application/json")
     
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-@app.get("/recommendations/{assessment_type}/{category}")
-def get_recommendations(assessment_type: str, category: str, score: float):
-    # Note: Implement recommendations or import from proper module
+@app.post("/calculate-results/hierarchy", response_model=HierarchicalResult)
+async def calculate_results_hierarchy(assessment: HierarchicalAssessment):
+    """
+    Score answers to the question bank as a pillar -> category -> question tree.
+
+    Uses the layout compiled with the current question bank version. Weights
+    are adjusted at every level: the questions of each category, the
+    categories of each pillar and the pillars are each scored like the
+    categories of ``/calculate-results``. Returns the full score tree.
+    """
     try:
-        from backend.utils import get_recommendations
-        return get_recommendations(category, score)
-    except ImportError:
-        # Fallback if module doesn't exist
-        return {
-            "low": ["Recommendation for low scores"],
-            "medium": ["Recommendation for medium scores"],
-            "high": ["Recommendation for high scores"]
-        }
+        bank = question_bank_store.snapshot
+        layout = bank.hierarchy
+        selection = layout.select(assessment.pillars)
+        hierarchy = layout.pack(selection, assessment.answers, assessment.pillarWeights, assessment.categoryWeights)
+        solver = assessment.solver
+        result = await run_scoring(
+            score_hierarchy,
+            hierarchy,
+            layout.names(selection),
+            solver=solver.mode,
+            tolerance=solver.tolerance,
+            max_iterations=solver.maxIterations,
+        )
+        result["version"] = bank.version
+        return HierarchicalResult(**result)
+    
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+# Score that bulk recommendations rank categories against
+RECOMMENDATION_TARGET_SCORE = float(os.getenv("RECOMMENDATION_TARGET_SCORE", "80"))
+
+class CategoryRecommendation(BaseModel):
+    category: str
+    score: float
+    target: float
+    gap: float  # target - score; negative once the target is met
+    color: str
+    strengthComment: str
+    improvementComment: str
+    recommendations: List[str]
+
+class RecommendationReport(BaseModel):
+    assessmentType: str
+    overallScore: float
+    color: str
+    target: float
+    categories: List[CategoryRecommendation]  # Largest gap first
+
+# Compile the catalog for the pillars and every category of the questionnaires
+# on startup; categories added later are compiled on first use
+@app.on_event("startup")
+def compile_recommendation_catalog():
+    snapshot = questionnaire_store.snapshot
+    recommendation_catalog.compile(PILLARS)
+    recommendation_catalog.compile(
+        name for type_index in snapshot.index.values() for name in type_index.category_names
+    )
+
+@app.get("/recommendations/{assessment_type}/{category}", response_model=CategoryRecommendation)
+def get_category_recommendations(
+    assessment_type: str,
+    category: str,
+    score: float,
+    target: float = Query(RECOMMENDATION_TARGET_SCORE, ge=0, le=100),
+):
+    """Comments, color and recommendations for one category score (0-100)."""
+    return recommendation_catalog.category_report(category, score, target)
+
+@app.post("/recommendations", response_model=RecommendationReport)
+def get_assessment_recommendations(
+    result: AssessmentResult,
+    target: float = Query(RECOMMENDATION_TARGET_SCORE, ge=0, le=100),
+):
+    """
+    Recommendations for every category of an assessment result.
+
+    Takes a result as returned by ``/calculate-results`` and returns each
+    category's comments, color and recommendations, ranked by how far its
+    score falls short of ``target``.
+    """
+    return {
+        "assessmentType": result.assessmentType,
+        "overallScore": result.overallScore,
+        "color": score_color(result.overallScore),
+        "target": target,
+        "categories": recommendation_catalog.report(result.categoryScores, target),
+    }
 
 # User management endpoints
 @app.post("/token", response_model=Token)
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -397,25 +1243,13 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
         )
     
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    principal = principal_from_user(parse_user_roles(user), membership_index.companies(user.id))
     access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email},
+        expires_delta=access_token_expires,
+        scope=scope_claims(principal, user.scope_version),
     )
     
-    # Convert user.roles to a Python list if it's stored as JSON string
-    user_roles = []
-    if hasattr(user, 'roles') and user.roles:
-        if isinstance(user.roles, str):
-            try:
-                user_roles = json.loads(user.roles)
-            except:
-                user_roles = []
-        else:
-            user_roles = user.roles
-    
-    # Use legacy role as fallback
-    if not user_roles and user.role:
-        user_roles = [user.role]
-    
     return {
         "access_token": access_token,
         "token_type": "bearer",
@@ -424,7 +1258,7 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
             "email": user.email,
             "name": user.name,
             "role": user.role,  # Include legacy role for backward compatibility
-            "roles": user_roles
+            "roles": list(principal.roles)
         }
     }
 
@@ -446,15 +1280,12 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     # Set a primary role for backward compatibility
     primary_role = roles[0] if roles else None
     
-    # Convert roles to JSON string for storage
-    roles_json = json.dumps(roles)
-    
     db_user = User(
         id=user_id,
         email=user.email,
         name=user.name,
         role=primary_role,  # Legacy field, set to first role for compatibility
-        roles=roles_json,   # Store as JSON string
+        roles=roles,        # Stored in user_role_association
         hashed_password=hashed_password
     )
     
@@ -464,28 +1295,26 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     return parse_user_roles(db_user)
 
 @app.get("/users", response_model=List[UserResponse])
-def read_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if user has admin role in their roles list
-    is_admin = 'admin' in (current_user.roles if hasattr(current_user, 'roles') and current_user.roles else [current_user.role])
-    
-    if not is_admin:
-        raise HTTPException(status_code=403, detail="Not authorized to view all users")
-    
-    users = db.query(User).offset(skip).limit(limit).all()
+def read_users(skip: int = 0, limit: int = 100, role: Optional[str] = None, db: Session = Depends(get_db), current_user: Principal = Depends(require_admin)):
+    query = db.query(User)
+    if role:
+        # Answered from the (role, user_id) index of user_role_association
+        query = query.join(UserRole, UserRole.user_id == User.id).filter(UserRole.role == role)
+    users = query.offset(skip).limit(limit).all()
     # Parse roles for each user
     return [parse_user_roles(user) for user in users]
 
 @app.get("/users/me", response_model=UserResponse)
-def read_user_me(current_user: User = Depends(get_current_user)):
-    # No need to parse roles again as get_current_user already does it
-    return current_user
+def read_user_me(db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    db_user = db.query(User).filter(User.id == current_user.id).first()
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    return parse_user_roles(db_user)
 
 @app.get("/users/{user_id}", response_model=UserResponse)
-def read_user(user_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if user has admin role in their roles list
-    is_admin = 'admin' in (current_user.roles if hasattr(current_user, 'roles') and current_user.roles else [current_user.role])
-    
-    if not is_admin and current_user.id != user_id:
+def read_user(user_id: str, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    # Admins can view any user, regular users only themselves
+    if not current_user.is_admin and current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to view this user")
     
     db_user = db.query(User).filter(User.id == user_id).first()
@@ -494,11 +1323,9 @@ def read_user(user_id: str, db: Session = Depends(get_db), current_user: User =
     return parse_user_roles(db_user)
 
 @app.put("/users/{user_id}", response_model=UserResponse)
-def update_user(user_id: str, user: UserUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def update_user(user_id: str, user: UserUpdate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     # Only admins can update any user, regular users can only update themselves
-    is_admin = 'admin' in (current_user.roles if hasattr(current_user, 'roles') and current_user.roles else [current_user.role])
-    
-    if not is_admin and current_user.id != user_id:
+    if not current_user.is_admin and current_user.id != user_id:
         raise HTTPException(status_code=403, detail="Not authorized to update this user")
     
     # Check if user exists
@@ -518,8 +1345,8 @@ def update_user(user_id: str, user: UserUpdate, db: Session = Depends(get_db), c
     
     # Update roles
     if hasattr(user, 'roles') and user.roles:
-        # Store roles as JSON string
-        db_user.roles = json.dumps(user.roles)
+        # Replaces the user's rows in user_role_association
+        db_user.roles = user.roles
         # Update legacy role field for backward compatibility
         db_user.role = user.roles[0] if user.roles else None
     
@@ -528,19 +1355,15 @@ def update_user(user_id: str, user: UserUpdate, db: Session = Depends(get_db), c
         db_user.hashed_password = get_password_hash(user.password)
     
     db_user.updated_at = datetime.utcnow()
+    db_user.scope_version = (db_user.scope_version or 0) + 1
     
     db.commit()
+    principal_cache.invalidate_users([user_id])
     db.refresh(db_user)
     return parse_user_roles(db_user)
 
 @app.delete("/users/{user_id}")
-def delete_user(user_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Only admins can delete users
-    is_admin = 'admin' in (current_user.roles if hasattr(current_user, 'roles') and current_user.roles else [current_user.role])
-    
-    if not is_admin:
-        raise HTTPException(status_code=403, detail="Not authorized to delete users")
-    
+def delete_user(user_id: str, db: Session = Depends(get_db), current_user: Principal = Depends(require_admin)):
     # Prevent admins from deleting their own account
     if current_user.id == user_id:
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
@@ -553,6 +1376,8 @@ def delete_user(user_id: str, db: Session = Depends(get_db), current_user: User
     # Delete user
     db.delete(db_user)
     db.commit()
+    membership_index.remove_user(user_id)
+    principal_cache.invalidate_users([user_id])
     return {"detail": "User deleted successfully"}
 
 # Company management endpoints
@@ -564,13 +1389,7 @@ def get_public_companies(db: Session = Depends(get_db)):
     return [{"id": company.id, "name": company.name} for company in companies]
 
 @app.post("/companies", response_model=CompanyResponse)
-def create_company(company: CompanyCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if user has admin role
-    is_admin = 'admin' in (current_user.roles if hasattr(current_user, 'roles') and current_user.roles else [current_user.role])
-    
-    if not is_admin:
-        raise HTTPException(status_code=403, detail="Not authorized to create companies")
-    
+def create_company(company: CompanyCreate, db: Session = Depends(get_db), current_user: Principal = Depends(require_admin)):
     # Get the highest existing company ID
     highest_company = db.query(Company).order_by(Company.id.desc()).first()
     
@@ -605,12 +1424,13 @@ def create_company(company: CompanyCreate, db: Session = Depends(get_db), curren
     db.add(db_company)
     db.commit()
     db.refresh(db_company)
+    pregeneration_queue.enqueue(db_company.id)
     return db_company
 
 @app.get("/companies", response_model=List[CompanyResponse])
-def read_companies(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def read_companies(skip: int = 0, limit: int = 100, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     # Check if user has admin role in their roles list
-    is_admin = 'admin' in (current_user.roles if hasattr(current_user, 'roles') and current_user.roles else [current_user.role])
+    is_admin = current_user.is_admin
     
     # Add logging to troubleshoot
     logger.info(f"User {current_user.id} ({current_user.email}) requesting companies. Is admin: {is_admin}")
@@ -628,14 +1448,7 @@ def read_companies(skip: int = 0, limit: int = 100, db: Session = Depends(get_db
     return companies
 
 @app.get("/companies/{company_id}", response_model=CompanyResponse)
-def read_company(company_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if user has admin role or is assigned to this company
-    is_admin = 'admin' in (current_user.roles if hasattr(current_user, 'roles') and current_user.roles else [current_user.role])
-    has_access = is_admin or any(c.id == company_id for c in current_user.companies)
-    
-    if not has_access:
-        raise HTTPException(status_code=403, detail="Not authorized to view this company")
-    
+def read_company(company_id: str, db: Session = Depends(get_db), current_user: Principal = Depends(require_company_access)):
     db_company = db.query(Company).filter(Company.id == company_id).first()
     if db_company is None:
         raise HTTPException(status_code=404, detail="Company not found")
@@ -643,13 +1456,7 @@ def read_company(company_id: str, db: Session = Depends(get_db), current_user: U
     return db_company
 
 @app.put("/companies/{company_id}", response_model=CompanyResponse)
-def update_company(company_id: str, company: CompanyCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if user has admin role
-    is_admin = 'admin' in (current_user.roles if hasattr(current_user, 'roles') and current_user.roles else [current_user.role])
-    
-    if not is_admin:
-        raise HTTPException(status_code=403, detail="Not authorized to update companies")
-    
+def update_company(company_id: str, company: CompanyCreate, db: Session = Depends(get_db), current_user: Principal = Depends(require_admin)):
     db_company = db.query(Company).filter(Company.id == company_id).first()
     if db_company is None:
         raise HTTPException(status_code=404, detail="Company not found")
@@ -665,33 +1472,28 @@ def update_company(company_id: str, company: CompanyCreate, db: Session = Depend
     
     db.commit()
     db.refresh(db_company)
+    invalidate_personalized_cache(company_id)
+    pregeneration_queue.enqueue(company_id)
     return db_company
 
 @app.delete("/companies/{company_id}")
-def delete_company(company_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if user has admin role in their roles array
-    is_admin = 'admin' in (current_user.roles if hasattr(current_user, 'roles') and current_user.roles else [current_user.role])
-    
-    if not is_admin:
-        raise HTTPException(status_code=403, detail="Not authorized to delete companies")
-    
+def delete_company(company_id: str, db: Session = Depends(get_db), current_user: Principal = Depends(require_admin)):
     db_company = db.query(Company).filter(Company.id == company_id).first()
     if db_company is None:
         raise HTTPException(status_code=404, detail="Company not found")
     
+    bump_scope_versions(db, [user.id for user in db_company.users])
     db.delete(db_company)
     db.commit()
+    invalidate_personalized_cache(company_id)
+    membership_index.remove_company(company_id)
+    principal_cache.invalidate(lambda principal: company_id in principal.company_ids)
+    pregeneration_queue.forget(company_id)
     return {"detail": "Company deleted successfully"}
 
 # Company-User assignment endpoints
 @app.post("/companies/{company_id}/assign-users")
-def assign_users_to_company(company_id: str, assignment: CompanyUserAssignment, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if user has admin role in their roles array
-    is_admin = 'admin' in (current_user.roles if hasattr(current_user, 'roles') and current_user.roles else [current_user.role])
-    
-    if not is_admin:
-        raise HTTPException(status_code=403, detail="Not authorized to assign users")
-    
+def assign_users_to_company(company_id: str, assignment: CompanyUserAssignment, db: Session = Depends(get_db), current_user: Principal = Depends(require_admin)):
     # Validate company exists
     db_company = db.query(Company).filter(Company.id == company_id).first()
     if db_company is None:
@@ -717,6 +1519,9 @@ def assign_users_to_company(company_id: str, assignment: CompanyUserAssignment,
         db_user = db.query(User).filter(User.id == user_id).first()
         db_company.users.append(db_user)
     
+    # Tokens of both the previously and the newly assigned users name stale companies
+    bump_scope_versions(db, {u.id for u in current_users} | set(assignment.user_ids))
+    
     # Log after update for verification
     logger.info(f"Updated company {company_id} with new user assignments: {assignment.user_ids}")
     
@@ -728,17 +1533,17 @@ def assign_users_to_company(company_id: str, assignment: CompanyUserAssignment,
         logger.error(f"Error committing user assignments: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to save user assignments: {str(e)}")
     
+    membership_index.set_company_users(company_id, assignment.user_ids)
+    
+    # Both the previously and the newly assigned users' company sets changed
+    assigned_user_ids = frozenset(assignment.user_ids)
+    principal_cache.invalidate(
+        lambda principal: company_id in principal.company_ids or principal.id in assigned_user_ids
+    )
     return {"detail": "Users assigned successfully"}
 
 @app.get("/companies/{company_id}/users", response_model=List[UserResponse])
-def get_company_users(company_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if user has access to this company
-    is_admin = 'admin' in (current_user.roles if hasattr(current_user, 'roles') and current_user.roles else [current_user.role])
-    has_access = is_admin or any(c.id == company_id for c in current_user.companies)
-    
-    if not has_access:
-        raise HTTPException(status_code=403, detail="Not authorized to view users for this company")
-    
+def get_company_users(company_id: str, db: Session = Depends(get_db), current_user: Principal = Depends(require_company_access)):
     # Get the company
     db_company = db.query(Company).filter(Company.id == company_id).first()
     if db_company is None:
@@ -775,6 +1580,7 @@ class AssessmentResponseNew(BaseModel):
     status: str
     score: Optional[float] = None
     data: Optional[Dict] = None
+    category_scores: Optional[Dict[str, float]] = None
     completed_at: Optional[datetime] = None
     completed_by_id: Optional[str] = None
     created_at: datetime
@@ -782,7 +1588,7 @@ class AssessmentResponseNew(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 @app.post("/assessments", response_model=AssessmentResponseNew)
-def create_assessment(assessment: AssessmentCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def create_assessment(assessment: AssessmentCreate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     # ... (authorization and company existence checks) ...
 
     assessment_id = f"assessment_{uuid.uuid4()}"
@@ -793,6 +1599,7 @@ def create_assessment(assessment: AssessmentCreate, db: Session = Depends(get_db
         status=assessment.status,
         score=assessment.score,
         data=assessment.data,
+        category_scores=category_means_from_data(assessment.data),
         completed_at=assessment.completed_at,
         completed_by_id=current_user.id if assessment.status == "completed" else None,
         created_at=datetime.utcnow(),  # Explicitly set created_at
@@ -838,25 +1645,9 @@ def create_assessment(assessment: AssessmentCreate, db: Session = Depends(get_db
 #     return db_assessment
 
 @app.get("/companies/{company_id}/assessments")
-def get_company_assessments(company_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if user has access to this company
+def get_company_assessments(company_id: str, db: Session = Depends(get_db), current_user: Principal = Depends(require_company_access)):
     logger.info(f"User {current_user.id} ({current_user.email}) requesting assessments for company {company_id}")
     
-    # Check if user has admin role in their roles array
-    is_admin = 'admin' in (current_user.roles if hasattr(current_user, 'roles') and current_user.roles else [current_user.role])
-    logger.info(f"User is admin: {is_admin}")
-    
-    # List user's assigned companies for debugging
-    user_company_ids = [c.id for c in current_user.companies]
-    logger.info(f"User is assigned to companies: {user_company_ids}")
-    
-    # Check if user has access to this company
-    has_access = is_admin or any(c.id == company_id for c in current_user.companies)
-    
-    if not has_access:
-        logger.warning(f"User {current_user.id} denied access to assessments for company {company_id}")
-        raise HTTPException(status_code=403, detail="Not authorized to view assessments for this company")
-    
     db_company = db.query(Company).filter(Company.id == company_id).first()
     if db_company is None:
         logger.warning(f"Company {company_id} not found")
@@ -892,42 +1683,31 @@ def get_company_assessments(company_id: str, db: Session = Depends(get_db), curr
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @app.get("/assessments/{assessment_id}", response_model=AssessmentResponse)
-def get_assessment(assessment_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def get_assessment(assessment_id: str, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     db_assessment = db.query(Assessment).filter(Assessment.id == assessment_id).first()
     if db_assessment is None:
         raise HTTPException(status_code=404, detail="Assessment not found")
     
-    # Check if user has admin role in their roles array
-    is_admin = 'admin' in (current_user.roles if hasattr(current_user, 'roles') and current_user.roles else [current_user.role])
-    
     # Check if user has access to this company
-    has_access = is_admin or any(c.id == db_assessment.company_id for c in current_user.companies)
-    
-    if not has_access:
-        raise HTTPException(status_code=403, detail="Not authorized to view this assessment")
+    check_company_access(current_user, db_assessment.company_id, "Not authorized to view this assessment")
     
     return db_assessment
 
 @app.put("/assessments/{assessment_id}", response_model=AssessmentResponse)
-def update_assessment(assessment_id: str, assessment: AssessmentCreate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
+def update_assessment(assessment_id: str, assessment: AssessmentCreate, db: Session = Depends(get_db), current_user: Principal = Depends(get_current_user)):
     db_assessment = db.query(Assessment).filter(Assessment.id == assessment_id).first()
     if db_assessment is None:
         raise HTTPException(status_code=404, detail="Assessment not found")
     
-    # Check if user has admin role in their roles array
-    is_admin = 'admin' in (current_user.roles if hasattr(current_user, 'roles') and current_user.roles else [current_user.role])
-    
     # Check if user has access to this company
-    has_access = is_admin or any(c.id == db_assessment.company_id for c in current_user.companies)
-    
-    if not has_access:
-        raise HTTPException(status_code=403, detail="Not authorized to update this assessment")
+    check_company_access(current_user, db_assessment.company_id, "Not authorized to update this assessment")
     
     # Update assessment fields
     db_assessment.assessment_type = assessment.assessment_type
     db_assessment.status = assessment.status
     db_assessment.score = assessment.score
     db_assessment.data = assessment.data
+    db_assessment.category_scores = category_means_from_data(assessment.data)
     
     if assessment.status == "completed" and db_assessment.status != "completed":
         db_assessment.completed_at = datetime.now()
@@ -948,8 +1728,7 @@ def get_default_weights(db: Session = Depends(get_db)):
     
     # If no default weights exist, create them with equal distribution
     if not default_weights:
-        default_pillars = ["AI Governance", "AI Culture", "AI Infrastructure", "AI Strategy", 
-                          "AI Data", "AI Talent", "AI Security"]
+        default_pillars = list(PILLARS)
         equal_weight = 100.0 / len(default_pillars)
         rounded_weight = round(equal_weight, 1)
         
@@ -982,11 +1761,7 @@ def get_default_weights(db: Session = Depends(get_db)):
 
 # Update default weights
 @app.put("/weights/defaults")
-def update_default_weights(weights: CompanyWeightsUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Only admin can update default weights
-    if current_user.role != "admin":
-        raise HTTPException(status_code=403, detail="Only admin can update default weights")
-    
+def update_default_weights(weights: CompanyWeightsUpdate, db: Session = Depends(get_db), current_user: Principal = Depends(require_admin)):
     # Validate total weight is approximately 100
     total_weight = sum(weights.weights.values())
     if abs(total_weight - 100.0) > 0.1:
@@ -1013,43 +1788,39 @@ def update_default_weights(weights: CompanyWeightsUpdate, db: Session = Depends(
 
 # Get company weights
 @app.get("/companies/{company_id}/weights")
-def get_company_weights(company_id: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if company exists and user has access
+def get_company_weights(company_id: str, db: Session = Depends(get_db), current_user: Principal = Depends(require_company_access)):
+    # Check if company exists
     company = db.query(Company).filter(Company.id == company_id).first()
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
-    # Admin can access any company, others only their assigned companies
-    if current_user.role != "admin" and company not in current_user.companies:
-        raise HTTPException(status_code=403, detail="Access denied to this company")
-    
+    weights, _ = resolve_pillar_weights(company_id, db)
+    return weights
+
+def resolve_pillar_weights(company_id: str, db: Session):
+    """Return the company's effective pillar weights and whether they are "company" or "default" weights."""
     # Get company pillar weights
     db_weights = db.query(CompanyPillarWeight).filter(CompanyPillarWeight.company_id == company_id).all()
     
     # If no company weights, use default weights
     if not db_weights:
-        default_weights = get_default_weights(db)
-        return default_weights
+        return get_default_weights(db), "default"
     
     # Convert to dictionary for API response
     result = {}
     for weight in db_weights:
         result[weight.pillar] = weight.weight
     
-    return result
+    return result, "company"
 
 # Update company weights
 @app.put("/companies/{company_id}/weights")
-def update_company_weights(company_id: str, weights: CompanyWeightsUpdate, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if company exists and user has access
+def update_company_weights(company_id: str, weights: CompanyWeightsUpdate, db: Session = Depends(get_db), current_user: Principal = Depends(require_company_access)):
+    # Check if company exists
     company = db.query(Company).filter(Company.id == company_id).first()
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
-    # Admin can access any company, others only their assigned companies
-    if current_user.role != "admin" and company not in current_user.companies:
-        raise HTTPException(status_code=403, detail="Access denied to this company")
-    
     # Validate total weight is approximately 100
     total_weight = sum(weights.weights.values())
     if abs(total_weight - 100.0) > 0.1:
@@ -1075,16 +1846,12 @@ def update_company_weights(company_id: str, weights: CompanyWeightsUpdate, db: S
 
 # Get category weights for a specific pillar
 @app.get("/companies/{company_id}/weights/{pillar}")
-def get_category_weights(company_id: str, pillar: str, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if company exists and user has access
+def get_category_weights(company_id: str, pillar: str, db: Session = Depends(get_db), current_user: Principal = Depends(require_company_access)):
+    # Check if company exists
     company = db.query(Company).filter(Company.id == company_id).first()
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
-    # Admin can access any company, others only their assigned companies
-    if current_user.role != "admin" and company not in current_user.companies:
-        raise HTTPException(status_code=403, detail="Access denied to this company")
-    
     # Get category weights for this pillar
     db_weights = db.query(CategoryWeight).filter(
         CategoryWeight.company_id == company_id,
@@ -1100,16 +1867,12 @@ def get_category_weights(company_id: str, pillar: str, db: Session = Depends(get
 
 # Update category weights for a specific pillar
 @app.put("/companies/{company_id}/weights/{pillar}")
-def update_category_weights(company_id: str, pillar: str, request: Dict[str, Any], db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
-    # Check if company exists and user has access
+def update_category_weights(company_id: str, pillar: str, request: Dict[str, Any], db: Session = Depends(get_db), current_user: Principal = Depends(require_company_access)):
+    # Check if company exists
     company = db.query(Company).filter(Company.id == company_id).first()
     if not company:
         raise HTTPException(status_code=404, detail="Company not found")
     
-    # Admin can access any company, others only their assigned companies
-    if current_user.role != "admin" and company not in current_user.companies:
-        raise HTTPException(status_code=403, detail="Access denied to this company")
-    
     # Handle different input formats - weights could be directly in the body or under a 'weights' key
     weights_data = {}
     if 'weights' in request and isinstance(request['weights'], dict):
@@ -1143,17 +1906,96 @@ def update_category_weights(company_id: str, pillar: str, request: Dict[str, Any
         )
         db.add(db_weight)
     
+    # Re-score the company's stored assessments for this pillar from their
+    # saved category scores, so they reflect the new weights
+    if weights_data:
+        affected = db.query(Assessment).filter(
+            Assessment.company_id == company_id,
+            Assessment.assessment_type == pillar,
+            Assessment.category_scores.isnot(None)
+        ).all()
+        rescored = rescore_with_weights(affected, weights_data)
+        logger.info(f"Re-scored {len(rescored)} of {len(affected)} stored {pillar} assessments for company {company_id}")
+    
     db.commit()
     
     # Return updated weights
     return get_category_weights(company_id, pillar, db, current_user)
 
+# Get the enterprise-wide readiness score across all pillars
+@app.get("/companies/{company_id}/readiness")
+def get_company_readiness(company_id: str, db: Session = Depends(get_db), current_user: Principal = Depends(require_company_access)):
+    """
+    Score the company's overall AI readiness from its latest completed
+    assessment of each pillar, weighted by the effective pillar weights.
+    """
+    # Check if company exists
+    company = db.query(Company).filter(Company.id == company_id).first()
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found")
+    
+    pillar_weights, weight_source = resolve_pillar_weights(company_id, db)
+    
+    # Latest completed assessment of each pillar
+    latest = {}
+    completed = db.query(Assessment).filter(
+        Assessment.company_id == company_id,
+        Assessment.status == "completed",
+        Assessment.score.isnot(None)
+    ).order_by(Assessment.completed_at.desc(), Assessment.updated_at.desc())
+    for assessment in completed:
+        latest.setdefault(assessment.assessment_type, assessment)
+    
+    # Category weights of every pillar, fetched in one query
+    category_weights = {}
+    for weight in db.query(CategoryWeight).filter(CategoryWeight.company_id == company_id):
+        category_weights.setdefault(weight.pillar, {})[weight.category] = weight.weight
+    
+    # Pillars with stored category means are re-scored with the current
+    # category weights in one pass; the others keep their stored score
+    to_score = []
+    for pillar, assessment in latest.items():
+        if assessment.category_scores:
+            weights = category_weights_for(list(assessment.category_scores), category_weights.get(pillar), assessment.data)
+            if weights is not None:
+                to_score.append((pillar, assessment.category_scores, weights))
+    results = score_pillars(to_score)
+    
+    pillar_scores = {
+        pillar: results[pillar]["overallScore"] if pillar in results else stored_score(assessment.score, assessment.data)
+        for pillar, assessment in latest.items()
+    }
+    combined = combine_pillars(pillar_scores, pillar_weights)
+    
+    pillars = {}
+    for pillar in combined["effectiveWeights"]:
+        assessment = latest.get(pillar)
+        result = results.get(pillar)
+        pillars[pillar] = {
+            "score": pillar_scores.get(pillar),
+            "weight": pillar_weights.get(pillar, 0.0),
+            "effectiveWeight": combined["effectiveWeights"][pillar],
+            "source": None if assessment is None else ("rescored" if result else "stored"),
+            "assessmentId": assessment.id if assessment else None,
+            "completedAt": assessment.completed_at if assessment else None,
+            "categoryScores": result["categoryScores"] if result else None,
+            "adjustedWeights": result["adjustedWeights"] if result else None,
+        }
+    
+    return {
+        "companyId": company_id,
+        "overallScore": combined["overallScore"],
+        "coverage": combined["coverage"],
+        "weightSource": weight_source,
+        "pillars": pillars,
+    }
+
 # Add a new endpoint to submit personalized assessment responses
 @app.post("/assessments/personalized")
 def submit_personalized_assessment(
     assessment: Dict, 
     db: Session = Depends(get_db), 
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Submit responses for a personalized assessment with custom questions and options.
@@ -1164,10 +2006,7 @@ def submit_personalized_assessment(
         responses = assessment.get("responses", [])
         
         # Check if user has access to this company
-        has_access = current_user.role == "admin" or any(c.id == company_id for c in current_user.companies)
-        
-        if not has_access:
-            raise HTTPException(status_code=403, detail="Not authorized to submit assessments for this company")
+        check_company_access(current_user, company_id, "Not authorized to submit assessments for this company")
         
         # Calculate score
         # For personalized assessments with custom options, we calculate score based on 
@@ -1241,6 +2080,65 @@ def submit_personalized_assessment(
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Error submitting assessment: {str(e)}")
 
+# Portfolio re-scoring jobs, keyed by job id
+rescore_jobs: Dict[str, RescoreJob] = {}
+
+class RescoreRequest(BaseModel):
+    alpha: float = Field(DEFAULT_PARAMS.alpha, gt=0, le=1)
+    gamma: float = Field(DEFAULT_PARAMS.gamma, ge=0, lt=1)
+    eta: float = Field(DEFAULT_PARAMS.eta, gt=0)
+    weightClamp: float = Field(DEFAULT_PARAMS.weight_clamp, ge=0)
+    chunkSize: int = Field(DEFAULT_CHUNK_SIZE, ge=1)
+    workers: Optional[int] = Field(None, ge=0)
+    assessmentType: Optional[str] = None
+    dryRun: bool = False
+
+def run_rescore_job(job: RescoreJob):
+    try:
+        final_status = job.run()
+        logger.info(f"Re-scoring job {job.id} finished: {final_status}")
+    except Exception as e:
+        logger.error(f"Re-scoring job {job.id} failed: {str(e)}")
+        logger.exception(e)
+
+@app.post("/admin/rescore", status_code=status.HTTP_202_ACCEPTED)
+def start_rescore_job(request: RescoreRequest, current_user: Principal = Depends(require_admin)):
+    """
+    Start re-scoring every stored assessment from its saved responses.
+
+    Overriding the scoring parameters requires ``dryRun``, so stored scores
+    always match the parameters used for new submissions.
+
+    The job runs in the background on a process pool; poll
+    ``GET /admin/rescore/{job_id}`` for progress and throughput.
+    """
+    running = next((job for job in rescore_jobs.values() if job.running), None)
+    if running is not None:
+        raise HTTPException(status_code=409, detail=f"Re-scoring job {running.id} is already running")
+
+    try:
+        job = RescoreJob(
+            engine,
+            params=ScoringParams(alpha=request.alpha, gamma=request.gamma, eta=request.eta, weight_clamp=request.weightClamp),
+            chunk_size=request.chunkSize,
+            workers=request.workers,
+            assessment_type=request.assessmentType,
+            dry_run=request.dryRun,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    rescore_jobs[job.id] = job
+    threading.Thread(target=run_rescore_job, args=(job,), name=f"rescore-{job.id}", daemon=True).start()
+    logger.info(f"Started re-scoring job {job.id} for {current_user.email}")
+    return job.status()
+
+@app.get("/admin/rescore/{job_id}")
+def get_rescore_job(job_id: str, current_user: Principal = Depends(require_admin)):
+    job = rescore_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Re-scoring job not found")
+    return job.status()
+
   # {
   #   "name": "TechInnovate Solutions",
   #   "industry": "Technology",
@@ -0,0 +1,150 @@
+"""
+In-memory company membership index.
+
+Maps each user to the frozen set of companies they are assigned to (and each
+company to its users), mirroring ``company_user_association``. It is built
+from the table once, on startup or first use, and then kept current by the
+endpoints that change assignments, so an access check is a dictionary and
+set lookup with no relationship loads. Changes made to the table outside
+this process (e.g. by the maintenance scripts or another worker) are picked
+up by ``load``, which ``start()`` re-runs every ``refresh_interval`` seconds.
+"""
+
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Set, Tuple
+
+logger = logging.getLogger("api.membership")
+
+MEMBERSHIP_REFRESH_INTERVAL = float(os.getenv("MEMBERSHIP_REFRESH_INTERVAL", "30"))  # seconds
+
+EMPTY: FrozenSet[str] = frozenset()
+
+
+class MembershipIndex:
+    """
+    user_id -> company ids index over the company/user assignments.
+
+    ``loader`` returns every ``(company_id, user_id)`` assignment. Readers get
+    immutable sets that are replaced, never modified, so lookups take no lock.
+    ``start()`` reloads the index every ``refresh_interval`` seconds in a
+    daemon thread, so changes made elsewhere (including revocations) take
+    effect within that interval.
+    """
+
+    def __init__(self, loader: Callable[[], Iterable[Tuple[str, str]]], refresh_interval: float = MEMBERSHIP_REFRESH_INTERVAL):
+        self.loader = loader
+        self.refresh_interval = refresh_interval
+        self._user_companies: Dict[str, FrozenSet[str]] = {}
+        self._company_users: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        self._stop = threading.Event()
+        self._thread = None
+        self.loads = 0
+        self.updates = 0
+        self.errors = 0
+
+    def load(self) -> None:
+        """(Re)build the index from ``loader``."""
+        with self._load_lock:
+            while True:
+                updates = self.updates
+                company_users: Dict[str, Set[str]] = {}
+                user_companies: Dict[str, Set[str]] = {}
+                for company_id, user_id in self.loader():
+                    company_users.setdefault(company_id, set()).add(user_id)
+                    user_companies.setdefault(user_id, set()).add(company_id)
+                with self._lock:
+                    # An update applied while reading may be missing from what was read
+                    if self.updates != updates:
+                        continue
+                    self._company_users = company_users
+                    self._user_companies = {user_id: frozenset(ids) for user_id, ids in user_companies.items()}
+                    self._loaded = True
+                    self.loads += 1
+                    return
+
+    def _ensure_loaded(self) -> None:
+        if not self._loaded:
+            with self._load_lock:
+                if self._loaded:
+                    return
+            self.load()
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.load()
+            except Exception as e:
+                # The current index stays in use until a reload succeeds
+                self.errors += 1
+                logger.exception(e)
+
+    def start(self) -> None:
+        """Start reloading the index in the background."""
+        if self._thread is not None or self.refresh_interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name="membership-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def companies(self, user_id: str) -> FrozenSet[str]:
+        self._ensure_loaded()
+        return self._user_companies.get(user_id, EMPTY)
+
+    def is_member(self, user_id: str, company_id: str) -> bool:
+        return company_id in self.companies(user_id)
+
+    def _set_user_companies(self, user_id: str, company_ids: FrozenSet[str]) -> None:
+        if company_ids:
+            self._user_companies[user_id] = company_ids
+        else:
+            self._user_companies.pop(user_id, None)
+
+    def set_company_users(self, company_id: str, user_ids: Iterable[str]) -> None:
+        """Record that ``company_id`` is now assigned to exactly ``user_ids``."""
+        self._ensure_loaded()
+        user_ids = set(user_ids)
+        with self._lock:
+            previous = self._company_users.get(company_id, set())
+            for user_id in previous - user_ids:
+                self._set_user_companies(user_id, self._user_companies.get(user_id, EMPTY) - {company_id})
+            for user_id in user_ids - previous:
+                self._set_user_companies(user_id, self._user_companies.get(user_id, EMPTY) | {company_id})
+            if user_ids:
+                self._company_users[company_id] = user_ids
+            else:
+                self._company_users.pop(company_id, None)
+            self.updates += 1
+
+    def remove_company(self, company_id: str) -> None:
+        self.set_company_users(company_id, ())
+
+    def remove_user(self, user_id: str) -> None:
+        self._ensure_loaded()
+        with self._lock:
+            for company_id in self._user_companies.pop(user_id, EMPTY):
+                self._company_users.get(company_id, set()).discard(user_id)
+            self.updates += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "users": len(self._user_companies),
+                "companies": len(self._company_users),
+                "assignments": sum(len(ids) for ids in self._user_companies.values()),
+                "loads": self.loads,
+                "updates": self.updates,
+                "errors": self.errors,
+                "refresh_interval": self.refresh_interval,
+            }
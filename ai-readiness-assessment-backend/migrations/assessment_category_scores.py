@@ -0,0 +1,101 @@
+"""
+Migration script to store per-category mean scores on assessments.
+
+This migration:
+1. Adds a new JSON 'category_scores' column to the assessments table if needed
+2. Backfills it from the responses saved in each assessment's data, in batches
+
+Run this script directly to apply the migration:
+python migrations/assessment_category_scores.py
+"""
+
+import sys
+import os
+import json
+from sqlalchemy import create_engine, text
+
+# Add the parent directory to the path so we can import from the main app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Import database connection string from config
+from database import DATABASE_URL, SessionLocal
+from rescoring import category_means_from_data
+
+# Initialize SQLAlchemy components
+engine = create_engine(DATABASE_URL)
+
+BATCH_SIZE = 500
+
+def run_migration():
+    print("Starting migration to add assessment category scores...")
+
+    # Create a session
+    session = SessionLocal()
+
+    try:
+        # 1. First check if the assessments table exists
+        print("Checking assessments table...")
+        result = session.execute(text("SELECT name FROM sqlite_master WHERE type='table' AND name='assessments'"))
+        if not result.fetchone():
+            print("Assessments table doesn't exist yet, creating tables...")
+            from models import Base
+            Base.metadata.create_all(bind=engine)
+            print("Database tables created successfully!")
+            return
+
+        # 2. Check and add the 'category_scores' column if needed
+        print("Checking 'category_scores' column in assessments table...")
+        result = session.execute(text("PRAGMA table_info(assessments)"))
+        columns = [row[1] for row in result.fetchall()]
+
+        if 'category_scores' not in columns:
+            print("Adding 'category_scores' column to assessments table...")
+            session.execute(text("ALTER TABLE assessments ADD COLUMN category_scores JSON DEFAULT NULL"))
+            session.commit()
+            print("Added 'category_scores' column to assessments table")
+        else:
+            print("Column 'category_scores' already exists, skipping")
+
+        # 3. Backfill category scores from the stored responses, one batch at a time
+        print("Backfilling 'category_scores' from stored responses...")
+        updated_count = 0
+        last_id = ""
+        while True:
+            rows = session.execute(
+                text("SELECT id, data FROM assessments WHERE category_scores IS NULL AND data IS NOT NULL AND id > :last_id ORDER BY id LIMIT :limit"),
+                {"last_id": last_id, "limit": BATCH_SIZE}
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            updates = []
+            for assessment_id, data in rows:
+                try:
+                    category_scores = category_means_from_data(json.loads(data) if isinstance(data, str) else data)
+                except ValueError:
+                    category_scores = None
+                if category_scores:
+                    updates.append({"id": assessment_id, "category_scores": json.dumps(category_scores)})
+
+            if updates:
+                session.execute(
+                    text("UPDATE assessments SET category_scores = :category_scores WHERE id = :id"),
+                    updates
+                )
+                session.commit()
+                updated_count += len(updates)
+
+        print(f"Backfilled category scores for {updated_count} assessments")
+
+        print("Assessment category scores migration completed successfully!")
+
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    run_migration()
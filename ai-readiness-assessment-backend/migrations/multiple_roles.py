@@ -4,7 +4,9 @@ Migration script to add multiple roles support to the User model.
 This migration:
 1. Adds a new JSON 'roles' column to the users table if needed
 2. Populates the roles column with the existing role value
-3. Creates the user-role association table if needed
+3. Creates the user-role association table if needed, or rebuilds an older one
+   with its (user_id, role) primary key, position column and role index
+4. Backfills the association table from each user's roles, in batches
 
 Run this script directly to apply the migration:
 python migrations/multiple_roles.py
@@ -22,6 +24,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # Import database connection string from config
 from database import DATABASE_URL, SessionLocal
+from models import parse_roles
 
 # Initialize SQLAlchemy components
 engine = create_engine(DATABASE_URL)
@@ -29,6 +32,19 @@ Base = declarative_base()
 metadata = MetaData()
 Session = sessionmaker(bind=engine)
 
+BATCH_SIZE = 500
+
+def create_association_table(session):
+    session.execute(text("""
+        CREATE TABLE user_role_association (
+            user_id VARCHAR(255) NOT NULL,
+            role VARCHAR(255) NOT NULL,
+            position INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user_id, role),
+            FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
+        )
+    """))
+
 def run_migration():
     print("Starting migration to add multiple roles support...")
     
@@ -85,41 +101,68 @@ def run_migration():
         result = session.execute(text("SELECT name FROM sqlite_master WHERE type='table' AND name='user_role_association'"))
         if not result.fetchone():
             print("Creating user-role association table...")
-            session.execute(text("""
-                CREATE TABLE user_role_association (
-                    user_id VARCHAR(255) NOT NULL,
-                    role VARCHAR(255) NOT NULL,
-                    PRIMARY KEY (user_id, role),
-                    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
-                )
-            """))
+            create_association_table(session)
             session.commit()
             print("Created user_role_association table")
         else:
-            print("Table user_role_association already exists, skipping")
+            result = session.execute(text("PRAGMA table_info(user_role_association)"))
+            columns = {row[1]: row for row in result.fetchall()}
+            # Tables from older versions have no primary key and no position column
+            if 'position' not in columns or not columns['role'][5]:
+                print("Rebuilding user_role_association table with its primary key and position...")
+                session.execute(text("ALTER TABLE user_role_association RENAME TO user_role_association_old"))
+                create_association_table(session)
+                session.execute(text("""
+                    INSERT OR IGNORE INTO user_role_association (user_id, role, position)
+                    SELECT user_id, role, 0 FROM user_role_association_old
+                    WHERE user_id IS NOT NULL AND role IS NOT NULL
+                """))
+                session.execute(text("DROP TABLE user_role_association_old"))
+                session.commit()
+                print("Rebuilt user_role_association table")
+            else:
+                print("Table user_role_association already exists, skipping")
         
-        # 5. Populate the association table with existing role values
-        print("Populating user-role association table with existing roles...")
-        users_with_roles = session.execute(text("SELECT id, role FROM users WHERE role IS NOT NULL")).fetchall()
+        session.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_user_role_association_role ON user_role_association (role, user_id)"
+        ))
+        session.commit()
         
+        # 5. Backfill the association table from the roles column (falling back to the
+        #    legacy role), one batch of users without association rows at a time
+        print("Populating user-role association table with existing roles...")
         association_count = 0
-        for user in users_with_roles:
-            user_id, role = user
-            if role:
-                # Check if the association already exists
-                existing = session.execute(
-                    text("SELECT * FROM user_role_association WHERE user_id = :user_id AND role = :role"),
-                    {"user_id": user_id, "role": role}
-                ).fetchone()
-                
-                if not existing:
-                    session.execute(
-                        text("INSERT INTO user_role_association (user_id, role) VALUES (:user_id, :role)"),
-                        {"user_id": user_id, "role": role}
-                    )
-                    association_count += 1
+        last_id = ""
+        while True:
+            users = session.execute(
+                text("""
+                    SELECT id, role, roles FROM users
+                    WHERE id > :last_id
+                      AND NOT EXISTS (SELECT 1 FROM user_role_association a WHERE a.user_id = users.id)
+                    ORDER BY id LIMIT :limit
+                """),
+                {"last_id": last_id, "limit": BATCH_SIZE}
+            ).fetchall()
+            if not users:
+                break
+            last_id = users[-1][0]
+            
+            rows = []
+            for user_id, role, roles in users:
+                user_roles = list(dict.fromkeys(parse_roles(roles))) or ([role] if role else [])
+                rows.extend(
+                    {"user_id": user_id, "role": user_role, "position": position}
+                    for position, user_role in enumerate(user_roles)
+                )
+            if rows:
+                session.execute(
+                    text("INSERT OR IGNORE INTO user_role_association (user_id, role, position) VALUES (:user_id, :role, :position)"),
+                    rows
+                )
+            session.commit()
+            association_count += len(rows)
+            print(f"Processed {len(users)} users...")
         
-        session.commit()
         print(f"Added {association_count} user-role associations")
         
         print("Multiple roles migration completed successfully!")
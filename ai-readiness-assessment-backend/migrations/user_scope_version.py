@@ -0,0 +1,65 @@
+"""
+Migration script to add token scope versions to users.
+
+This migration:
+1. Adds a new integer 'scope_version' column to the users table if needed,
+   starting every user at 0
+
+Run this script directly to apply the migration:
+python migrations/user_scope_version.py
+"""
+
+import sys
+import os
+from sqlalchemy import create_engine, text
+
+# Add the parent directory to the path so we can import from the main app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Import database connection string from config
+from database import DATABASE_URL, SessionLocal
+
+# Initialize SQLAlchemy components
+engine = create_engine(DATABASE_URL)
+
+def run_migration():
+    print("Starting migration to add user scope versions...")
+
+    # Create a session
+    session = SessionLocal()
+
+    try:
+        # 1. First check if the users table exists
+        print("Checking users table...")
+        result = session.execute(text("SELECT name FROM sqlite_master WHERE type='table' AND name='users'"))
+        if not result.fetchone():
+            print("Users table doesn't exist yet, creating tables...")
+            from models import Base
+            Base.metadata.create_all(bind=engine)
+            print("Database tables created successfully!")
+            return
+
+        # 2. Check and add the 'scope_version' column if needed
+        print("Checking 'scope_version' column in users table...")
+        result = session.execute(text("PRAGMA table_info(users)"))
+        columns = [row[1] for row in result.fetchall()]
+
+        if 'scope_version' not in columns:
+            print("Adding 'scope_version' column to users table...")
+            session.execute(text("ALTER TABLE users ADD COLUMN scope_version INTEGER NOT NULL DEFAULT 0"))
+            session.commit()
+            print("Added 'scope_version' column to users table")
+        else:
+            print("Column 'scope_version' already exists, skipping")
+
+        print("User scope version migration completed successfully!")
+
+    except Exception as e:
+        print(f"Error during migration: {e}")
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+if __name__ == "__main__":
+    run_migration()
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, Table, DateTime, JSON, Text
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, Float, Table, DateTime, JSON, Text, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -17,13 +17,29 @@ company_user_association = Table(
     Column("user_id", String, ForeignKey("users.id")),
 )
 
-# Association table for user-role relationships (new)
-user_role_association = Table(
-    "user_role_association",
-    Base.metadata,
-    Column("user_id", String, ForeignKey("users.id")),
-    Column("role", String),  # One of: admin, ai_governance, ai_culture, etc.
-)
+def parse_roles(value) -> List[str]:
+    """Roles stored as a list or as (possibly repeatedly) JSON-encoded text; anything else gives []."""
+    for _ in range(3):
+        if not isinstance(value, str):
+            break
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    if not isinstance(value, list):
+        return []
+    return [role for role in value if isinstance(role, str) and role]
+
+# User-role assignments; the authoritative store of users' roles
+class UserRole(Base):
+    __tablename__ = "user_role_association"
+    __table_args__ = (Index("ix_user_role_association_role", "role", "user_id"),)  # Users by role
+
+    user_id = Column(String, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    role = Column(String, primary_key=True)  # One of: admin, ai_governance, ai_culture, etc.
+    position = Column(Integer, nullable=False, default=0)  # Order of the user's roles; the first is the primary role
+
+user_role_association = UserRole.__table__
 
 class User(Base):
     __tablename__ = "users"
@@ -32,14 +48,36 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     name = Column(String)
     role = Column(String, nullable=True)  # Legacy field, kept for backward compatibility
-    roles = Column(JSON, default=list)  # New field to store multiple roles
+    roles_json = Column("roles", JSON, default=list)  # Legacy copy of the roles, kept in sync for older readers
     hashed_password = Column(String)
+    scope_version = Column(Integer, nullable=False, default=0, server_default="0")  # Bumped when the roles or companies in issued tokens go stale
     created_at = Column(DateTime, default=func.now())
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
     
     # Relationships
     companies = relationship("Company", secondary=company_user_association, back_populates="users")
     completed_assessments = relationship("Assessment", back_populates="completed_by")
+    role_entries = relationship(
+        "UserRole", order_by=UserRole.position, cascade="all, delete-orphan", lazy="selectin"
+    )
+
+    @property
+    def roles(self) -> List[str]:
+        """The user's roles, primary first; users without role entries fall back to the legacy role."""
+        if self.role_entries:
+            return [entry.role for entry in self.role_entries]
+        return [self.role] if self.role else []
+
+    @roles.setter
+    def roles(self, roles) -> None:
+        # Accepts a list or JSON text, as the JSON column did
+        roles = list(dict.fromkeys(parse_roles(roles)))
+        existing = {entry.role: entry for entry in self.role_entries}
+        # Keep the entries of retained roles, so no row is deleted and re-inserted with the same key
+        self.role_entries = [existing.get(role) or UserRole(role=role) for role in roles]
+        for position, entry in enumerate(self.role_entries):
+            entry.position = position
+        self.roles_json = roles
 
 class Company(Base):
     __tablename__ = "companies"
@@ -59,6 +97,7 @@ class Company(Base):
     assessments = relationship("Assessment", back_populates="company")
     pillar_weights = relationship("CompanyPillarWeight", back_populates="company", cascade="all, delete-orphan")
     category_weights = relationship("CategoryWeight", back_populates="company", cascade="all, delete-orphan")
+    personalized_questionnaires = relationship("PersonalizedQuestionnaire", back_populates="company", cascade="all, delete-orphan")
 
 class Assessment(Base):
     __tablename__ = "assessments"
@@ -69,6 +108,7 @@ class Assessment(Base):
     status = Column(String)  # not-started, in-progress, completed
     score = Column(Float, nullable=True)
     data = Column(JSON, nullable=True)  # Store assessment data as JSON
+    category_scores = Column(JSON(none_as_null=True), nullable=True)  # Mean answer (1-4) per category, used for re-scoring
     completed_at = Column(DateTime, nullable=True)
     completed_by_id = Column(String, ForeignKey("users.id"), nullable=True)
     created_at = Column(DateTime, default=func.now())
@@ -107,6 +147,23 @@ class CategoryWeight(Base):
     # Relationships
     company = relationship("Company", back_populates="category_weights")
 
+# Pre-generated personalized questionnaire of a company for one pillar
+class PersonalizedQuestionnaire(Base):
+    __tablename__ = "personalized_questionnaires"
+    __table_args__ = (UniqueConstraint("company_id", "pillar"),)
+    
+    id = Column(String, primary_key=True, index=True)
+    company_id = Column(String, ForeignKey("companies.id"), index=True)
+    pillar = Column(String)  # AI Governance, AI Culture, etc.
+    questionnaire_version = Column(String)  # Questionnaire version the questions were generated for
+    profile_digest = Column(String)  # Digest of the company profile they were generated from
+    data = Column(JSON)  # The personalized assessment, as returned by the API
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
+    
+    # Relationships
+    company = relationship("Company", back_populates="personalized_questionnaires")
+
 # Default weights for all pillars (global defaults)
 class DefaultPillarWeight(Base):
     __tablename__ = "default_pillar_weights"
@@ -136,14 +193,12 @@ class UserResponse(UserBase):
         
     @classmethod
     def model_validate(cls, obj, *args, **kwargs):
-        # Handle roles field - convert JSON string to list
-        if hasattr(obj, 'roles') and isinstance(obj.roles, str):
-            try:
-                obj.roles = json.loads(obj.roles)
-            except:
-                obj.roles = [obj.role] if obj.role else []
-        elif not hasattr(obj, 'roles') or obj.roles is None:
-            obj.roles = [obj.role] if hasattr(obj, 'role') and obj.role else []
+        # User.roles is already a list; only other objects may carry JSON text
+        if not isinstance(obj, User):
+            if hasattr(obj, 'roles') and isinstance(obj.roles, str):
+                obj.roles = parse_roles(obj.roles) or ([obj.role] if getattr(obj, 'role', None) else [])
+            elif not hasattr(obj, 'roles') or obj.roles is None:
+                obj.roles = [obj.role] if hasattr(obj, 'role') and obj.role else []
         
         return super().model_validate(obj, *args, **kwargs)
 
@@ -0,0 +1,182 @@
+"""
+Background pre-generation queue.
+
+Companies are queued for generation of their personalized questionnaires
+when they are created or updated, and a small pool of worker threads works
+through the queue. A company is queued at most once: queuing it again only
+updates its priority, and a company queued while a worker is processing it
+runs again once that worker is done. Companies that were recently active
+(see ``touch``) are processed first, the rest in the order they were queued.
+"""
+
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional, Set
+
+logger = logging.getLogger("api.pregeneration")
+
+PREGENERATION_WORKERS = int(os.getenv("PREGENERATION_WORKERS", "2"))
+PREGENERATION_QUEUE_SIZE = int(os.getenv("PREGENERATION_QUEUE_SIZE", "10000"))
+
+
+class PregenerationQueue:
+    """
+    Deduplicating priority queue of keys processed by ``process`` in worker threads.
+
+    The queue holds at most ``max_size`` keys; keys queued beyond that are
+    dropped and counted. Activity is remembered for at most ``max_size`` keys
+    and forgotten once a key is processed. ``workers=0`` queues keys without
+    processing them.
+    """
+
+    def __init__(
+        self,
+        process: Callable[[Hashable], None],
+        workers: int = PREGENERATION_WORKERS,
+        max_size: int = PREGENERATION_QUEUE_SIZE,
+    ):
+        self.process = process
+        self.workers = workers
+        self.max_size = max_size
+        self._heap: List = []  # (-last activity, sequence, key); stale entries are skipped
+        self._queued: Dict[Hashable, int] = {}  # Key -> sequence of its current heap entry
+        self._running: Set[Hashable] = set()
+        self._rerun: Set[Hashable] = set()  # Keys queued again while running
+        self._last_active: Dict[Hashable, float] = {}  # Least recently active first; at most max_size keys
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._stopping = False
+        self.enqueued = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+
+    def _push(self, key: Hashable) -> None:
+        sequence = next(self._sequence)
+        self._queued[key] = sequence
+        heapq.heappush(self._heap, (-self._last_active.get(key, 0.0), sequence, key))
+        self._condition.notify()
+
+    def enqueue(self, key: Hashable) -> bool:
+        """Queue ``key`` for processing; returns False if the queue is full."""
+        with self._condition:
+            if key in self._running:
+                self._rerun.add(key)
+                self.deduplicated += 1
+                return True
+            if key in self._queued:
+                self.deduplicated += 1
+                return True
+            if len(self._queued) >= self.max_size:
+                self.dropped += 1
+                logger.warning(f"Pre-generation queue is full, dropping {key}")
+                return False
+            self.enqueued += 1
+            self._push(key)
+            return True
+
+    def touch(self, key: Hashable) -> None:
+        """Record activity of ``key``, moving it ahead of less recently active keys."""
+        with self._condition:
+            # Re-insert so the dict stays ordered by activity, then evict the least recently active
+            self._last_active.pop(key, None)
+            self._last_active[key] = time.time()
+            while len(self._last_active) > self.max_size:
+                del self._last_active[next(iter(self._last_active))]
+            if key in self._queued:
+                self._push(key)  # The old heap entry becomes stale
+
+    def forget(self, key: Hashable) -> None:
+        """Drop ``key`` from the queue and its activity record, e.g. once it is deleted."""
+        with self._condition:
+            self._queued.pop(key, None)
+            self._rerun.discard(key)
+            self._last_active.pop(key, None)
+
+    def _next(self) -> Optional[Hashable]:
+        """Wait for the next key to process; None once the queue is stopping."""
+        with self._condition:
+            while True:
+                if self._stopping:
+                    return None
+                while self._heap:
+                    _, sequence, key = heapq.heappop(self._heap)
+                    if self._queued.get(key) != sequence:
+                        continue
+                    del self._queued[key]
+                    if key in self._running:
+                        self._rerun.add(key)
+                        continue
+                    self._running.add(key)
+                    return key
+                self._condition.wait()
+
+    def _done(self, key: Hashable, succeeded: bool) -> None:
+        with self._condition:
+            self._running.discard(key)
+            if succeeded:
+                self.completed += 1
+            else:
+                self.failed += 1
+            if key in self._rerun:
+                self._rerun.discard(key)
+                if key not in self._queued:
+                    self._push(key)
+            elif key not in self._queued:
+                # Processed and not queued again: its activity no longer orders anything
+                self._last_active.pop(key, None)
+
+    def _work(self) -> None:
+        while True:
+            key = self._next()
+            if key is None:
+                return
+            try:
+                self.process(key)
+            except Exception as e:
+                logger.error(f"Pre-generation failed for {key}: {e}")
+                self._done(key, False)
+            else:
+                self._done(key, True)
+
+    def start(self) -> None:
+        """Start the worker threads."""
+        with self._condition:
+            if self._threads:
+                return
+            self._stopping = False
+            self._threads = [
+                threading.Thread(target=self._work, name=f"pregeneration-{i}", daemon=True)
+                for i in range(self.workers)
+            ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Stop the workers once they finish their current key; queued keys stay queued."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            threads, self._threads = self._threads, []
+        for thread in threads:
+            thread.join()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "workers": len(self._threads),
+                "queued": len(self._queued),
+                "running": len(self._running),
+                "tracked_activity": len(self._last_active),
+                "enqueued": self.enqueued,
+                "deduplicated": self.deduplicated,
+                "dropped": self.dropped,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
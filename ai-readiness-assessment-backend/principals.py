@@ -0,0 +1,148 @@
+"""
+Authenticated principals and their cache.
+
+``get_current_user`` resolves a bearer token into a ``Principal``: the
+user's id, email, name, parsed roles and assigned company ids, frozen at the
+time of the lookup. Principals are cached by a digest of the token for a
+short TTL (and never past the token's expiry), so a warm authenticated
+request decodes no JWT and runs no user or company queries. Endpoints that
+change a user's identity, roles or company assignments invalidate the
+affected principals explicitly.
+
+Tokens can also carry the principal itself as claims (``scope_claims``),
+stamped with the user's scope version. A user's scope version is bumped
+whenever their roles, profile or company assignments change, so on a cache
+miss a token whose stamp still matches yields its principal straight from
+the claims, checked with a single-column lookup instead of loading the user
+and their companies.
+"""
+
+import hashlib
+import math
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, FrozenSet, Iterable, NamedTuple, Optional, Tuple
+
+from cache import LRUCache
+
+JWT_SCOPE_CLAIMS = os.getenv("JWT_SCOPE_CLAIMS", "true").lower() == "true"  # Issue tokens with scope claims
+JWT_SCOPE_MAX_COMPANIES = int(os.getenv("JWT_SCOPE_MAX_COMPANIES", "200"))  # Larger scopes stay out of tokens
+
+
+class Principal(NamedTuple):
+    id: str
+    email: str
+    name: Optional[str]
+    roles: Tuple[str, ...]
+    is_admin: bool
+    company_ids: FrozenSet[str]  # Companies the user is assigned to
+
+
+def principal_from_user(user: Any, company_ids: Optional[Iterable[str]] = None) -> Principal:
+    """
+    Freeze a ``User`` whose roles were parsed by ``parse_user_roles``.
+
+    Loads the user's companies unless ``company_ids`` is given.
+    """
+    roles = tuple(user.roles or ())
+    if company_ids is None:
+        company_ids = (company.id for company in user.companies)
+    return Principal(
+        id=user.id,
+        email=user.email,
+        name=user.name,
+        roles=roles,
+        # Endpoints used to check either the roles list or the legacy role
+        is_admin="admin" in roles or user.role == "admin",
+        company_ids=frozenset(company_ids),
+    )
+
+
+def scope_claims(principal: Principal, scope_version: int) -> Dict[str, Any]:
+    """
+    JWT claims carrying ``principal``, or none if scope claims are disabled or its scope is too large.
+
+    ``sub`` stays the email, as in every token.
+    """
+    if not JWT_SCOPE_CLAIMS or len(principal.company_ids) > JWT_SCOPE_MAX_COMPANIES:
+        return {}
+    return {
+        "uid": principal.id,
+        "name": principal.name,
+        "roles": list(principal.roles),
+        "adm": principal.is_admin,
+        "cids": sorted(principal.company_ids),
+        "sv": scope_version,
+    }
+
+
+def principal_from_claims(payload: Dict[str, Any]) -> Optional[Principal]:
+    """Principal carried by a decoded token, or None if it has no (complete) scope claims."""
+    try:
+        return Principal(
+            id=payload["uid"],
+            email=payload["sub"],
+            name=payload.get("name"),
+            roles=tuple(payload["roles"]),
+            is_admin=bool(payload["adm"]),
+            company_ids=frozenset(payload["cids"]),
+        )
+    except (KeyError, TypeError):
+        return None
+
+
+def token_digest(token: str) -> bytes:
+    """Cache key of a bearer token, so raw tokens are never kept in memory."""
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+class PrincipalCache:
+    """
+    Token digest -> principal cache.
+
+    Entries expire after ``ttl`` seconds or at the token's expiry, whichever
+    comes first. Every invalidation bumps a generation counter; a principal
+    loaded before an invalidation is not stored, so a lookup racing with an
+    update can't bring back the old state.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self._cache = LRUCache(max_entries=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        """Read before loading a principal and pass to ``set``."""
+        return self._generation
+
+    def get(self, key: bytes) -> Optional[Principal]:
+        entry = self._cache.get(key)
+        if entry is None:
+            return None
+        principal, expires_at = entry
+        if expires_at <= time.time():
+            self._cache.pop(key)
+            return None
+        return principal
+
+    def set(self, key: bytes, principal: Principal, expires_at: float = math.inf, generation: Optional[int] = None) -> None:
+        """Store ``principal`` until ``expires_at`` (epoch seconds), unless invalidated since ``generation``."""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._cache.set(key, (principal, expires_at))
+
+    def invalidate(self, predicate: Callable[[Principal], bool]) -> int:
+        """Drop every principal for which ``predicate`` is true; returns how many were dropped."""
+        with self._lock:
+            self._generation += 1
+            return self._cache.invalidate_values(lambda entry: predicate(entry[0]))
+
+    def invalidate_users(self, user_ids: Iterable[str]) -> int:
+        user_ids = frozenset(user_ids)
+        return self.invalidate(lambda principal: principal.id in user_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self._cache.stats(), "generation": self._generation}
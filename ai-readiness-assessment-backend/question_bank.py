@@ -0,0 +1,204 @@
+"""
+Indexed question bank.
+
+Compiles ``data/questionnair_2.json`` (groups of question objects with a
+category, subcategory, question text and options) into an immutable bank
+whose questions are stored grouped by category and subcategory. Each
+category and subcategory is then a contiguous range described by compact
+offset arrays, so filtering and paging never scan the bank. Every question
+gets a stable id derived from its category, subcategory and text, and the
+bank carries its hierarchical scoring layout (see ``hierarchy.py``).
+
+The bank is rebuilt by a ``QuestionnaireStore`` watcher whenever the file
+changes.
+"""
+
+import hashlib
+import json
+import os
+import time
+from types import MappingProxyType
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from hierarchy import HierarchyLayout, build_layout
+from questionnaire_store import QUESTIONNAIRE_POLL_INTERVAL, QuestionnaireStore, content_version
+
+QUESTION_BANK_PATH = os.getenv("QUESTION_BANK_PATH", "data/questionnair_2.json")
+
+Range = Tuple[int, int]
+
+
+class BankQuestion(NamedTuple):
+    id: str
+    category: str
+    subcategory: str
+    question: str
+    options: Tuple[str, ...]  # Ordered from most to least mature
+
+
+class QuestionBank(NamedTuple):
+    version: str
+    questions: Tuple[BankQuestion, ...]  # Grouped by category, then subcategory, otherwise in file order
+    categories: Tuple[str, ...]
+    category_offsets: np.ndarray  # Category position -> first question position (length categories + 1)
+    category_subcategories: np.ndarray  # Category position -> first subcategory position (length categories + 1)
+    subcategories: Tuple[str, ...]  # Subcategory names by position, grouped by category
+    subcategory_offsets: np.ndarray  # Subcategory position -> first question position (length subcategories + 1)
+    category_positions: Mapping[str, int]
+    subcategory_positions: Mapping[str, Tuple[int, ...]]  # A subcategory name can occur in several categories
+    question_positions: Mapping[str, int]  # Question id -> position
+    hierarchy: HierarchyLayout  # Pillar -> category -> question scoring layout
+    loaded_at: float
+
+    def get(self, question_id: str) -> Optional[BankQuestion]:
+        position = self.question_positions.get(question_id)
+        return None if position is None else self.questions[position]
+
+    def category_range(self, category: str) -> Optional[Range]:
+        position = self.category_positions.get(category)
+        if position is None:
+            return None
+        return int(self.category_offsets[position]), int(self.category_offsets[position + 1])
+
+    def subcategory_ranges(self, subcategory: str, category: Optional[str] = None) -> List[Range]:
+        """Question ranges of a subcategory, optionally only within one category."""
+        ranges = []
+        for position in self.subcategory_positions.get(subcategory, ()):
+            start, end = int(self.subcategory_offsets[position]), int(self.subcategory_offsets[position + 1])
+            if category is None or self.questions[start].category == category:
+                ranges.append((start, end))
+        return ranges
+
+    def page(self, ranges: Sequence[Range], offset: int, limit: int) -> Tuple[int, List[BankQuestion]]:
+        """Return the total size of ``ranges`` and up to ``limit`` questions from ``offset``."""
+        total = sum(end - start for start, end in ranges)
+        items = []
+        for start, end in ranges:
+            if len(items) >= limit:
+                break
+            if offset >= end - start:
+                offset -= end - start
+                continue
+            stop = min(end, start + offset + limit - len(items))
+            items.extend(self.questions[start + offset:stop])
+            offset = 0
+        return total, items
+
+    def summary(self) -> Dict[str, Any]:
+        """Question counts per category and subcategory."""
+        categories = []
+        for position, name in enumerate(self.categories):
+            first, last = int(self.category_subcategories[position]), int(self.category_subcategories[position + 1])
+            categories.append({
+                "name": name,
+                "count": int(self.category_offsets[position + 1] - self.category_offsets[position]),
+                "subcategories": [
+                    {
+                        "name": self.subcategories[sub],
+                        "count": int(self.subcategory_offsets[sub + 1] - self.subcategory_offsets[sub]),
+                    }
+                    for sub in range(first, last)
+                ],
+            })
+        return {"version": self.version, "total": len(self.questions), "categories": categories}
+
+
+def question_id(category: str, subcategory: str, question: str) -> str:
+    """Stable id of a question; unchanged as long as its category, subcategory and text are."""
+    key = "\x1f".join((category, subcategory, question)).encode("utf-8")
+    return hashlib.blake2b(key, digest_size=6).hexdigest()
+
+
+def _offsets(counts: Sequence[int]) -> np.ndarray:
+    offsets = np.zeros(len(counts) + 1, dtype=np.int32)
+    np.cumsum(counts, out=offsets[1:])
+    offsets.flags.writeable = False
+    return offsets
+
+
+def _parse_items(raw: Any) -> List[Dict[str, Any]]:
+    """Flatten the file's groups of question objects, validating each one."""
+    if not isinstance(raw, list):
+        raise ValueError("Question bank must be a list")
+    items = []
+    for entry in raw:
+        for item in entry if isinstance(entry, list) else [entry]:
+            if not isinstance(item, dict) or not all(isinstance(item.get(key), str) for key in ("category", "subcategory", "question")):
+                raise ValueError(f"Invalid question bank entry: {item!r}"[:200])
+            if not isinstance(item.get("options", []), list):
+                raise ValueError(f"Invalid options for question: {item['question']}"[:200])
+            items.append(item)
+    return items
+
+
+def build_question_bank(content: Optional[bytes]) -> QuestionBank:
+    """Compile question bank file contents (None for a missing file)."""
+    items = _parse_items(json.loads(content)) if content is not None else []
+
+    # Number categories and their subcategories by first appearance, then
+    # group the questions by them (the sort is stable, so file order is kept)
+    category_positions = {}
+    sub_order = {}  # (category position, subcategory) -> order within the category
+    per_category = {}  # Category position -> subcategories seen so far
+    keys = []
+    for item in items:
+        category = category_positions.setdefault(item["category"], len(category_positions))
+        key = (category, item["subcategory"])
+        if key not in sub_order:
+            sub_order[key] = per_category.get(category, 0)
+            per_category[category] = sub_order[key] + 1
+        keys.append(key)
+    order = sorted(range(len(items)), key=lambda i: (keys[i][0], sub_order[keys[i]]))
+
+    questions = []
+    question_positions = {}
+    for position, i in enumerate(order):
+        item = items[i]
+        base_id = question_id(item["category"], item["subcategory"], item["question"])
+        # Repeated questions within a subcategory get numbered ids
+        identifier, repeat = base_id, 1
+        while identifier in question_positions:
+            repeat += 1
+            identifier = f"{base_id}-{repeat}"
+        question_positions[identifier] = position
+        questions.append(BankQuestion(
+            id=identifier,
+            category=item["category"],
+            subcategory=item["subcategory"],
+            question=item["question"],
+            options=tuple(item.get("options", [])),
+        ))
+
+    # Subcategories in bank order, with their question counts
+    ordered_subcategories = sorted(sub_order, key=lambda key: (key[0], sub_order[key]))
+    subcategory_counts = {key: 0 for key in ordered_subcategories}
+    for key in keys:
+        subcategory_counts[key] += 1
+    category_counts = [0] * len(category_positions)
+    category_subcategory_counts = [0] * len(category_positions)
+    subcategory_positions = {}
+    for position, (category, subcategory) in enumerate(ordered_subcategories):
+        category_counts[category] += subcategory_counts[(category, subcategory)]
+        category_subcategory_counts[category] += 1
+        subcategory_positions.setdefault(subcategory, []).append(position)
+
+    return QuestionBank(
+        version=content_version(content),
+        questions=tuple(questions),
+        categories=tuple(category_positions),
+        category_offsets=_offsets(category_counts),
+        category_subcategories=_offsets(category_subcategory_counts),
+        subcategories=tuple(subcategory for _, subcategory in ordered_subcategories),
+        subcategory_offsets=_offsets([subcategory_counts[key] for key in ordered_subcategories]),
+        category_positions=MappingProxyType(category_positions),
+        subcategory_positions=MappingProxyType({name: tuple(positions) for name, positions in subcategory_positions.items()}),
+        question_positions=MappingProxyType(question_positions),
+        hierarchy=build_layout(questions),
+        loaded_at=time.time(),
+    )
+
+
+# Shared question bank, rebuilt when the file changes
+question_bank_store = QuestionnaireStore(QUESTION_BANK_PATH, QUESTIONNAIRE_POLL_INTERVAL, build=build_question_bank)
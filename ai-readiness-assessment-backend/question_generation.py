@@ -0,0 +1,326 @@
+"""
+Personalized question generation backends.
+
+A ``QuestionGenerator`` produces the questions of one category of a pillar
+for a company. ``generate_categories`` fans out over every category of a
+pillar concurrently, with at most ``concurrency`` generations in flight and
+a timeout per category; a category whose generation fails or times out gets
+the built-in template questions instead. A pillar with N categories thus
+costs about one generation latency rather than N. ``stream_categories``
+does the same but yields each category as soon as it is ready.
+
+All generation runs on one event loop in a background thread
+(``generation_loop``), so synchronous request handlers and async code share
+the same loop and HTTP clients.
+
+Backends:
+    template  - the built-in template questions (no I/O)
+    openai    - the OpenAI chat completions API
+    simulated - the template questions after a simulated latency, for
+                testing and benchmarking offline
+"""
+
+import asyncio
+import json
+import logging
+import os
+import queue
+import random
+import threading
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Sequence
+
+logger = logging.getLogger("api.generation")
+
+QUESTION_GENERATOR = os.getenv("QUESTION_GENERATOR", "template")  # template, openai or simulated
+QUESTION_GENERATION_CONCURRENCY = int(os.getenv("QUESTION_GENERATION_CONCURRENCY", "8"))
+QUESTION_GENERATION_TIMEOUT = float(os.getenv("QUESTION_GENERATION_TIMEOUT", "20"))  # seconds per category
+OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+SIMULATED_GENERATION_LATENCY = float(os.getenv("SIMULATED_GENERATION_LATENCY", "0.5"))  # seconds
+
+Questions = List[Dict[str, Any]]
+
+
+class QuestionGenerator:
+    """Interface of a question generation backend."""
+
+    name = "base"
+
+    async def generate(self, company_info: Dict, pillar: str, category: str, num_questions: int) -> Questions:
+        """
+        Generate questions for one category of a pillar.
+
+        Returns:
+            Question objects with ``text`` and four ``options`` (``id`` and
+            ``text``), from the least to the most mature answer.
+        """
+        raise NotImplementedError
+
+
+class TemplateQuestionGenerator(QuestionGenerator):
+    """Questions from a synchronous template function, such as ``utils.generate_personalized_questions``."""
+
+    name = "template"
+
+    def __init__(self, template: Callable[..., Questions]):
+        self.template = template
+
+    async def generate(self, company_info: Dict, pillar: str, category: str, num_questions: int) -> Questions:
+        return self.template(company_info=company_info, pillar=pillar, category=category, num_questions=num_questions)
+
+
+class SimulatedQuestionGenerator(QuestionGenerator):
+    """
+    Template questions after a simulated latency.
+
+    Each call sleeps ``latency`` seconds plus a uniform jitter of up to
+    ``jitter`` seconds, and fails with probability ``failure_rate``.
+    """
+
+    name = "simulated"
+
+    def __init__(
+        self,
+        template: QuestionGenerator,
+        latency: float = SIMULATED_GENERATION_LATENCY,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.template = template
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+
+    async def generate(self, company_info: Dict, pillar: str, category: str, num_questions: int) -> Questions:
+        await asyncio.sleep(self.latency + self._random.uniform(0, self.jitter))
+        if self._random.random() < self.failure_rate:
+            raise RuntimeError(f"Simulated generation failure for category {category}")
+        return await self.template.generate(company_info, pillar, category, num_questions)
+
+
+OPENAI_PROMPT = """Write {num_questions} multiple-choice questions that assess the "{category}" category of the "{pillar}" AI readiness pillar for this company:
+
+{company}
+
+Tailor each question to the company's industry, size, region and AI maturity. Give every question exactly four answer options, ordered from the least to the most AI-ready answer.
+Reply with JSON only, in the form {{"questions": [{{"text": "...", "options": ["...", "...", "...", "..."]}}]}}."""
+
+
+class OpenAIQuestionGenerator(QuestionGenerator):
+    """Questions from the OpenAI chat completions API."""
+
+    name = "openai"
+
+    def __init__(self, api_key: str, model: str = OPENAI_MODEL):
+        self.api_key = api_key
+        self.model = model
+        self._client = None  # Created on the generation loop, where it is used
+
+    async def generate(self, company_info: Dict, pillar: str, category: str, num_questions: int) -> Questions:
+        if self._client is None:
+            from openai import AsyncOpenAI
+            self._client = AsyncOpenAI(api_key=self.api_key)
+
+        prompt = OPENAI_PROMPT.format(
+            num_questions=num_questions,
+            category=category,
+            pillar=pillar,
+            company=json.dumps({key: value for key, value in company_info.items() if key != "id"}),
+        )
+        completion = await self._client.chat.completions.create(
+            model=self.model,
+            messages=[{"role": "user", "content": prompt}],
+            temperature=0.7,
+        )
+        return parse_generated_questions(completion.choices[0].message.content, num_questions)
+
+
+def parse_generated_questions(content: Optional[str], num_questions: int) -> Questions:
+    """
+    Convert a generated JSON reply into question objects.
+
+    Raises:
+        ValueError: If the reply is not the expected JSON or a question does
+            not have exactly four options.
+    """
+    questions = json.loads(content or "")["questions"]
+    parsed = []
+    for question in questions[:num_questions]:
+        options = question["options"]
+        if not isinstance(question["text"], str) or len(options) != 4:
+            raise ValueError("Every generated question needs a text and four options")
+        parsed.append({
+            "text": question["text"],
+            "options": [{"id": f"option{i + 1}", "text": str(option)} for i, option in enumerate(options)],
+        })
+    if not parsed:
+        raise ValueError("No questions were generated")
+    return parsed
+
+
+def create_question_generator(name: str, template: QuestionGenerator) -> QuestionGenerator:
+    """Build the backend configured by ``name``, falling back to ``template``."""
+    if name == "openai":
+        api_key = os.getenv("OPENAI_API_KEY")
+        if api_key:
+            return OpenAIQuestionGenerator(api_key)
+        logger.warning("OPENAI_API_KEY is not set, using template questions")
+    elif name == "simulated":
+        return SimulatedQuestionGenerator(template)
+    elif name != "template":
+        logger.warning(f"Unknown question generator '{name}', using template questions")
+    return template
+
+
+class GenerationStats:
+    """Counters of ``generate_categories`` calls."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.categories = 0
+        self.fallbacks = 0
+        self.timeouts = 0
+
+    def record(self, fallback: bool = False, timeout: bool = False) -> None:
+        with self._lock:
+            self.categories += 1
+            self.fallbacks += fallback
+            self.timeouts += timeout
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"categories": self.categories, "fallbacks": self.fallbacks, "timeouts": self.timeouts}
+
+
+generation_stats = GenerationStats()
+
+
+async def _generate_category(
+    generator: QuestionGenerator,
+    company_info: Dict,
+    pillar: str,
+    category: str,
+    num_questions: int,
+    fallback: QuestionGenerator,
+    semaphore: asyncio.Semaphore,
+    timeout: float,
+) -> Dict[str, Any]:
+    """Generate one category's questions, falling back to ``fallback`` on failure or timeout."""
+    try:
+        async with semaphore:
+            questions = await asyncio.wait_for(generator.generate(company_info, pillar, category, num_questions), timeout)
+        generation_stats.record()
+        return {"name": category, "questions": questions}
+    except asyncio.TimeoutError:
+        logger.warning(f"Question generation for {pillar}/{category} timed out after {timeout}s, using templates")
+        generation_stats.record(fallback=True, timeout=True)
+    except Exception as e:
+        logger.warning(f"Question generation for {pillar}/{category} failed, using templates: {e}")
+        generation_stats.record(fallback=True)
+    return {"name": category, "questions": await fallback.generate(company_info, pillar, category, num_questions)}
+
+
+async def generate_categories(
+    generator: QuestionGenerator,
+    company_info: Dict,
+    pillar: str,
+    categories: Sequence[str],
+    num_questions: int,
+    fallback: QuestionGenerator,
+    concurrency: int = QUESTION_GENERATION_CONCURRENCY,
+    timeout: float = QUESTION_GENERATION_TIMEOUT,
+) -> List[Dict[str, Any]]:
+    """
+    Generate the questions of every category of a pillar concurrently.
+
+    Returns:
+        One ``{"name", "questions"}`` entry per category, in the order of
+        ``categories``.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    return list(await asyncio.gather(*(
+        _generate_category(generator, company_info, pillar, category, num_questions, fallback, semaphore, timeout)
+        for category in categories
+    )))
+
+
+async def stream_categories(
+    generator: QuestionGenerator,
+    company_info: Dict,
+    pillar: str,
+    categories: Sequence[str],
+    num_questions: int,
+    fallback: QuestionGenerator,
+    concurrency: int = QUESTION_GENERATION_CONCURRENCY,
+    timeout: float = QUESTION_GENERATION_TIMEOUT,
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Like ``generate_categories``, but yield each category as soon as it is generated.
+
+    Entries also carry the category's ``index`` in ``categories``, since they
+    arrive in completion order.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def generate(index: int, category: str) -> Dict[str, Any]:
+        entry = await _generate_category(generator, company_info, pillar, category, num_questions, fallback, semaphore, timeout)
+        return {"index": index, **entry}
+
+    tasks = [asyncio.ensure_future(generate(index, category)) for index, category in enumerate(categories)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class GenerationLoop:
+    """Event loop in a daemon thread that runs all question generation."""
+
+    def __init__(self):
+        self._loop = None
+        self._lock = threading.Lock()
+
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="question-generation", daemon=True).start()
+            return self._loop
+
+    def run(self, coroutine: Awaitable) -> Any:
+        """Run ``coroutine`` on the loop and block until it finishes (for synchronous callers)."""
+        return asyncio.run_coroutine_threadsafe(coroutine, self._get_loop()).result()
+
+    async def run_async(self, coroutine: Awaitable) -> Any:
+        """Run ``coroutine`` on the loop and await it from another event loop."""
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, self._get_loop()))
+
+    def iterate(self, iterable: AsyncIterable) -> Iterator:
+        """Consume an async iterable on the loop, yielding its items to a synchronous caller."""
+        items = queue.Queue()
+        done = object()
+
+        async def pump():
+            try:
+                async for item in iterable:
+                    items.put(item)
+            finally:
+                items.put(done)
+
+        future = asyncio.run_coroutine_threadsafe(pump(), self._get_loop())
+        try:
+            while True:
+                item = items.get()
+                if item is done:
+                    break
+                yield item
+            future.result()  # Raise anything the iterable raised
+        finally:
+            # Stops generation if the caller stopped early, e.g. a closed stream
+            future.cancel()
+
+
+generation_loop = GenerationLoop()
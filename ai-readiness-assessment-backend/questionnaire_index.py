@@ -0,0 +1,86 @@
+"""
+Compiled questionnaire index.
+
+Turns the raw ``data/questionnaires.json`` structure (assessment type ->
+category -> list of question texts) into an immutable index with stable
+integer positions for categories and questions, so request validation and
+scoring can use hashed lookups and precomputed arrays instead of walking the
+JSON lists.
+"""
+
+from types import MappingProxyType
+from typing import Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class CategoryIndex(NamedTuple):
+    name: str
+    position: int  # Column of this category within its assessment type
+    questions: Tuple[str, ...]
+    question_ids: Mapping[str, int]  # Question text -> question id within the assessment type
+
+
+class AssessmentTypeIndex(NamedTuple):
+    name: str
+    categories: Tuple[CategoryIndex, ...]  # In questionnaire order
+    category_positions: Mapping[str, int]  # Category name -> position
+    question_offsets: np.ndarray  # Category position -> first question id (length categories + 1)
+    question_categories: np.ndarray  # Question id -> category position
+
+    @property
+    def category_names(self) -> List[str]:
+        return [category.name for category in self.categories]
+
+    def category(self, name: str) -> Optional[CategoryIndex]:
+        """Return the category called ``name``, or None if it isn't part of this assessment type."""
+        position = self.category_positions.get(name)
+        return None if position is None else self.categories[position]
+
+    def invalid_questions(self, category: CategoryIndex, questions: Sequence[str]) -> List[str]:
+        """Return the questions that do not belong to ``category``."""
+        return [question for question in questions if question not in category.question_ids]
+
+
+def _read_only(values: Sequence[int]) -> np.ndarray:
+    array = np.array(values, dtype=np.int32)
+    array.flags.writeable = False
+    return array
+
+
+def compile_assessment_type(name: str, categories: Dict[str, List[str]]) -> AssessmentTypeIndex:
+    """Compile one assessment type of the questionnaire."""
+    category_indexes = []
+    offsets = [0]
+    question_categories = []
+
+    for position, (category_name, questions) in enumerate(categories.items()):
+        first_id = offsets[-1]
+        question_ids = {}
+        for offset, question in enumerate(questions):
+            # Keep the first id if a question is repeated within a category
+            question_ids.setdefault(question, first_id + offset)
+        category_indexes.append(CategoryIndex(
+            name=category_name,
+            position=position,
+            questions=tuple(questions),
+            question_ids=MappingProxyType(question_ids),
+        ))
+        offsets.append(first_id + len(questions))
+        question_categories.extend([position] * len(questions))
+
+    return AssessmentTypeIndex(
+        name=name,
+        categories=tuple(category_indexes),
+        category_positions=MappingProxyType({category.name: category.position for category in category_indexes}),
+        question_offsets=_read_only(offsets),
+        question_categories=_read_only(question_categories),
+    )
+
+
+def compile_questionnaires(questionnaires: Dict[str, Dict[str, List[str]]]) -> Mapping[str, AssessmentTypeIndex]:
+    """Compile the full questionnaire into a read-only mapping of assessment type -> index."""
+    return MappingProxyType({
+        name: compile_assessment_type(name, categories)
+        for name, categories in questionnaires.items()
+    })
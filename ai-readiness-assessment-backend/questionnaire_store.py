@@ -0,0 +1,168 @@
+"""
+Hot-reloadable questionnaire store.
+
+Holds the parsed ``data/questionnaires.json``, its compiled index and its
+pre-rendered responses as one immutable snapshot identified by a hash of the
+file contents. A background thread watches the file's modification time and
+size and, when they change, parses and compiles the new contents and swaps
+the snapshot in a single assignment. Requests only ever read the current
+snapshot, so they never touch the disk and always see one consistent version
+of the questionnaire.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Mapping, NamedTuple, Optional, Tuple
+
+from questionnaire_index import AssessmentTypeIndex, compile_questionnaires
+from rendered import RenderedJSON, render_json
+
+logger = logging.getLogger("api")
+
+QUESTIONNAIRES_PATH = os.getenv("QUESTIONNAIRES_PATH", "data/questionnaires.json")
+QUESTIONNAIRE_POLL_INTERVAL = float(os.getenv("QUESTIONNAIRE_POLL_INTERVAL", "2"))  # seconds
+
+
+class QuestionnaireSnapshot(NamedTuple):
+    version: str  # Hash of the file contents ("empty" if the file is missing)
+    questionnaires: Dict[str, Dict[str, Any]]  # Parsed file; shared by all requests, never mutated
+    index: Mapping[str, AssessmentTypeIndex]
+    rendered: RenderedJSON  # The whole questionnaire, pre-serialized for GET /questionnaires
+    rendered_types: Mapping[str, RenderedJSON]  # Each assessment type, for GET /questionnaire/{assessment_type}
+    loaded_at: float
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    """Modification time and size of ``path``, or None if it doesn't exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def content_version(content: Optional[bytes]) -> str:
+    """Version of a file's contents: a short hash, or "empty" for a missing file."""
+    return "empty" if content is None else hashlib.blake2b(content, digest_size=8).hexdigest()
+
+
+def build_snapshot(content: Optional[bytes]) -> QuestionnaireSnapshot:
+    """Parse, compile and pre-render questionnaire file contents (None for a missing file)."""
+    questionnaires = {} if content is None else json.loads(content)
+    return QuestionnaireSnapshot(
+        version=content_version(content),
+        questionnaires=questionnaires,
+        index=compile_questionnaires(questionnaires),
+        rendered=render_json(questionnaires),
+        rendered_types=MappingProxyType({name: render_json(categories) for name, categories in questionnaires.items()}),
+        loaded_at=time.time(),
+    )
+
+
+class QuestionnaireStore:
+    """
+    Current questionnaire snapshot plus the watcher that keeps it up to date.
+
+    ``build`` turns the file contents (None for a missing file) into a
+    snapshot with ``version`` and ``loaded_at`` fields, so the same store can
+    serve other data files. The file is loaded once when the store is created. ``start()`` begins
+    polling it every ``poll_interval`` seconds in a daemon thread; a file that
+    fails to parse or goes missing is logged and the previous snapshot stays
+    in place.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        poll_interval: float = QUESTIONNAIRE_POLL_INTERVAL,
+        build: Callable[[Optional[bytes]], Any] = build_snapshot,
+    ):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.build = build
+        self.reloads = 0
+        self.errors = 0
+        self._signature = None
+        self._snapshot = build(None)
+        self._lock = threading.Lock()  # Serializes refreshes, never taken by readers
+        self._stop = threading.Event()
+        self._thread = None
+        self.refresh()
+
+    @property
+    def snapshot(self) -> Any:
+        return self._snapshot
+
+    def refresh(self) -> bool:
+        """Reload the file if it changed since the last check; returns whether the snapshot changed."""
+        with self._lock:
+            signature = _file_signature(self.path)
+            if signature == self._signature:
+                return False
+            self._signature = signature
+
+            # A file that disappears (e.g. mid-save) keeps the last good snapshot
+            if signature is None:
+                if self._snapshot.version != "empty":
+                    logger.warning(f"File {self.path} is missing, keeping version {self._snapshot.version}")
+                return False
+
+            try:
+                with open(self.path, "rb") as f:
+                    content = f.read()
+                snapshot = self.build(content)
+            except (OSError, ValueError) as e:
+                self.errors += 1
+                logger.error(f"Failed to load {self.path}, keeping version {self._snapshot.version}: {e}")
+                return False
+
+            # A touched but unchanged file keeps the current snapshot
+            if snapshot.version == self._snapshot.version:
+                return False
+
+            self._snapshot = snapshot
+            self.reloads += 1
+            logger.info(f"Loaded version {snapshot.version} of {self.path}")
+            return True
+
+    def _watch(self) -> None:
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.exception(e)
+
+    def start(self) -> None:
+        """Start watching the file in the background."""
+        if self._thread is not None or self.poll_interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._watch, name=f"watcher-{os.path.basename(self.path)}", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            "path": self.path,
+            "version": snapshot.version,
+            "loaded_at": snapshot.loaded_at,
+            "reloads": self.reloads,
+            "errors": self.errors,
+            "watching": self._thread is not None,
+        }
+
+
+# Shared by every consumer of the questionnaire
+questionnaire_store = QuestionnaireStore(QUESTIONNAIRES_PATH)
@@ -0,0 +1,107 @@
+"""
+Enterprise-wide readiness scoring.
+
+Combines a company's latest assessment of each pillar into one readiness
+score. Pillars with stored category means are re-scored with the company's
+current category weights, all in one ``score_batch`` call per category
+count, and the pillar scores are then combined with the effective pillar
+weights as plain arrays.
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from scoring import score_batch, unpack_results
+
+PILLARS = (
+    "AI Governance",
+    "AI Culture",
+    "AI Infrastructure",
+    "AI Strategy",
+    "AI Data",
+    "AI Talent",
+    "AI Security",
+)
+
+
+def is_personalized_data(data: Optional[Dict]) -> bool:
+    """Whether stored assessment data comes from ``POST /assessments/personalized``."""
+    if not isinstance(data, dict) or not isinstance(data.get("responses"), list):
+        return False
+    return any(isinstance(entry, dict) and "questions" in entry for entry in data["responses"])
+
+
+def stored_score(score: Optional[float], data: Optional[Dict]) -> Optional[float]:
+    """Return a stored assessment score on the 0-100 scale."""
+    if score is None:
+        return None
+    # Personalized assessments store the mean answer on the 1-4 scale
+    return score * 25 if is_personalized_data(data) else score
+
+
+def category_weights_for(
+    categories: Sequence[str],
+    company_weights: Optional[Dict[str, float]],
+    data: Optional[Dict],
+) -> Optional[List[float]]:
+    """
+    Resolve the weight of each category of a stored assessment.
+
+    The company's category weights for the pillar are used when they cover
+    every category, otherwise the weights saved with the assessment. Returns
+    None if neither covers every category.
+    """
+    saved_weights = data.get("userWeights") if isinstance(data, dict) else None
+    for weights in (company_weights, saved_weights):
+        if isinstance(weights, dict) and all(category in weights for category in categories):
+            row_weights = [float(weights[category]) for category in categories]
+            if sum(row_weights) > 0:
+                return row_weights
+    return None
+
+
+def score_pillars(pillars: Sequence[Tuple[str, Dict[str, float], List[float]]]) -> Dict[str, Dict[str, Any]]:
+    """
+    Score several pillars from their category means in one pass per category count.
+
+    Args:
+        pillars: (pillar, category means on the 1-4 scale, category weights) tuples.
+
+    Returns:
+        Dictionary of pillar -> ``AssessmentResult`` payload.
+    """
+    buckets = {}
+    for pillar, means, weights in pillars:
+        buckets.setdefault(len(means), []).append((pillar, list(means), [means[category] for category in means], weights))
+
+    results = {}
+    for items in buckets.values():
+        names, categories, scores, weights = zip(*items)
+        scored = score_batch(np.array(scores, dtype=np.float64), np.array(weights, dtype=np.float64))
+        results.update(zip(names, unpack_results(list(names), list(categories), scored)))
+    return results
+
+
+def combine_pillars(pillar_scores: Dict[str, Optional[float]], pillar_weights: Dict[str, float]) -> Dict[str, Any]:
+    """
+    Combine pillar scores (0-100) into the enterprise score.
+
+    Pillars without a score are left out and the weights of the scored pillars
+    are renormalized; ``coverage`` is the share of the total pillar weight
+    that was scored. Pillars with a score but no weight count with weight 0.
+    """
+    names = list(pillar_weights) + [pillar for pillar in pillar_scores if pillar not in pillar_weights]
+    weights = np.array([pillar_weights.get(pillar, 0.0) for pillar in names], dtype=np.float64)
+    scored = np.array([pillar_scores.get(pillar) is not None for pillar in names], dtype=bool)
+    scores = np.array([pillar_scores.get(pillar) or 0.0 for pillar in names], dtype=np.float64)
+
+    total_weight = weights.sum()
+    scored_weight = weights[scored].sum()
+    effective_weights = np.where(scored, weights, 0.0) / scored_weight * 100 if scored_weight > 0 else np.zeros_like(weights)
+
+    return {
+        "overallScore": float(np.dot(scores, effective_weights) / 100) if scored_weight > 0 else None,
+        "effectiveWeights": dict(zip(names, effective_weights.tolist())),
+        "coverage": float(scored_weight / total_weight) if total_weight > 0 else 0.0,
+    }
@@ -0,0 +1,199 @@
+"""
+Recommendation catalog.
+
+Maps assessment categories to comments and score-tiered recommendations. A
+category gets the texts of the first theme whose keyword occurs in its name
+(e.g. "Data Governance" is a governance category), or generic comments and
+no recommendations if none does. Each category is resolved once into a
+table entry holding its comments and the recommendation list of every score
+tier; the known categories are compiled at startup, so requests only do a
+dictionary lookup and a tier lookup.
+"""
+
+import threading
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Score tiers: below 30, below 60, and the rest, with the number of
+# recommendations given in each
+TIER_THRESHOLDS = (30, 60)
+TIER_SIZES = (5, 3, 2)
+
+# Colors of scores below 30, 60, 80 and from 80 up
+COLOR_THRESHOLDS = (30, 60, 80)
+COLORS = ("#EF4444", "#F59E0B", "#10B981", "#3B82F6")  # Red, amber, green, blue
+
+MAX_COMPILED_CATEGORIES = 4096  # Bound on categories compiled on demand
+
+
+class Theme(NamedTuple):
+    keyword: str  # Matched against category names
+    strength: str
+    improvement: str
+    recommendations: Tuple[str, ...]  # Most important first
+
+
+# In matching order
+THEMES = (
+    Theme(
+        "Governance",
+        "Your organization has established strong AI governance processes with clear policies and accountability structures.",
+        "Focus on developing structured AI governance policies and clearer accountability frameworks.",
+        (
+            "Establish clear policies for ethical AI development and usage",
+            "Create explicit roles for algorithmic accountability and oversight",
+            "Develop a comprehensive AI risk management framework",
+            "Implement regular AI ethics and governance training for all teams",
+            "Set up an AI review board to evaluate high-risk AI initiatives",
+        ),
+    ),
+    Theme(
+        "Data",
+        "You have robust data management practices, with high-quality data that is well organized and accessible.",
+        "Improve data quality, accessibility, and implement better data governance practices.",
+        (
+            "Implement a centralized data catalog for better data discovery",
+            "Establish strong data quality assurance processes",
+            "Create clear data governance policies and documentation",
+            "Improve data pipeline efficiency with automation",
+            "Implement bias detection and mitigation strategies",
+        ),
+    ),
+    Theme(
+        "Infrastructure",
+        "Your technical infrastructure is well-equipped to support AI initiatives with adequate compute and scalable environments.",
+        "Invest in more robust AI infrastructure and MLOps capabilities to support AI initiatives.",
+        (
+            "Invest in cloud-based AI infrastructure for scalability",
+            "Develop containerized environments for consistent AI deployment",
+            "Implement automated ML pipelines for faster experimentation",
+            "Establish robust monitoring for AI system performance",
+            "Create standardized environments for development and production",
+        ),
+    ),
+    Theme(
+        "Strategy",
+        "Your organization has a clear AI strategy that aligns with business objectives and includes effective security measures.",
+        "Develop a more comprehensive AI strategy with stronger security measures and better alignment with business goals.",
+        (
+            "Define clear business objectives for AI initiatives",
+            "Align AI projects with overall organizational strategy",
+            "Implement robust security measures for all AI assets",
+            "Create a roadmap for AI implementation with clear milestones",
+            "Establish metrics to track ROI from AI investments",
+        ),
+    ),
+    Theme(
+        "Talent",
+        "Your organization has effectively built AI capabilities through talent acquisition and training programs.",
+        "Implement more targeted AI talent acquisition and training programs to build necessary capabilities.",
+        (
+            "Create dedicated AI roles and clear career paths",
+            "Establish regular AI training programs for existing staff",
+            "Partner with academic institutions for talent pipeline",
+            "Implement knowledge sharing mechanisms across teams",
+            "Develop specialized AI skills in domain experts",
+        ),
+    ),
+    Theme(
+        "Culture",
+        "Your organization has cultivated a strong culture of AI adoption with leadership support and collaborative practices.",
+        "Work on fostering a more AI-friendly culture with stronger leadership support and more collaborative practices.",
+        (
+            "Secure executive sponsorship for AI initiatives",
+            "Create spaces for AI experimentation and innovation",
+            "Implement regular AI awareness sessions for all employees",
+            "Recognize and reward AI champions within the organization",
+            "Foster cross-functional collaboration on AI projects",
+        ),
+    ),
+)
+
+# Comments of categories that match no theme
+DEFAULT_STRENGTH = "Your organization demonstrates strength in {category} with a score of {score:.1f}%."
+DEFAULT_IMPROVEMENT = "Focus on enhancing capabilities in {category} from the current score of {score:.1f}%."
+
+
+class CategoryAdvice(NamedTuple):
+    theme: Optional[str]  # Keyword of the matched theme, None for the generic comments
+    strength: str  # Formatted with the category and score
+    improvement: str
+    tiers: Tuple[Tuple[str, ...], ...]  # Recommendations of each score tier
+
+
+def score_tier(score: float) -> int:
+    return bisect_right(TIER_THRESHOLDS, score)
+
+
+def score_color(score: float) -> str:
+    return COLORS[bisect_right(COLOR_THRESHOLDS, score)]
+
+
+def compile_advice(category: str, themes: Tuple[Theme, ...] = THEMES) -> CategoryAdvice:
+    for theme in themes:
+        if theme.keyword in category:
+            # Escape braces so the theme texts survive str.format
+            return CategoryAdvice(
+                theme=theme.keyword,
+                strength=theme.strength.replace("{", "{{").replace("}", "}}"),
+                improvement=theme.improvement.replace("{", "{{").replace("}", "}}"),
+                tiers=tuple(theme.recommendations[:size] for size in TIER_SIZES),
+            )
+    return CategoryAdvice(None, DEFAULT_STRENGTH, DEFAULT_IMPROVEMENT, tuple(() for _ in TIER_SIZES))
+
+
+class RecommendationCatalog:
+    """Table of category -> compiled advice; categories not compiled up front are compiled on first use."""
+
+    def __init__(self, themes: Tuple[Theme, ...] = THEMES, categories: Iterable[str] = ()):
+        self.themes = themes
+        self._table: Dict[str, CategoryAdvice] = {}
+        self._lock = threading.Lock()
+        self.compile(categories)
+
+    def compile(self, categories: Iterable[str]) -> None:
+        """Add ``categories`` to the table."""
+        compiled = {category: compile_advice(category, self.themes) for category in categories}
+        with self._lock:
+            self._table.update(compiled)
+
+    def advice(self, category: str) -> CategoryAdvice:
+        advice = self._table.get(category)
+        if advice is None:
+            advice = compile_advice(category, self.themes)
+            with self._lock:
+                if len(self._table) < MAX_COMPILED_CATEGORIES:
+                    self._table[category] = advice
+        return advice
+
+    def recommendations(self, category: str, score: float) -> List[str]:
+        return list(self.advice(category).tiers[score_tier(score)])
+
+    def strength_comment(self, category: str, score: float) -> str:
+        return self.advice(category).strength.format(category=category, score=score)
+
+    def improvement_comment(self, category: str, score: float) -> str:
+        return self.advice(category).improvement.format(category=category, score=score)
+
+    def category_report(self, category: str, score: float, target: float) -> Dict[str, Any]:
+        """Everything shown for one category score (0-100)."""
+        advice = self.advice(category)
+        return {
+            "category": category,
+            "score": score,
+            "target": target,
+            "gap": target - score,
+            "color": score_color(score),
+            "strengthComment": advice.strength.format(category=category, score=score),
+            "improvementComment": advice.improvement.format(category=category, score=score),
+            "recommendations": list(advice.tiers[score_tier(score)]),
+        }
+
+    def report(self, category_scores: Dict[str, float], target: float) -> List[Dict[str, Any]]:
+        """Reports of every category, largest gap to ``target`` first (ties keep their order)."""
+        reports = [self.category_report(category, score, target) for category, score in category_scores.items()]
+        reports.sort(key=lambda report: -report["gap"])
+        return reports
+
+
+recommendation_catalog = RecommendationCatalog()
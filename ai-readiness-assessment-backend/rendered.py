@@ -0,0 +1,111 @@
+"""
+Pre-rendered JSON responses.
+
+Documents that only change when their source data changes (such as the
+questionnaires) are serialized and compressed once, and then served as raw
+bytes with a strong ETag per encoding. Conditional requests whose
+``If-None-Match`` matches the ETag of the negotiated encoding get an empty
+304 response.
+"""
+
+import gzip
+import hashlib
+import json
+from typing import Any, Dict, NamedTuple, Optional
+
+from fastapi import Request, Response
+
+# Brotli is optional; without it responses are offered as gzip or identity only
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+
+class RenderedJSON(NamedTuple):
+    etag: str  # Strong ETag of the identity encoding, without quotes
+    bodies: Dict[str, bytes]  # Content coding ("identity", "gzip", "br") -> body
+
+
+def render_json(content: Any) -> RenderedJSON:
+    """Serialize ``content`` like FastAPI's JSONResponse and pre-compress it."""
+    body = json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+    bodies = {
+        "identity": body,
+        # mtime=0 keeps the gzip bytes, and so their ETag, stable across renders
+        "gzip": gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0),
+    }
+    if brotli is not None:
+        bodies["br"] = brotli.compress(body, quality=BROTLI_QUALITY)
+    return RenderedJSON(etag=hashlib.blake2b(body, digest_size=16).hexdigest(), bodies=bodies)
+
+
+def _entity_tag(rendered: RenderedJSON, coding: str) -> str:
+    # Each encoding is a different representation, so it gets its own strong tag
+    return f'"{rendered.etag}"' if coding == "identity" else f'"{rendered.etag}-{coding}"'
+
+
+def _accepted_qualities(accept_encoding: str) -> Dict[str, float]:
+    """Parse an Accept-Encoding header into content coding -> quality."""
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding] = quality
+    return qualities
+
+
+def negotiate_coding(rendered: RenderedJSON, accept_encoding: Optional[str]) -> str:
+    """Pick the best available content coding for an Accept-Encoding header."""
+    if not accept_encoding:
+        return "identity"
+    qualities = _accepted_qualities(accept_encoding)
+    best, best_quality = "identity", qualities.get("identity", qualities.get("*", 1.0))
+    # Prefer the smaller encodings when the client accepts them equally
+    for coding in ("gzip", "br"):
+        quality = qualities.get(coding, qualities.get("*", 0.0))
+        if coding in rendered.bodies and quality > 0 and quality >= best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def _matches(if_none_match: str, entity_tag: str) -> bool:
+    """Whether an If-None-Match header matches the representation being served."""
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/ prefixes are ignored. The
+    # tags of the other encodings don't match: a client holding the gzip body
+    # must not be told to reuse it when it now asks for identity
+    return any(tag.strip().removeprefix("W/") == entity_tag for tag in if_none_match.split(","))
+
+
+def rendered_response(request: Request, rendered: RenderedJSON) -> Response:
+    """Serve pre-rendered JSON, answering matching conditional requests with 304."""
+    coding = negotiate_coding(rendered, request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": _entity_tag(rendered, coding),
+        "Vary": "Accept-Encoding",
+        # Clients may keep a copy but must revalidate, since the data can change without a deploy
+        "Cache-Control": "no-cache",
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and _matches(if_none_match, headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+
+    if coding != "identity":
+        headers["Content-Encoding"] = coding
+    return Response(content=rendered.bodies[coding], media_type="application/json", headers=headers)
@@ -0,0 +1,76 @@
+"""
+Portfolio re-scoring script.
+
+Re-scores every stored assessment from its saved responses, e.g. after the
+scoring parameters changed. Parameters default to the production values in
+scoring.py and can only be overridden for a dry run.
+
+Usage:
+python rescore.py [--alpha 0.1] [--gamma 0.9] [--eta 1.0] [--weight-clamp 2.0]
+                  [--chunk-size 2000] [--workers N] [--assessment-type TYPE] [--dry-run]
+"""
+
+import argparse
+import sys
+import time
+
+from sqlalchemy import create_engine
+
+from database import DATABASE_URL
+from rescoring import DEFAULT_CHUNK_SIZE, RescoreJob
+from scoring import DEFAULT_PARAMS, ScoringParams
+
+PROGRESS_INTERVAL = 1.0  # seconds between progress lines
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Re-score all stored assessments.")
+    parser.add_argument("--database-url", default=DATABASE_URL, help="Database to re-score (default: DATABASE_URL)")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_PARAMS.alpha, help="Q-learning rate")
+    parser.add_argument("--gamma", type=float, default=DEFAULT_PARAMS.gamma, help="Q-learning discount factor")
+    parser.add_argument("--eta", type=float, default=DEFAULT_PARAMS.eta, help="Softmax scaling parameter")
+    parser.add_argument("--weight-clamp", type=float, default=DEFAULT_PARAMS.weight_clamp,
+                        help="Maximum deviation (percentage points) from the user weight")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Rows per chunk and per transaction")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Scoring processes (default: CPU count, 0 scores in this process)")
+    parser.add_argument("--assessment-type", default=None, help="Only re-score this assessment type")
+    parser.add_argument("--dry-run", action="store_true", help="Score everything but write nothing back")
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    engine = create_engine(args.database_url)
+    try:
+        job = RescoreJob(
+            engine,
+            params=ScoringParams(alpha=args.alpha, gamma=args.gamma, eta=args.eta, weight_clamp=args.weight_clamp),
+            chunk_size=args.chunk_size,
+            workers=args.workers,
+            assessment_type=args.assessment_type,
+            dry_run=args.dry_run,
+        )
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+
+    print(f"Re-scoring assessments with {job.params} using {job.workers} workers"
+          f"{' (dry run)' if job.dry_run else ''}...")
+
+    last_report = 0.0
+
+    def report(status):
+        nonlocal last_report
+        now = time.monotonic()
+        if now - last_report < PROGRESS_INTERVAL and status["processed"] < (status["total"] or 0):
+            return
+        last_report = now
+        total = status["total"] or 0
+        percent = 100 * status["processed"] / total if total else 100.0
+        print(f"Processed {status['processed']}/{total} ({percent:.1f}%) - "
+              f"{status['rowsPerSecond']:.0f} rows/s")
+
+    status = job.run(on_progress=report)
+    print(f"Re-scored {status['rescored']} assessments, skipped {status['skipped']} "
+          f"in {status['elapsedSeconds']:.1f}s ({status['rowsPerSecond']:.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+"""
+Re-scoring of stored assessments.
+
+Assessments saved through ``POST /assessments`` keep the per-category mean
+answers in ``Assessment.category_scores``. Everything after the means
+(Q-values, softmax, clamp and weighted sum) depends only on those means and
+the category weights, so when weights change the stored assessments can be
+re-scored without touching their raw responses.
+
+``RescoreJob`` re-scores the whole portfolio from the raw responses instead,
+for when the scoring parameters themselves change. Rows are streamed from the
+database in chunks, scored on a process pool and written back one chunk per
+transaction.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import Text, bindparam, func, select, type_coerce, update
+
+from models import Assessment
+from scoring import DEFAULT_PARAMS, ScoringParams, score_assessments, score_batch, unpack_results
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def category_means_from_data(data: Optional[Dict]) -> Optional[Dict[str, float]]:
+    """
+    Compute the mean answer (1-4) per category from stored assessment data.
+
+    ``data["responses"]`` holds one entry per category with the category name
+    and its list of question/answer pairs, as saved by the frontend. Returns
+    None if the data has no usable responses.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("responses"), list):
+        return None
+
+    means = {}
+    for entry in data["responses"]:
+        if not isinstance(entry, dict) or not entry.get("category"):
+            continue
+        answers = [
+            response.get("answer")
+            for response in entry.get("responses") or []
+            if isinstance(response, dict)
+        ]
+        if not answers or not all(isinstance(answer, int) and 1 <= answer <= 4 for answer in answers):
+            continue
+        means[entry["category"]] = sum(answers) / len(answers)
+
+    return means or None
+
+
+def responses_from_data(data: Optional[Dict]) -> Optional[Tuple[List[str], List[List[int]], List[float]]]:
+    """
+    Extract the scoring inputs from stored assessment data.
+
+    Returns (categories, answers, weights) in the order the categories were
+    saved, or None if any category lacks valid answers or a weight. The weight
+    of a category is taken from ``data["userWeights"]``, which tracks weight
+    changes, falling back to the weight saved with its responses.
+    """
+    if not isinstance(data, dict) or not isinstance(data.get("responses"), list) or not data["responses"]:
+        return None
+    saved_weights = data.get("userWeights") if isinstance(data.get("userWeights"), dict) else {}
+
+    categories, answers, weights = [], [], []
+    for entry in data["responses"]:
+        if not isinstance(entry, dict) or not entry.get("category"):
+            return None
+        category_answers = [
+            response.get("answer")
+            for response in entry.get("responses") or []
+            if isinstance(response, dict)
+        ]
+        if not category_answers or not all(isinstance(answer, int) and 1 <= answer <= 4 for answer in category_answers):
+            return None
+        weight = saved_weights.get(entry["category"], entry.get("weight"))
+        if not isinstance(weight, (int, float)) or isinstance(weight, bool):
+            return None
+        categories.append(entry["category"])
+        answers.append(category_answers)
+        weights.append(float(weight))
+
+    if sum(weights) <= 0:
+        return None
+    return categories, answers, weights
+
+
+def updated_data(data: Optional[Dict], result: Dict, user_weights: Dict[str, float]) -> Dict:
+    """Return a copy of stored assessment data with a scoring result merged in."""
+    data = dict(data or {})
+    data.update({
+        "categoryScores": result["categoryScores"],
+        "userWeights": user_weights,
+        "adjustedWeights": result["adjustedWeights"],
+        "qValues": result["qValues"],
+    })
+    return data
+
+
+def apply_result(assessment, result: Dict, user_weights: Dict[str, float]) -> None:
+    """Write a scoring result back onto an Assessment row."""
+    # Assign a new dict so SQLAlchemy picks up the JSON change
+    assessment.data = updated_data(assessment.data, result, user_weights)
+    assessment.score = result["overallScore"]
+    assessment.updated_at = datetime.utcnow()
+
+
+def rescore_with_weights(assessments: Iterable, weights: Dict[str, float]) -> List:
+    """
+    Re-score assessments from their stored category means using new category weights.
+
+    All assessments are scored in one pass per category count. An assessment
+    is skipped if it has no stored category means, or if any of its
+    categories has no weight. Returns the assessments that were updated.
+    """
+    buckets = {}
+    for assessment in assessments:
+        category_scores = assessment.category_scores
+        if not category_scores or any(category not in weights for category in category_scores):
+            continue
+        categories = list(category_scores)
+        row_weights = [float(weights[category]) for category in categories]
+        if sum(row_weights) <= 0:
+            continue
+        buckets.setdefault(len(categories), []).append(
+            (assessment, categories, [category_scores[category] for category in categories], row_weights)
+        )
+
+    updated = []
+    for items in buckets.values():
+        rows, categories, scores, row_weights = zip(*items)
+        scored = score_batch(np.array(scores, dtype=np.float64), np.array(row_weights, dtype=np.float64))
+        results = unpack_results([row.assessment_type for row in rows], categories, scored)
+        for row, row_categories, weights_row, result in zip(rows, categories, row_weights, results):
+            apply_result(row, result, dict(zip(row_categories, weights_row)))
+            updated.append(row)
+
+    return updated
+
+
+def rescore_rows(rows: Sequence[Tuple[str, str, Optional[str]]], params: ScoringParams = DEFAULT_PARAMS) -> Tuple[List[Dict], int]:
+    """
+    Re-score stored assessments from their raw responses.
+
+    ``rows`` holds (id, assessment_type, data) tuples with ``data`` as the
+    JSON text stored in the database. This is the unit of work handed to the
+    re-scoring pool, so rows are decoded and results encoded here rather than
+    in the process that talks to the database.
+
+    Returns (updates, skipped) where each update holds the bind parameters
+    for ``RESCORE_UPDATE`` and skipped counts rows without usable responses.
+    """
+    buckets = {}
+    skipped = 0
+    for assessment_id, assessment_type, raw_data in rows:
+        try:
+            # Some drivers decode JSON columns themselves
+            data = json.loads(raw_data) if isinstance(raw_data, str) else raw_data
+        except ValueError:
+            data = None
+        inputs = responses_from_data(data)
+        if inputs is None:
+            skipped += 1
+            continue
+        buckets.setdefault(len(inputs[0]), []).append((assessment_id, assessment_type, data) + inputs)
+
+    updated_at = datetime.utcnow()
+    updates = []
+    for items in buckets.values():
+        ids, types, datas, categories, answers, weights = zip(*items)
+        results = score_assessments(types, categories, answers, weights, params=params)
+        for assessment_id, data, row_categories, row_answers, row_weights, result in zip(
+            ids, datas, categories, answers, weights, results
+        ):
+            updates.append({
+                "_id": assessment_id,
+                "_score": result["overallScore"],
+                "_data": json.dumps(updated_data(data, result, dict(zip(row_categories, row_weights)))),
+                "_category_scores": json.dumps({
+                    category: sum(category_answers) / len(category_answers)
+                    for category, category_answers in zip(row_categories, row_answers)
+                }),
+                "_updated_at": updated_at,
+            })
+    return updates, skipped
+
+
+_assessments = Assessment.__table__
+
+# Data arrives already JSON-encoded from the workers, so bind it as plain text
+RESCORE_UPDATE = (
+    update(_assessments)
+    .where(_assessments.c.id == bindparam("_id"))
+    .values(
+        score=bindparam("_score"),
+        data=bindparam("_data", type_=Text),
+        category_scores=bindparam("_category_scores", type_=Text),
+        updated_at=bindparam("_updated_at"),
+    )
+)
+
+
+class RescoreJob:
+    """
+    Re-score every stored assessment with the given scoring parameters.
+
+    Rows are streamed with ``yield_per`` so memory stays bounded by the chunk
+    size, scored by ``rescore_rows`` on a process pool with a bounded number
+    of chunks in flight, and written back one chunk per transaction. Progress
+    and throughput are available from ``status()`` while the job runs.
+
+    Parameters other than ``DEFAULT_PARAMS`` are only accepted for dry runs:
+    live scoring always uses the defaults, so stored scores computed with
+    anything else would disagree with every newly submitted assessment.
+    """
+
+    def __init__(
+        self,
+        engine,
+        params: ScoringParams = DEFAULT_PARAMS,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        workers: Optional[int] = None,
+        assessment_type: Optional[str] = None,
+        dry_run: bool = False,
+    ):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if params != DEFAULT_PARAMS and not dry_run:
+            raise ValueError("Scoring parameters other than the defaults in scoring.py require a dry run")
+        self.id = str(uuid.uuid4())
+        self.engine = engine
+        self.params = params
+        self.chunk_size = chunk_size
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.assessment_type = assessment_type
+        self.dry_run = dry_run
+
+        self.state = "pending"
+        self.total = None
+        self.processed = 0
+        self.rescored = 0
+        self.skipped = 0
+        self.error = None
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.state in ("pending", "running")
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            return {
+                "id": self.id,
+                "state": self.state,
+                "params": self.params._asdict(),
+                "dryRun": self.dry_run,
+                "total": self.total,
+                "processed": self.processed,
+                "rescored": self.rescored,
+                "skipped": self.skipped,
+                "elapsedSeconds": elapsed,
+                "rowsPerSecond": self.processed / elapsed if elapsed > 0 else 0.0,
+                "error": self.error,
+            }
+
+    def _query(self, columns):
+        query = select(*columns)
+        if self.assessment_type is not None:
+            query = query.where(_assessments.c.assessment_type == self.assessment_type)
+        return query
+
+    def _record(self, updates: List[Dict], skipped: int, on_progress: Optional[Callable[[Dict], None]]) -> None:
+        with self._lock:
+            self.processed += len(updates) + skipped
+            self.rescored += len(updates)
+            self.skipped += skipped
+        if on_progress is not None:
+            on_progress(self.status())
+
+    def run(self, on_progress: Optional[Callable[[Dict], None]] = None) -> Dict[str, Any]:
+        """Run the job to completion and return its final status."""
+        with self._lock:
+            self.state = "running"
+            self.started_at = time.time()
+        try:
+            self._run(on_progress)
+        except Exception as e:
+            with self._lock:
+                self.state = "failed"
+                self.error = str(e)
+                self.finished_at = time.time()
+            raise
+        with self._lock:
+            self.state = "completed"
+            self.finished_at = time.time()
+        return self.status()
+
+    def _run(self, on_progress: Optional[Callable[[Dict], None]]) -> None:
+        with self.engine.connect() as reader:
+            self.total = reader.execute(self._query([func.count()]).select_from(_assessments)).scalar()
+
+            # SQLite allows a connection to commit while its own read is still
+            # stepping, but a second connection could not write until the read
+            # finished. Other databases write through a separate connection so
+            # the server-side cursor survives the commits.
+            sqlite = self.engine.dialect.name == "sqlite"
+            writer = reader if sqlite else self.engine.connect()
+            try:
+                rows = reader.execution_options(yield_per=self.chunk_size).execute(self._query([
+                    _assessments.c.id,
+                    _assessments.c.assessment_type,
+                    type_coerce(_assessments.c.data, Text),
+                ]))
+                chunks = ([tuple(row) for row in chunk] for chunk in rows.partitions())
+
+                def write(updates: List[Dict], skipped: int) -> None:
+                    if updates and not self.dry_run:
+                        writer.execute(RESCORE_UPDATE, updates)
+                        writer.commit()
+                    self._record(updates, skipped, on_progress)
+
+                if self.workers <= 0:
+                    for chunk in chunks:
+                        write(*rescore_rows(chunk, self.params))
+                    return
+
+                with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                    # Keep a bounded number of chunks in flight and write them
+                    # back in the order they were read
+                    pending = []
+                    for chunk in chunks:
+                        pending.append(executor.submit(rescore_rows, chunk, self.params))
+                        if len(pending) >= 2 * self.workers:
+                            write(*pending.pop(0).result())
+                    for future in pending:
+                        write(*future.result())
+            finally:
+                if writer is not reader:
+                    writer.close()
@@ -0,0 +1,356 @@
+"""
+Vectorized scoring engine.
+
+Runs the same pipeline as ``calculate_results`` in main.py (category means,
+Q-learning update, softmax, ±2% clamp and renormalization) over a whole batch
+of assessments at once. Every row of a batch must have the same number of
+categories; callers bucket their assessments by category count so that each
+reduction sees exactly the operand layout the single-item path sees.
+"""
+
+from itertools import chain
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Version of the scoring algorithm. Bump whenever a change alters scores so
+# that cached and stored results computed by older versions are not reused.
+SCORING_VERSION = 1
+
+# Reinforcement Learning Parameters
+ALPHA = 0.1  # Learning rate
+GAMMA = 0.9  # Discount factor
+ETA = 1.0  # Softmax scaling parameter
+WEIGHT_CLAMP = 2.0  # Maximum deviation (percentage points) from the user weight
+Q_PASSES = 10  # Number of Q-learning passes over the categories
+Q_SEED = 42  # Seed used to initialize Q-values
+
+# Q-value solvers
+SOLVER_LEGACY = "legacy"  # Exactly Q_PASSES passes, as calculate_results always did
+SOLVER_CONVERGED = "converged"  # Passes until the largest update falls below the tolerance
+SOLVER_FIXED_POINT = "fixed_point"  # Closed-form fixed point of the Q-update
+SOLVERS = (SOLVER_LEGACY, SOLVER_CONVERGED, SOLVER_FIXED_POINT)
+DEFAULT_TOLERANCE = 1e-9
+DEFAULT_MAX_ITERATIONS = 5000
+
+
+class ScoringParams(NamedTuple):
+    """Tunable parameters of the scoring pipeline; the defaults are the production values."""
+    alpha: float = ALPHA
+    gamma: float = GAMMA
+    eta: float = ETA
+    weight_clamp: float = WEIGHT_CLAMP
+
+
+DEFAULT_PARAMS = ScoringParams()
+
+
+def make_rng(seed: int = Q_SEED) -> np.random.RandomState:
+    """
+    Create an independent random generator for one scoring call.
+
+    A ``RandomState`` seeded with ``seed`` draws exactly what
+    ``np.random.seed(seed)`` used to produce, without touching NumPy's
+    process-wide random state.
+    """
+    return np.random.RandomState(seed)
+
+
+def initial_q_values(num_categories: int, rng: np.random.RandomState) -> np.ndarray:
+    """Draw the initial Q-values for an assessment with ``num_categories`` categories."""
+    return rng.uniform(0, 1, size=num_categories)
+
+
+def pack_answers(answer_lists: Sequence[Sequence[Sequence[int]]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pack ragged answers into a zero-padded answer cube.
+
+    Args:
+        answer_lists: One entry per assessment, each holding one list of
+            answers (1-4) per category. All assessments must have the same
+            number of categories.
+
+    Returns:
+        Tuple of (answers, counts) where answers has shape
+        (batch, categories, max_questions) and counts has shape
+        (batch, categories).
+    """
+    batch_size = len(answer_lists)
+    num_categories = len(answer_lists[0]) if batch_size else 0
+    category_answers = list(chain.from_iterable(answer_lists))
+    lengths = np.fromiter(map(len, category_answers), dtype=np.int64, count=len(category_answers))
+    max_questions = int(lengths.max()) if lengths.size else 0
+
+    answers = np.zeros((batch_size, num_categories, max_questions), dtype=np.int8)
+    # Fill the cube through a flat view so padding positions stay zero
+    flat_index = np.arange(lengths.size).repeat(lengths) * max_questions + _ragged_positions(lengths)
+    answers.reshape(-1)[flat_index] = np.fromiter(
+        chain.from_iterable(category_answers), dtype=np.int8, count=int(lengths.sum())
+    )
+    return answers, lengths.reshape(batch_size, num_categories)
+
+
+def _ragged_positions(lengths: np.ndarray) -> np.ndarray:
+    """Position of each element within its own segment, for segments of the given lengths."""
+    total = int(lengths.sum())
+    starts = np.cumsum(lengths) - lengths
+    return np.arange(total) - np.repeat(starts, lengths)
+
+
+def category_means(answers: np.ndarray, counts: np.ndarray) -> np.ndarray:
+    """Mean answer per category (1-4 scale) from a padded answer cube."""
+    return answers.sum(axis=2, dtype=np.int64) / counts
+
+
+def _sequential_sum(columns: np.ndarray) -> np.ndarray:
+    """Sum of the rows of a (categories, batch) array, accumulated like Python's built-in ``sum``."""
+    total = columns[0].copy()
+    for column in columns[1:]:
+        total += column
+    return total
+
+
+def _q_pass(
+    q_values: np.ndarray,
+    rewards: np.ndarray,
+    best: np.ndarray,
+    best_index: np.ndarray,
+    alpha: float = ALPHA,
+    gamma: float = GAMMA,
+) -> None:
+    """
+    Run one in-place pass of the Q-update over every category.
+
+    ``best``/``best_index`` track the running max of each column so the max
+    only has to be recomputed when the current maximum itself decreases.
+    """
+    for j in range(q_values.shape[0]):
+        q_values[j] += alpha * (rewards[j] + gamma * best - q_values[j])
+
+        raised = q_values[j] >= best
+        best[raised] = q_values[j][raised]
+        best_index[raised] = j
+
+        lowered = np.flatnonzero((best_index == j) & ~raised)
+        if lowered.size:
+            best[lowered] = q_values[:, lowered].max(axis=0)
+            best_index[lowered] = q_values[:, lowered].argmax(axis=0)
+
+
+def _q_pass_single(
+    q_values: List[float],
+    rewards: List[float],
+    best: float,
+    best_index: int,
+    alpha: float = ALPHA,
+    gamma: float = GAMMA,
+) -> Tuple[float, int]:
+    """Scalar version of ``_q_pass`` for a single assessment; returns the updated running max."""
+    for j, reward in enumerate(rewards):
+        q_values[j] += alpha * (reward + gamma * best - q_values[j])
+        if q_values[j] >= best:
+            best, best_index = q_values[j], j
+        elif best_index == j:
+            best = max(q_values)
+            best_index = q_values.index(best)
+    return best, best_index
+
+
+def _solve_single(
+    q_values: List[float],
+    rewards: List[float],
+    passes: int,
+    tolerance: Optional[float],
+    params: ScoringParams = DEFAULT_PARAMS,
+) -> List[float]:
+    """Run up to ``passes`` Q-update passes for one assessment, stopping early once converged."""
+    best = max(q_values)
+    best_index = q_values.index(best)
+    for _ in range(passes):
+        previous = list(q_values)
+        best, best_index = _q_pass_single(q_values, rewards, best, best_index, params.alpha, params.gamma)
+        if tolerance is not None and max(abs(a - b) for a, b in zip(q_values, previous)) < tolerance:
+            break
+    return q_values
+
+
+def solve_q_values(
+    q_values: np.ndarray,
+    rewards: np.ndarray,
+    solver: str = SOLVER_LEGACY,
+    tolerance: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+    params: ScoringParams = DEFAULT_PARAMS,
+) -> np.ndarray:
+    """
+    Run the Q-learning update on (categories, batch) arrays.
+
+    Args:
+        q_values: Initial Q-values, updated in place.
+        rewards: Reward per category (normalized weight * category score).
+        solver: One of SOLVERS. The legacy solver gives bit-identical results
+            to the original 10-pass loop.
+        tolerance: Convergence threshold on the largest Q-value change in a
+            pass (converged solver only).
+        max_iterations: Maximum number of passes (converged solver only).
+        params: Learning rate and discount factor to use.
+
+    Returns:
+        The solved Q-values.
+    """
+    alpha, gamma = params.alpha, params.gamma
+    if solver == SOLVER_FIXED_POINT:
+        # At the fixed point every q_j equals r_j + gamma * max(q), so the max
+        # itself is max(r) / (1 - gamma)
+        q_values[:] = rewards + gamma * (rewards.max(axis=0) / (1 - gamma))
+        return q_values
+
+    if solver not in (SOLVER_LEGACY, SOLVER_CONVERGED):
+        raise ValueError(f"Unknown solver: {solver}")
+
+    if q_values.shape[1] == 1:
+        # A single assessment is cheaper to iterate on Python floats than on
+        # one-element arrays
+        if solver == SOLVER_LEGACY:
+            solved = _solve_single(q_values[:, 0].tolist(), rewards[:, 0].tolist(), Q_PASSES, None, params)
+        else:
+            solved = _solve_single(q_values[:, 0].tolist(), rewards[:, 0].tolist(), max_iterations, tolerance, params)
+        q_values[:, 0] = solved
+        return q_values
+
+    if solver == SOLVER_LEGACY:
+        best = q_values.max(axis=0)
+        best_index = q_values.argmax(axis=0)
+        for _ in range(Q_PASSES):
+            _q_pass(q_values, rewards, best, best_index, alpha, gamma)
+        return q_values
+
+    # Converged rows are frozen so every result is independent of its batch mates
+    active = np.arange(q_values.shape[1])
+    for _ in range(max_iterations):
+        active_q = q_values[:, active]
+        previous = active_q.copy()
+        _q_pass(active_q, rewards[:, active], active_q.max(axis=0), active_q.argmax(axis=0), alpha, gamma)
+        q_values[:, active] = active_q
+        active = active[np.abs(active_q - previous).max(axis=0) >= tolerance]
+        if not active.size:
+            break
+    return q_values
+
+
+def score_batch(
+    category_scores: np.ndarray,
+    weights: np.ndarray,
+    solver: str = SOLVER_LEGACY,
+    tolerance: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+    seed: int = Q_SEED,
+    params: ScoringParams = DEFAULT_PARAMS,
+) -> Dict[str, np.ndarray]:
+    """
+    Score a batch of assessments.
+
+    Args:
+        category_scores: Mean answer per category, shape (batch, categories), 1-4 scale.
+        weights: User-defined category weights, shape (batch, categories), 0-100 scale.
+        solver: Q-value solver, one of SOLVERS.
+        tolerance: Convergence tolerance for the converged solver.
+        max_iterations: Pass limit for the converged solver.
+        seed: Seed for the Q-value initialization. Every row starts from the
+            same draws, as if each assessment were scored on its own.
+        params: Learning rate, discount factor, softmax scale and weight clamp.
+
+    Returns:
+        Dictionary of arrays keyed like ``AssessmentResult`` fields:
+        categoryScores, userWeights, qValues, adjustedWeights (all shaped
+        (batch, categories)) and overallScore (shape (batch,)).
+    """
+    # Work category-major so each category is one contiguous vector over the batch
+    scores = np.ascontiguousarray(np.asarray(category_scores, dtype=np.float64).T)
+    num_categories, batch_size = scores.shape
+
+    # Normalize User-defined Weights (Convert to Range 0-1)
+    user_weightages = np.ascontiguousarray(np.asarray(weights, dtype=np.float64).T) / 100
+    normalized_weights = user_weightages / _sequential_sum(user_weightages)
+
+    # Q-values start from the same seeded draws for every assessment of this width
+    q_values = np.repeat(initial_q_values(num_categories, make_rng(seed))[:, None], batch_size, axis=1)
+    rewards = normalized_weights * scores
+    q_values = solve_q_values(q_values, rewards, solver, tolerance, max_iterations, params)
+
+    # Compute Softmax Weights Using User Weightages and Q-values. The sum runs
+    # over contiguous rows so it matches the single-item reduction exactly.
+    exp_q_values = np.ascontiguousarray(np.exp(params.eta * (q_values * normalized_weights * scores)).T)
+    softmax_weights = (exp_q_values / np.sum(exp_q_values, axis=1, keepdims=True)).T
+
+    # Apply ±2% constraint around the original user weight
+    original_weight_pct = normalized_weights * 100
+    adjusted_weights = np.maximum(
+        original_weight_pct - params.weight_clamp,
+        np.minimum(softmax_weights * 100, original_weight_pct + params.weight_clamp),
+    )
+
+    # Normalize Adjusted Weights to Sum to 100%
+    adjusted_weights = (adjusted_weights / _sequential_sum(adjusted_weights)) * 100
+
+    # Compute Final AI Readiness Score (Weighted Sum)
+    overall_score = _sequential_sum(scores * (adjusted_weights / 100))
+
+    return {
+        "categoryScores": (scores * 25).T,  # Scale from 1-4 to 25-100
+        "userWeights": original_weight_pct.T,
+        "qValues": q_values.T,
+        "adjustedWeights": adjusted_weights.T,
+        "overallScore": overall_score * 25,
+    }
+
+
+def unpack_results(assessment_types: List[str], categories: List[List[str]], scored: Dict[str, np.ndarray]) -> List[Dict]:
+    """Convert ``score_batch`` output into one ``AssessmentResult`` payload per row."""
+    category_scores = scored["categoryScores"].tolist()
+    user_weights = scored["userWeights"].tolist()
+    q_values = scored["qValues"].tolist()
+    adjusted_weights = scored["adjustedWeights"].tolist()
+    overall_scores = scored["overallScore"].tolist()
+    return [
+        {
+            "assessmentType": assessment_types[row],
+            "categoryScores": dict(zip(categories[row], category_scores[row])),
+            "userWeights": dict(zip(categories[row], user_weights[row])),
+            "qValues": dict(zip(categories[row], q_values[row])),
+            "adjustedWeights": dict(zip(categories[row], adjusted_weights[row])),
+            "overallScore": overall_scores[row],
+        }
+        for row in range(len(overall_scores))
+    ]
+
+
+def score_assessments(
+    assessment_types: Sequence[str],
+    categories: Sequence[List[str]],
+    answer_lists: Sequence[Sequence[Sequence[int]]],
+    weights: Sequence[Sequence[float]],
+    solver: str = SOLVER_LEGACY,
+    tolerance: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+    seed: int = Q_SEED,
+    params: ScoringParams = DEFAULT_PARAMS,
+) -> List[Dict]:
+    """
+    Score assessments given as plain Python data and return ``AssessmentResult`` payloads.
+
+    This is the unit of work handed to the scoring executor, so it only takes
+    and returns picklable built-in types. All assessments must have the same
+    number of categories.
+    """
+    answers, counts = pack_answers(answer_lists)
+    scored = score_batch(
+        category_means(answers, counts),
+        np.array(weights, dtype=np.float64),
+        solver=solver,
+        tolerance=tolerance,
+        max_iterations=max_iterations,
+        seed=seed,
+        params=params,
+    )
+    return unpack_results(assessment_types, categories, scored)
@@ -0,0 +1,155 @@
+"""
+Weight-sensitivity sweeps.
+
+Scores one set of answers under many candidate category weight vectors. The
+answers are reduced to category means once and broadcast against every
+weight vector, so the whole sweep is a single ``score_batch`` call whose
+results match scoring each scenario on its own.
+"""
+
+from math import prod
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from scoring import (
+    DEFAULT_MAX_ITERATIONS,
+    DEFAULT_TOLERANCE,
+    SOLVER_LEGACY,
+    category_means,
+    pack_answers,
+    score_batch,
+)
+
+SENSITIVITY_STEP = 1.0  # Weight change (percentage points) used to measure each category's slope
+
+
+def build_scenarios(
+    categories: Sequence[str],
+    baseline: Sequence[float],
+    scenarios: Optional[List[Dict[str, float]]] = None,
+    grid: Optional[Dict[str, List[float]]] = None,
+    max_scenarios: Optional[int] = None,
+) -> np.ndarray:
+    """
+    Build the (scenarios, categories) weight matrix of a sweep.
+
+    Each entry of ``scenarios`` overrides the weights of some categories.
+    ``grid`` maps categories to candidate weights and expands to every
+    combination of them. Categories a scenario does not mention keep their
+    baseline weight. Grid scenarios follow the explicit ones.
+
+    Raises:
+        ValueError: If a scenario names an unknown category, has a negative
+            weight or no positive weight, or the sweep has more than
+            ``max_scenarios`` scenarios.
+    """
+    positions = {category: position for position, category in enumerate(categories)}
+    scenarios = scenarios or []
+    grid = grid or {}
+
+    for category in [category for scenario in scenarios for category in scenario] + list(grid):
+        if category not in positions:
+            raise ValueError(f"Unknown category in scenario: {category}")
+
+    grid_size = prod(len(values) for values in grid.values()) if grid else 0
+    total = len(scenarios) + grid_size
+    if total == 0:
+        raise ValueError("At least one scenario or grid is required")
+    if max_scenarios is not None and total > max_scenarios:
+        raise ValueError(f"Too many scenarios: {total} (maximum {max_scenarios})")
+
+    weights = np.tile(np.asarray(baseline, dtype=np.float64), (total, 1))
+    for row, scenario in enumerate(scenarios):
+        for category, weight in scenario.items():
+            weights[row, positions[category]] = weight
+    if grid_size:
+        columns = [positions[category] for category in grid]
+        axes = np.meshgrid(*[np.asarray(values, dtype=np.float64) for values in grid.values()], indexing="ij")
+        weights[len(scenarios):, columns] = np.stack(axes, axis=-1).reshape(grid_size, len(columns))
+
+    if (weights < 0).any():
+        raise ValueError("Scenario weights cannot be negative")
+    if (weights.sum(axis=1) <= 0).any():
+        raise ValueError("Every scenario needs at least one positive weight")
+    return weights
+
+
+def _correlation(x: np.ndarray, y: np.ndarray) -> Optional[float]:
+    """Pearson correlation of two vectors, or None if either is constant."""
+    x = x - x.mean()
+    y = y - y.mean()
+    denominator = np.sqrt((x * x).sum() * (y * y).sum())
+    return float((x * y).sum() / denominator) if denominator > 0 else None
+
+
+def sweep_weights(
+    categories: Sequence[str],
+    answers: Sequence[Sequence[int]],
+    baseline: Sequence[float],
+    weights: np.ndarray,
+    solver: str = SOLVER_LEGACY,
+    tolerance: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+) -> Dict[str, Any]:
+    """
+    Score one set of answers under every weight vector of a sweep.
+
+    Args:
+        categories: Category names, in the order of ``answers`` and the weight columns.
+        answers: One list of answers (1-4) per category.
+        baseline: The submitted category weights (0-100).
+        weights: Scenario weight matrix from ``build_scenarios``.
+
+    Returns:
+        Per-scenario overall scores and adjusted weights (in category order),
+        the baseline score, and for each category the slope of the overall
+        score per percentage point of weight at the baseline and the
+        correlation between its normalized weight and the overall score
+        across the sweep.
+    """
+    num_scenarios, num_categories = weights.shape
+    baseline = np.asarray(baseline, dtype=np.float64)
+
+    # The slope rows bump one category's baseline weight up and down
+    step = np.eye(num_categories) * SENSITIVITY_STEP
+    raised = baseline + step
+    lowered = np.maximum(baseline - step, 0)
+    all_weights = np.vstack([weights, baseline[None, :], raised, lowered])
+
+    packed, counts = pack_answers([answers])
+    means = category_means(packed, counts)
+    scored = score_batch(
+        np.broadcast_to(means, (all_weights.shape[0], num_categories)),
+        all_weights,
+        solver=solver,
+        tolerance=tolerance,
+        max_iterations=max_iterations,
+    )
+
+    overall = scored["overallScore"]
+    scenario_scores = overall[:num_scenarios]
+    baseline_score = float(overall[num_scenarios])
+    raised_scores = overall[num_scenarios + 1:num_scenarios + 1 + num_categories]
+    lowered_scores = overall[num_scenarios + 1 + num_categories:]
+    slopes = (raised_scores - lowered_scores) / (np.diag(raised) - np.diag(lowered))
+
+    shares = weights / weights.sum(axis=1, keepdims=True)
+    sensitivity = {
+        category: {
+            "slope": float(slopes[j]),
+            "correlation": _correlation(shares[:, j], scenario_scores) if num_scenarios > 1 else None,
+        }
+        for j, category in enumerate(categories)
+    }
+
+    return {
+        "categories": list(categories),
+        "overallScores": scenario_scores.tolist(),
+        "adjustedWeights": scored["adjustedWeights"][:num_scenarios].tolist(),
+        "baselineScore": baseline_score,
+        "minScore": float(scenario_scores.min()),
+        "maxScore": float(scenario_scores.max()),
+        "sensitivity": sensitivity,
+        "ranking": [categories[j] for j in np.argsort(-np.abs(slopes), kind="stable")],
+    }
@@ -165,15 +165,12 @@ if existing_users == 0:
     for user_data in DEFAULT_USERS:
         user_id = f"user_{uuid.uuid4()}"
         
-        # Convert roles to JSON string for storage
-        roles_json = json.dumps(user_data.get("roles", [user_data["role"]]))
-        
         db_user = User(
             id=user_id,
             email=user_data["email"],
             name=user_data["name"],
             role=user_data["role"],  # Legacy role field for backward compatibility
-            roles=roles_json,        # New multiple roles field as JSON
+            roles=user_data.get("roles", [user_data["role"]]),  # Stored in user_role_association
             hashed_password=pwd_context.hash(user_data["password"])
         )
         db.add(db_user)
@@ -250,13 +247,13 @@ if existing_users == 0:
 else:
     # If users exist, make sure they have the roles field populated
     print("Checking existing users for roles field...")
-    users_without_roles = db.query(User).filter(User.roles == None).all()
+    users_without_roles = db.query(User).filter(~User.role_entries.any()).all()
     updated_count = 0
     
     for user in users_without_roles:
         if user.role:
             # Set roles from single role
-            user.roles = json.dumps([user.role])
+            user.roles = [user.role]
             updated_count += 1
     
     if updated_count > 0:
@@ -0,0 +1,88 @@
+"""
+Single-flight request coalescing.
+
+Concurrent calls with the same key share one execution: the first caller
+runs the computation and every caller that arrives while it is in flight
+waits for and receives the same result (or exception). Synchronous and
+async callers (``do_async``) share the same in-flight calls. Callers that
+can't wrap the computation in a function (e.g. a generator streaming its
+partial results) use ``join`` and ``complete`` directly.
+"""
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SingleFlight:
+    """Coalesces concurrent calls by key; counters are available through ``stats()``."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.executions = 0
+        self.coalesced = 0
+
+    def join(self, key: Hashable) -> Tuple[Future, bool]:
+        """
+        Return the in-flight call for ``key`` and whether the caller has to run it.
+
+        A caller that has to run it must pass the outcome to ``complete``;
+        the others wait on the returned future.
+        """
+        with self._lock:
+            self.calls += 1
+            future = self._calls.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future, False
+            future = self._calls[key] = Future()
+            self.executions += 1
+            return future, True
+
+    def complete(self, key: Hashable, future: Future, result: Any = None, exception: Optional[BaseException] = None) -> None:
+        """Finish the call with ``key`` that ``join`` made the caller run, handing its outcome to the waiting callers."""
+        # Calls arriving from now on start a new execution
+        with self._lock:
+            del self._calls[key]
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run ``fn`` unless a call with ``key`` is in flight, in which case wait for its result."""
+        future, leader = self.join(key)
+        if not leader:
+            return future.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self.complete(key, future, exception=e)
+            raise
+        self.complete(key, future, result)
+        return result
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Awaitable]) -> Any:
+        """Async version of ``do``: await ``fn()`` or, without blocking the event loop, the call with ``key`` in flight."""
+        future, leader = self.join(key)
+        if not leader:
+            return await asyncio.wrap_future(future)
+        try:
+            result = await fn()
+        except BaseException as e:
+            self.complete(key, future, exception=e)
+            raise
+        self.complete(key, future, result)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "in_flight": len(self._calls),
+            }
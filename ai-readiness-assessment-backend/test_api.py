@@ -1,9 +1,120 @@
 import requests
 import json
+import random
 import time
+import uuid
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
 BASE_URL = "http://localhost:8000"
 
+# Seeded by the setup script (see "Default Users" in the README)
+ADMIN_EMAIL = "admin@cybergen.com"
+ADMIN_PASSWORD = "admin123"
+
+def login(email, password):
+    """Authorization headers for a user's bearer token"""
+    response = requests.post(f"{BASE_URL}/token", data={"username": email, "password": password})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+def create_company(headers):
+    """Create a company with a unique name and return its ID"""
+    response = requests.post(
+        f"{BASE_URL}/companies",
+        json={
+            "name": f"Test Company {uuid.uuid4().hex[:8]}",
+            "industry": "Technology",
+            "size": "Mid-size (100-999 employees)",
+            "region": "Europe",
+            "ai_maturity": "Exploring"
+        },
+        headers=headers
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+def create_user(roles):
+    """Create a user with a unique email and return its ID, email and password"""
+    email = f"test_{uuid.uuid4().hex[:8]}@example.com"
+    password = uuid.uuid4().hex
+    response = requests.post(
+        f"{BASE_URL}/users",
+        json={"email": email, "name": "Test User", "roles": roles, "password": password}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["id"], email, password
+
+def random_payloads(questionnaire, assessment_type, count, rng):
+    """Random submissions over random subsets of an assessment type's categories"""
+    categories = questionnaire[assessment_type]
+    payloads = []
+    for _ in range(count):
+        chosen = rng.sample(list(categories), rng.randint(1, len(categories)))
+        raw_weights = [rng.uniform(1, 10) for _ in chosen]
+        total_weight = sum(raw_weights)
+        payloads.append({
+            "assessmentType": assessment_type,
+            "categoryResponses": [
+                {
+                    "category": category,
+                    "weight": round(raw_weight * 100 / total_weight, 6),
+                    "responses": [{"question": q, "answer": rng.randint(1, 4)} for q in categories[category]]
+                }
+                for category, raw_weight in zip(chosen, raw_weights)
+            ]
+        })
+    return payloads
+
+def relabel_questions(payload):
+    """The same answers attached to rotated question texts: scored identically, but not a result cache hit"""
+    relabeled = json.loads(json.dumps(payload))
+    for category_response in relabeled["categoryResponses"]:
+        responses = category_response["responses"]
+        questions = [response["question"] for response in responses]
+        for response, question in zip(responses, questions[1:] + questions[:1]):
+            response["question"] = question
+    return relabeled
+
+def baseline_score(payload):
+    """Score a submission the way calculate_results did before the scoring engine"""
+    user_responses = {c["category"]: [r["answer"] for r in c["responses"]] for c in payload["categoryResponses"]}
+    user_weightages = {c["category"]: c["weight"] / 100 for c in payload["categoryResponses"]}
+    total_weight = sum(user_weightages.values())
+    normalized_user_weightages = {category: weight / total_weight for category, weight in user_weightages.items()}
+    category_scores = {category: float(np.mean(scores)) for category, scores in user_responses.items()}
+    
+    np.random.seed(42)
+    q_values = {category: float(np.random.uniform(0, 1)) for category in user_responses.keys()}
+    for _ in range(10):
+        for category in user_responses.keys():
+            reward = normalized_user_weightages[category] * category_scores[category]
+            q_values[category] += 0.1 * (reward + 0.9 * max(q_values.values()) - q_values[category])
+    
+    exp_q_values = np.exp(1.0 * np.array([
+        q_values[cat] * normalized_user_weightages[cat] * category_scores[cat]
+        for cat in user_responses.keys()
+    ]))
+    softmax_weights_array = exp_q_values / np.sum(exp_q_values)
+    adjusted_weights = {}
+    for i, category in enumerate(user_responses.keys()):
+        original_weight_pct = normalized_user_weightages[category] * 100
+        adjusted_weights[category] = max(original_weight_pct - 2, min(softmax_weights_array[i] * 100, original_weight_pct + 2))
+    total_adjusted_weight = sum(adjusted_weights.values())
+    adjusted_weights = {category: (weight / total_adjusted_weight) * 100 for category, weight in adjusted_weights.items()}
+    adjusted_weights_prop = {category: weight / 100 for category, weight in adjusted_weights.items()}
+    overall_score = sum(category_scores[cat] * adjusted_weights_prop[cat] for cat in user_responses.keys())
+    
+    return {
+        "assessmentType": payload["assessmentType"],
+        "categoryScores": {k: v * 25 for k, v in category_scores.items()},
+        "userWeights": {category: weight * 100 for category, weight in normalized_user_weightages.items()},
+        "qValues": q_values,
+        "adjustedWeights": adjusted_weights,
+        "overallScore": overall_score * 25,
+        "uncertainty": None
+    }
+
 def test_api_health():
     """Test the API health endpoint"""
     try:
@@ -55,6 +166,190 @@ def test_questionnaire_by_type():
         print(f"❌ Questionnaire by type endpoint failed: {str(e)}")
         return False
 
+def test_calculate_results_batch():
+    """Test scoring several assessments through the batch endpoint"""
+    try:
+        response = requests.get(f"{BASE_URL}/questionnaires")
+        all_questionnaires = response.json()
+        
+        assessment_type = list(all_questionnaires.keys())[0]
+        categories = all_questionnaires[assessment_type]
+        weight = 100 / len(categories)
+        
+        payloads = []
+        for answer in range(1, 5):
+            payloads.append({
+                "assessmentType": assessment_type,
+                "categoryResponses": [
+                    {
+                        "category": category,
+                        "weight": weight,
+                        "responses": [{"question": q, "answer": answer} for q in questions]
+                    }
+                    for category, questions in categories.items()
+                ]
+            })
+        
+        response = requests.post(f"{BASE_URL}/calculate-results/batch", json=payloads)
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data) == len(payloads)
+        
+        # Each result must match scoring the same payload on its own
+        single = requests.post(f"{BASE_URL}/calculate-results", json=payloads[0]).json()
+        assert abs(single["overallScore"] - data[0]["overallScore"]) < 1e-9
+        
+        print(f"✅ Batch scoring endpoint passed for {len(data)} assessments")
+        return True
+    except Exception as e:
+        print(f"❌ Batch scoring endpoint failed: {str(e)}")
+        return False
+
+def test_solvers():
+    """Test that every solver scores a submission the same on its own and in a batch,
+    and that the legacy solver reproduces the original scoring exactly"""
+    try:
+        all_questionnaires = requests.get(f"{BASE_URL}/questionnaires").json()
+        # A fresh seed per run keeps the submissions out of the result cache
+        seed = time.time_ns()
+        rng = random.Random(seed)
+        
+        for mode in ("legacy", "converged", "fixed_point"):
+            payloads = []
+            for assessment_type in all_questionnaires:
+                payloads.extend(random_payloads(all_questionnaires, assessment_type, 5, rng))
+            for payload in payloads:
+                payload["solver"] = {"mode": mode}
+            
+            singles = []
+            for payload in payloads:
+                response = requests.post(f"{BASE_URL}/calculate-results", json=payload)
+                assert response.status_code == 200, response.text
+                singles.append(response.json())
+            
+            # Relabeled so the batch is scored rather than answered from the result cache
+            response = requests.post(f"{BASE_URL}/calculate-results/batch", json=[relabel_questions(p) for p in payloads])
+            assert response.status_code == 200, response.text
+            assert response.json() == singles, f"{mode}: batch results differ from single results (seed {seed})"
+            
+            if mode == "legacy":
+                for payload, single in zip(payloads, singles):
+                    assert single == baseline_score(payload), f"legacy result differs from the original scoring (seed {seed}): {payload}"
+        
+        print(f"✅ Solver endpoint passed for {len(payloads)} assessments per solver")
+        return True
+    except Exception as e:
+        print(f"❌ Solver endpoint failed: {str(e)}")
+        return False
+
+def test_calculate_results_validation():
+    """Test that unknown categories and questions are rejected and identical submissions are cached"""
+    try:
+        all_questionnaires = requests.get(f"{BASE_URL}/questionnaires").json()
+        assessment_type = list(all_questionnaires.keys())[0]
+        payload = random_payloads(all_questionnaires, assessment_type, 1, random.Random(time.time_ns()))[0]
+        
+        unknown_category = json.loads(json.dumps(payload))
+        unknown_category["categoryResponses"][0]["category"] = "Not A Category"
+        response = requests.post(f"{BASE_URL}/calculate-results", json=unknown_category)
+        assert response.status_code == 400, response.text
+        
+        unknown_question = json.loads(json.dumps(payload))
+        unknown_question["categoryResponses"][0]["responses"][0]["question"] = "Not a question?"
+        response = requests.post(f"{BASE_URL}/calculate-results", json=unknown_question)
+        assert response.status_code == 400, response.text
+        
+        first = requests.post(f"{BASE_URL}/calculate-results", json=payload).json()
+        hits = requests.get(f"{BASE_URL}/metrics").json()["result_cache"]["hits"]
+        second = requests.post(f"{BASE_URL}/calculate-results", json=payload).json()
+        assert second == first
+        assert requests.get(f"{BASE_URL}/metrics").json()["result_cache"]["hits"] == hits + 1
+        
+        print("✅ Calculate results validation passed")
+        return True
+    except Exception as e:
+        print(f"❌ Calculate results validation failed: {str(e)}")
+        return False
+
+def test_rescore_parameters():
+    """Test that scoring parameter overrides are only accepted for dry runs"""
+    try:
+        headers = login(ADMIN_EMAIL, ADMIN_PASSWORD)
+        response = requests.post(f"{BASE_URL}/admin/rescore", json={"alpha": 0.2}, headers=headers)
+        assert response.status_code == 400, response.text
+        
+        response = requests.post(f"{BASE_URL}/admin/rescore", json={"alpha": 0.2, "dryRun": True}, headers=headers)
+        assert response.status_code == 202, response.text
+        job_id = response.json()["id"]
+        for _ in range(60):
+            job = requests.get(f"{BASE_URL}/admin/rescore/{job_id}", headers=headers).json()
+            if job["state"] not in ("pending", "running"):
+                break
+            time.sleep(0.5)
+        assert job["state"] == "completed", job
+        
+        print("✅ Rescore parameters passed")
+        return True
+    except Exception as e:
+        print(f"❌ Rescore parameters failed: {str(e)}")
+        return False
+
+def test_company_access_follows_assignments():
+    """Test that assigning and unassigning a user applies to tokens issued before the change"""
+    try:
+        admin_headers = login(ADMIN_EMAIL, ADMIN_PASSWORD)
+        company_id = create_company(admin_headers)
+        user_id, email, password = create_user(["governance"])
+        try:
+            headers = login(email, password)
+            url = f"{BASE_URL}/companies/{company_id}"
+            assert requests.get(url, headers=headers).status_code == 403
+            
+            response = requests.post(f"{url}/assign-users", json={"company_id": company_id, "user_ids": [user_id]}, headers=admin_headers)
+            assert response.status_code == 200, response.text
+            assert requests.get(url, headers=headers).status_code == 200
+            
+            response = requests.post(f"{url}/assign-users", json={"company_id": company_id, "user_ids": []}, headers=admin_headers)
+            assert response.status_code == 200, response.text
+            assert requests.get(url, headers=headers).status_code == 403
+            assert requests.get(f"{url}/assessments", headers=headers).status_code == 403
+        finally:
+            requests.delete(f"{BASE_URL}/users/{user_id}", headers=admin_headers)
+            requests.delete(f"{BASE_URL}/companies/{company_id}", headers=admin_headers)
+        
+        print("✅ Company access follows assignments")
+        return True
+    except Exception as e:
+        print(f"❌ Company access does not follow assignments: {str(e)}")
+        return False
+
+def test_user_changes_revoke_tokens():
+    """Test that demoting or deleting a user applies to tokens issued before the change"""
+    try:
+        admin_headers = login(ADMIN_EMAIL, ADMIN_PASSWORD)
+        user_id, email, password = create_user(["admin"])
+        try:
+            headers = login(email, password)
+            assert requests.get(f"{BASE_URL}/users", headers=headers).status_code == 200
+            
+            response = requests.put(
+                f"{BASE_URL}/users/{user_id}",
+                json={"email": email, "name": "Test User", "roles": ["governance"]},
+                headers=admin_headers
+            )
+            assert response.status_code == 200, response.text
+            assert requests.get(f"{BASE_URL}/users", headers=headers).status_code == 403
+        finally:
+            response = requests.delete(f"{BASE_URL}/users/{user_id}", headers=admin_headers)
+        assert response.status_code == 200, response.text
+        assert requests.get(f"{BASE_URL}/users/me", headers=headers).status_code == 401
+        
+        print("✅ User changes revoke tokens")
+        return True
+    except Exception as e:
+        print(f"❌ User changes do not revoke tokens: {str(e)}")
+        return False
+
 def test_recommend_weights():
     """Test the recommend weights endpoint"""
     try:
@@ -86,6 +381,40 @@ def test_recommend_weights():
         print(f"❌ Recommend weights endpoint failed: {str(e)}")
         return False
 
+def test_personalized_single_flight():
+    """Test that concurrent requests for a personalized questionnaire share one generation
+
+    Start the server with QUESTION_GENERATOR=simulated, so the generation
+    takes long enough for the requests to overlap, and PREGENERATION_WORKERS=0,
+    so no background generation of the new company races them.
+    """
+    try:
+        headers = login(ADMIN_EMAIL, ADMIN_PASSWORD)
+        company_id = create_company(headers)
+        try:
+            assessment_type = list(requests.get(f"{BASE_URL}/questionnaires").json().keys())[0]
+            url = f"{BASE_URL}/questionnaire/{assessment_type}/personalized/{company_id}"
+            before = requests.get(f"{BASE_URL}/metrics").json()["personalized_single_flight"]
+            
+            requests_count = 8
+            with ThreadPoolExecutor(max_workers=requests_count) as executor:
+                responses = list(executor.map(lambda _: requests.get(url, headers=headers), range(requests_count)))
+            
+            after = requests.get(f"{BASE_URL}/metrics").json()["personalized_single_flight"]
+            assert all(response.status_code == 200 for response in responses)
+            assert all(response.json() == responses[0].json() for response in responses)
+            # One request generated the questionnaire, the others awaited its result
+            assert after["executions"] - before["executions"] == 1
+            assert after["coalesced"] - before["coalesced"] == requests_count - 1
+        finally:
+            requests.delete(f"{BASE_URL}/companies/{company_id}", headers=headers)
+        
+        print(f"✅ Personalized single flight passed, {requests_count} requests shared one generation")
+        return True
+    except Exception as e:
+        print(f"❌ Personalized single flight failed: {str(e)}")
+        return False
+
 def run_all_tests():
     """Run all API tests"""
     print("🔍 Running API tests...")
@@ -94,7 +423,14 @@ def run_all_tests():
         test_api_health,
         test_questionnaires,
         test_questionnaire_by_type,
-        test_recommend_weights
+        test_calculate_results_batch,
+        test_solvers,
+        test_calculate_results_validation,
+        test_rescore_parameters,
+        test_company_access_follows_assignments,
+        test_user_changes_revoke_tokens,
+        test_recommend_weights,
+        test_personalized_single_flight
     ]
     
     results = []
@@ -0,0 +1,108 @@
+"""
+Monte Carlo uncertainty of assessment scores.
+
+Perturbs the answers and weights of one assessment many times and scores all
+the perturbed copies as one batch, giving percentile bands that show how
+much the overall and category scores depend on individual answers and
+weights.
+"""
+
+from typing import Any, Dict, Sequence
+
+import numpy as np
+
+from scoring import (
+    DEFAULT_MAX_ITERATIONS,
+    DEFAULT_TOLERANCE,
+    SOLVER_LEGACY,
+    category_means,
+    pack_answers,
+    score_batch,
+)
+
+
+def perturb_answers(answers: np.ndarray, counts: np.ndarray, samples: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Draw perturbed copies of a (categories, max_questions) answer matrix.
+
+    Each answer independently moves one level up or down with probability
+    ``noise`` (either direction equally likely), staying within 1-4. Padding
+    positions stay zero.
+    """
+    steps = rng.random((samples,) + answers.shape)
+    shift = np.where(steps < noise / 2, -1, np.where(steps < noise, 1, 0)).astype(np.int8)
+    perturbed = np.clip(answers + shift, 1, 4).astype(np.int8)
+    padding = np.arange(answers.shape[1]) >= counts[:, None]
+    perturbed[:, padding] = 0
+    return perturbed
+
+
+def perturb_weights(weights: np.ndarray, samples: int, noise: float, rng: np.random.Generator) -> np.ndarray:
+    """
+    Draw perturbed copies of a weight vector.
+
+    Each weight is scaled by an independent factor ``1 + noise * N(0, 1)``,
+    floored at zero. Samples left with no positive weight keep the original
+    weights.
+    """
+    factors = np.maximum(1 + noise * rng.standard_normal((samples, weights.size)), 0)
+    perturbed = weights * factors
+    perturbed[perturbed.sum(axis=1) <= 0] = weights
+    return perturbed
+
+
+def simulate_scores(
+    categories: Sequence[str],
+    answers: Sequence[Sequence[int]],
+    weights: Sequence[float],
+    samples: int,
+    answer_noise: float,
+    weight_noise: float,
+    percentiles: Sequence[float],
+    seed: int,
+    solver: str = SOLVER_LEGACY,
+    tolerance: float = DEFAULT_TOLERANCE,
+    max_iterations: int = DEFAULT_MAX_ITERATIONS,
+) -> Dict[str, Any]:
+    """
+    Score ``samples`` perturbed copies of one assessment and summarize them.
+
+    Args:
+        categories: Category names, in the order of ``answers`` and ``weights``.
+        answers: One list of answers (1-4) per category.
+        weights: Category weights (0-100).
+        samples: Number of perturbed copies.
+        answer_noise: Probability that each answer moves one level.
+        weight_noise: Relative standard deviation of each weight.
+        percentiles: Percentiles (0-100) to report.
+        seed: Seed of this simulation, so a request can be reproduced.
+
+    Returns:
+        Dictionary matching ``UncertaintyResult``: the requested percentiles
+        of the overall score and of each category score (25-100 scale), plus
+        the mean and standard deviation of the overall score.
+    """
+    rng = np.random.default_rng(seed)
+    packed, counts = pack_answers([answers])
+    perturbed = perturb_answers(packed[0], counts[0], samples, answer_noise, rng)
+    sample_weights = perturb_weights(np.asarray(weights, dtype=np.float64), samples, weight_noise, rng)
+
+    scored = score_batch(
+        category_means(perturbed, np.broadcast_to(counts, (samples, len(categories)))),
+        sample_weights,
+        solver=solver,
+        tolerance=tolerance,
+        max_iterations=max_iterations,
+    )
+
+    overall = scored["overallScore"]
+    category_bands = np.percentile(scored["categoryScores"], percentiles, axis=0).T.tolist()
+    return {
+        "samples": samples,
+        "seed": seed,
+        "percentiles": list(percentiles),
+        "overallScore": np.percentile(overall, percentiles).tolist(),
+        "categoryScores": dict(zip(categories, category_bands)),
+        "mean": float(overall.mean()),
+        "std": float(overall.std()),
+    }
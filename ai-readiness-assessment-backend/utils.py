@@ -1,7 +1,8 @@
 import os
 import requests
 import json
-from typing import Dict, List, Optional
+import hashlib
+from typing import Dict, Iterator, List, Optional
 import logging
 
 # Add new imports for OpenAI integration
@@ -11,6 +12,16 @@ from dotenv import load_dotenv
 # Add import for Company model
 from models import Company
 
+# Shared questionnaire snapshot
+from questionnaire_store import questionnaire_store
+
+# Pluggable, concurrent question generation
+from question_generation import QUESTION_GENERATOR, TemplateQuestionGenerator, create_question_generator
+from question_generation import generate_categories, stream_categories, generation_loop
+
+# Precompiled comments and recommendations per category
+from recommendations import recommendation_catalog, score_color
+
 # Setup logger
 logger = logging.getLogger("api.utils")
 
@@ -24,111 +35,25 @@ def get_color_for_score(score):
     """
     Returns an appropriate color based on the score range
     """
-    if score < 30:
-        return "#EF4444"  # Red
-    elif score < 60:
-        return "#F59E0B"  # Amber
-    elif score < 80:
-        return "#10B981"  # Green
-    else:
-        return "#3B82F6"  # Blue
+    return score_color(score)
 
 def get_strength_comment(category, score):
     """
     Return a customized strength comment based on the category and score
     """
-    if "Governance" in category:
-        return "Your organization has established strong AI governance processes with clear policies and accountability structures."
-    elif "Data" in category:
-        return "You have robust data management practices, with high-quality data that is well organized and accessible."
-    elif "Infrastructure" in category:
-        return "Your technical infrastructure is well-equipped to support AI initiatives with adequate compute and scalable environments."
-    elif "Strategy" in category:
-        return "Your organization has a clear AI strategy that aligns with business objectives and includes effective security measures."
-    elif "Talent" in category:
-        return "Your organization has effectively built AI capabilities through talent acquisition and training programs."
-    elif "Culture" in category:
-        return "Your organization has cultivated a strong culture of AI adoption with leadership support and collaborative practices."
-    else:
-        return f"Your organization demonstrates strength in {category} with a score of {score:.1f}%."
+    return recommendation_catalog.strength_comment(category, score)
 
 def get_improvement_comment(category, score):
     """
     Return a customized improvement comment based on the category and score
     """
-    if "Governance" in category:
-        return "Focus on developing structured AI governance policies and clearer accountability frameworks."
-    elif "Data" in category:
-        return "Improve data quality, accessibility, and implement better data governance practices."
-    elif "Infrastructure" in category:
-        return "Invest in more robust AI infrastructure and MLOps capabilities to support AI initiatives."
-    elif "Strategy" in category:
-        return "Develop a more comprehensive AI strategy with stronger security measures and better alignment with business goals."
-    elif "Talent" in category:
-        return "Implement more targeted AI talent acquisition and training programs to build necessary capabilities."
-    elif "Culture" in category:
-        return "Work on fostering a more AI-friendly culture with stronger leadership support and more collaborative practices."
-    else:
-        return f"Focus on enhancing capabilities in {category} from the current score of {score:.1f}%."
+    return recommendation_catalog.improvement_comment(category, score)
 
 def get_recommendations(category, score):
     """
     Return a list of customized recommendations based on the category and score
     """
-    recommendations = []
-    
-    if "Governance" in category:
-        recommendations = [
-            "Establish clear policies for ethical AI development and usage",
-            "Create explicit roles for algorithmic accountability and oversight",
-            "Develop a comprehensive AI risk management framework",
-            "Implement regular AI ethics and governance training for all teams",
-            "Set up an AI review board to evaluate high-risk AI initiatives"
-        ]
-    elif "Data" in category:
-        recommendations = [
-            "Implement a centralized data catalog for better data discovery",
-            "Establish strong data quality assurance processes",
-            "Create clear data governance policies and documentation",
-            "Improve data pipeline efficiency with automation",
-            "Implement bias detection and mitigation strategies"
-        ]
-    elif "Infrastructure" in category:
-        recommendations = [
-            "Invest in cloud-based AI infrastructure for scalability",
-            "Develop containerized environments for consistent AI deployment",
-            "Implement automated ML pipelines for faster experimentation",
-            "Establish robust monitoring for AI system performance",
-            "Create standardized environments for development and production"
-        ]
-    elif "Strategy" in category:
-        recommendations = [
-            "Define clear business objectives for AI initiatives",
-            "Align AI projects with overall organizational strategy",
-            "Implement robust security measures for all AI assets",
-            "Create a roadmap for AI implementation with clear milestones",
-            "Establish metrics to track ROI from AI investments"
-        ]
-    elif "Talent" in category:
-        recommendations = [
-            "Create dedicated AI roles and clear career paths",
-            "Establish regular AI training programs for existing staff",
-            "Partner with academic institutions for talent pipeline",
-            "Implement knowledge sharing mechanisms across teams",
-            "Develop specialized AI skills in domain experts"
-        ]
-    elif "Culture" in category:
-        recommendations = [
-            "Secure executive sponsorship for AI initiatives",
-            "Create spaces for AI experimentation and innovation",
-            "Implement regular AI awareness sessions for all employees",
-            "Recognize and reward AI champions within the organization",
-            "Foster cross-functional collaboration on AI projects"
-        ]
-    
-    # Return top 5 or fewer recommendations based on score
-    num_recommendations = 5 if score < 30 else (3 if score < 60 else 2)
-    return recommendations[:num_recommendations]
+    return recommendation_catalog.recommendations(category, score)
 
 def generate_personalized_questions(company_info: Dict, pillar: str, category: str, num_questions: int = 5) -> List[Dict]:
     """
@@ -303,7 +228,53 @@ def generate_personalized_questions(company_info: Dict, pillar: str, category: s
         logger.error(f"Error generating personalized questions: {str(e)}")
         return []
 
-def get_personalized_assessment(company_id: str, pillar: str, db) -> Dict:
+# The templates above are also the fallback when the configured generator fails
+template_generator = TemplateQuestionGenerator(generate_personalized_questions)
+question_generator = create_question_generator(QUESTION_GENERATOR, template_generator)
+
+def _load_questionnaires(pillar: str) -> Dict:
+    """
+    Get the questionnaires from the shared questionnaire snapshot, falling back
+    to default categories for the pillar if the file doesn't exist.
+    """
+    questionnaires = questionnaire_store.snapshot.questionnaires
+    if questionnaires:
+        return questionnaires
+    else:
+        # Create default categories if questionnaires file doesn't exist
+        logger.warning("questionnaires.json not found, using default categories")
+        if pillar == "AI Talent":
+            return {
+                "AI Talent": ["Talent Acquisition", "Training & Development", "Retention & Culture"]
+            }
+        elif pillar == "AI Data":
+            return {
+                "AI Data": ["Data Quality", "Data Governance", "AI-Ready Infrastructure"]
+            }
+        else:
+            return {pillar: ["Strategy", "Implementation", "Monitoring"]}
+
+def company_profile(company: Company) -> Dict:
+    """
+    The company fields personalized questions are generated from.
+    """
+    return {
+        "id": company.id,
+        "name": company.name,
+        "industry": company.industry,
+        "size": company.size,
+        "region": company.region,
+        "ai_maturity": company.ai_maturity
+    }
+
+def profile_digest(company_info: Dict) -> str:
+    """
+    Digest of the profile fields that change the generated questions.
+    """
+    fields = [company_info.get(field) for field in ("name", "industry", "size", "region", "ai_maturity")]
+    return hashlib.blake2b(json.dumps(fields).encode("utf-8"), digest_size=16).hexdigest()
+
+def get_personalized_assessment(company_id: str, pillar: str, db, categories: Optional[List[str]] = None, company: Optional[Company] = None) -> Dict:
     """
     Get a complete personalized assessment for a specific company and pillar.
     
@@ -311,43 +282,27 @@ def get_personalized_assessment(company_id: str, pillar: str, db) -> Dict:
         company_id: The ID of the company
         pillar: The assessment pillar (e.g., "AI Governance")
         db: Database session
+        categories: Categories of the pillar, if the caller already has them
+            from the compiled questionnaire index
+        company: The company, if the caller already loaded it
         
     Returns:
         Dictionary containing the complete assessment with personalized questions
     """
     try:
         # Get company info from database
-        company = db.query(Company).filter(Company.id == company_id).first()
+        if company is None:
+            company = db.query(Company).filter(Company.id == company_id).first()
         
         if not company:
             return {"error": "Company not found"}
             
-        company_info = {
-            "id": company.id,
-            "name": company.name,
-            "industry": company.industry,
-            "size": company.size,
-            "region": company.region,
-            "ai_maturity": company.ai_maturity
-        }
+        company_info = company_profile(company)
         
-        # Load questionnaires directly from file
-        try:
-            with open("data/questionnaires.json", "r") as f:
-                questionnaires = json.load(f)
-        except FileNotFoundError:
-            # Create default categories if questionnaires file doesn't exist
-            logger.warning("questionnaires.json not found, using default categories")
-            if pillar == "AI Talent":
-                questionnaires = {
-                    "AI Talent": ["Talent Acquisition", "Training & Development", "Retention & Culture"]
-                }
-            elif pillar == "AI Data":
-                questionnaires = {
-                    "AI Data": ["Data Quality", "Data Governance", "AI-Ready Infrastructure"]
-                }
-            else:
-                questionnaires = {pillar: ["Strategy", "Implementation", "Monitoring"]}
+        if categories is not None:
+            questionnaires = {pillar: categories}
+        else:
+            questionnaires = _load_questionnaires(pillar)
         
         # Get the categories for this pillar from the questionnaires data
         if pillar not in questionnaires:
@@ -356,30 +311,57 @@ def get_personalized_assessment(company_id: str, pillar: str, db) -> Dict:
         categories = questionnaires[pillar]
         logger.info(f"Found {len(categories)} categories for pillar {pillar}")
         
-        # Generate questions for each category
+        # Generate questions for all categories concurrently
         assessment = {
             "pillar": pillar,
             "company": company_info,
-            "categories": []
+            "categories": generation_loop.run(_generate_personalized_categories(company_info, pillar, categories))
         }
         
-        for category_name in categories:
-            logger.info(f"Generating questions for category: {category_name}")
-            # Generate personalized questions for this category
-            questions = generate_personalized_questions(
-                company_info=company_info,
-                pillar=pillar,
-                category=category_name,
-                num_questions=3  # Generate 3 questions per category
-            )
-            
-            assessment["categories"].append({
-                "name": category_name,
-                "questions": questions
-            })
-        
         return assessment
         
     except Exception as e:
         logger.error(f"Error generating personalized assessment: {str(e)}")
-        return {"error": str(e)}
\ No newline at end of file
+        return {"error": str(e)}
+
+async def get_personalized_assessment_async(company: Company, pillar: str, categories: List[str]) -> Dict:
+    """
+    Async counterpart of get_personalized_assessment for callers that already
+    loaded the company and the pillar's categories. The generation runs on
+    the generation loop; failures are returned as {"error": ...} the same way.
+    """
+    try:
+        company_info = company_profile(company)
+        return {
+            "pillar": pillar,
+            "company": company_info,
+            "categories": await generation_loop.run_async(_generate_personalized_categories(company_info, pillar, categories))
+        }
+    except Exception as e:
+        logger.error(f"Error generating personalized assessment: {str(e)}")
+        return {"error": str(e)}
+
+def _generate_personalized_categories(company_info: Dict, pillar: str, categories: List[str]):
+    """Coroutine generating the personalized questions of all of a pillar's categories concurrently."""
+    return generate_categories(
+        question_generator,
+        company_info,
+        pillar,
+        categories,
+        num_questions=3,  # Generate 3 questions per category
+        fallback=template_generator
+    )
+
+def stream_personalized_categories(company_info: Dict, pillar: str, categories: List[str]) -> Iterator[Dict]:
+    """
+    Generate the personalized questions of a pillar's categories, yielding
+    each category ({"index", "name", "questions"}) as soon as it is ready.
+    """
+    return generation_loop.iterate(stream_categories(
+        question_generator,
+        company_info,
+        pillar,
+        categories,
+        num_questions=3,
+        fallback=template_generator
+    ))